@@ -0,0 +1,228 @@
+"""
+Performance benchmarks of the baseline algorithms with regression tracking.
+
+Run from the main directory of the repo (where the README.md file is):
+    python benchmarks/bench_algorithms.py                    # run and compare against benchmarks/baseline.json
+    python benchmarks/bench_algorithms.py --save-baseline    # run and store the results as the new baseline
+
+Each run is written to benchmarks/results/<timestamp>_<commit>.json. The run fails with exit code 1 if a benchmark
+got slower, used more memory or took fewer decisions per second than the baseline, beyond the tolerance.
+The baseline depends on the machine, so it is not part of the repo: the first run on a machine, without a baseline,
+stores its results as the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import yaml
+from common.common_functionalities import get_ingress_nodes_and_cap
+from coordsim.reader.reader import read_network
+
+from algorithms import gcasp, loadBalance, randomSchedule, shortestPath
+from sprinterface.params import Params
+
+# bump whenever the structure of the results file changes
+FORMAT_VERSION = 1
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+BENCHMARK_DIR = PROJECT_ROOT / 'benchmarks'
+# the variants with an egress node where there is one; flows in the other networks leave wherever they are processed
+NETWORKS = {
+    'triangle': 'res/networks/triangle.graphml',
+    'abilene': 'res/networks/abilene_1-5in-1eg/abilene-in4-rand-cap0-2.graphml',
+    'bteurope': 'res/networks/bteurope-in2-rand-cap0-2.graphml',
+    'chinanet': 'res/networks/chinanet-in2-rand-cap0-2.graphml',
+    'interroute': 'res/networks/interroute/interroute-in4-rand-cap0-2.graphml',
+    'tinet': 'res/networks/tinet/tinet-in4-rand-cap0-2.graphml',
+}
+SERVICES = 'res/services/abc-start_delay0.yaml'
+SIM_CONFIGS = {
+    'poisson': 'res/simulator/mean-10-poisson.yaml',
+    'mmpp': 'res/simulator/mmpp-12-8.yaml',
+}
+
+
+class Scenario:
+    """ Inputs of the schedule benchmarks: the parsed network and the SF/SFC lists """
+
+    def __init__(self, network_file, services_file):
+        self.network, _, _ = read_network(str(PROJECT_ROOT / network_file))
+        with open(PROJECT_ROOT / services_file) as f:
+            services = yaml.safe_load(f)
+        self.nodes_list = list(self.network.nodes)
+        self.sf_list = list(services['sf_list'])
+        self.sfc_list = list(services['sfc_list'])
+        self.ingress_nodes, self.nodes_cap = get_ingress_nodes_and_cap(self.network, cap=True)
+        self.nodes_with_cap = [node for node in self.nodes_list if self.nodes_cap[node] > 0]
+
+
+def bench_closest_neighbours(scenario, seed):
+    shortestPath.get_closest_neighbours(scenario.network, scenario.nodes_list)
+
+
+def bench_sp_placement_schedule(scenario, seed):
+    shortestPath.get_placement_schedule(scenario.network, scenario.nodes_list, scenario.sf_list, scenario.sfc_list,
+                                        scenario.ingress_nodes, scenario.nodes_cap)
+
+
+def bench_rs_schedule(scenario, seed):
+    np.random.seed(seed)
+    randomSchedule.get_schedule(scenario.nodes_list, scenario.sf_list, scenario.sfc_list)
+
+
+def bench_lb_schedule(scenario, seed):
+    loadBalance.get_schedule(scenario.nodes_list, scenario.nodes_with_cap, scenario.sf_list, scenario.sfc_list)
+
+
+SCHEDULE_BENCHMARKS = {
+    'closest_neighbours': bench_closest_neighbours,
+    'sp_placement_schedule': bench_sp_placement_schedule,
+    'rs_schedule': bench_rs_schedule,
+    'lb_schedule': bench_lb_schedule,
+}
+
+
+def run_gcasp(network_file, sim_config, seed, duration):
+    """ Runs GCASP for duration flows and returns the number of decisions """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as result_root:
+        # Params writes its results relative to the working directory
+        os.chdir(result_root)
+        try:
+            params = Params(seed, str(PROJECT_ROOT / sim_config), str(PROJECT_ROOT / network_file),
+                            str(PROJECT_ROOT / SERVICES), duration=duration, test_mode=True)
+            return gcasp.run(params, seed)
+        finally:
+            os.chdir(cwd)
+
+
+def measure(func, seeds, repeat):
+    """
+    Calls func(seed) repeat times per seed and returns the wall time statistics, the peak memory of a separate
+    traced call and the mean of the values returned by func (e.g. number of decisions) over the timed calls
+    """
+    times = []
+    values = []
+    for seed in seeds:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            value = func(seed)
+            times.append(time.perf_counter() - start)
+            values.append(value)
+    tracemalloc.start()
+    try:
+        func(seeds[0])
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = dict(wall_time_s=statistics.median(times), wall_time_min_s=min(times), runs=len(times),
+                  peak_memory_bytes=peak)
+    if all(value is not None for value in values):
+        result['decisions_per_s'] = sum(values) / sum(times)
+    return result
+
+
+def run_benchmarks(networks, seeds, repeat, gcasp_duration, include_gcasp=True):
+    results = {}
+    for network_name in networks:
+        network_file = NETWORKS[network_name]
+        scenario = Scenario(network_file, SERVICES)
+        for name, bench in SCHEDULE_BENCHMARKS.items():
+            key = f'{name}/{network_name}'
+            print(f'Running {key}...', file=sys.stderr)
+            results[key] = measure(lambda seed: bench(scenario, seed), seeds, repeat)
+        if include_gcasp:
+            for config_name, sim_config in SIM_CONFIGS.items():
+                key = f'gcasp/{network_name}/{config_name}'
+                print(f'Running {key}...', file=sys.stderr)
+                results[key] = measure(lambda seed: run_gcasp(network_file, sim_config, seed, gcasp_duration),
+                                       seeds, 1)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """ Returns a list of human readable regressions of results compared to the baseline """
+    regressions = []
+    for key, result in sorted(results.items()):
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric in ('wall_time_s', 'peak_memory_bytes'):
+            if metric in reference and result[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f'{key}: {metric} {result[metric]:.6g} > baseline {reference[metric]:.6g}')
+        metric = 'decisions_per_s'
+        if metric in reference and metric in result and result[metric] < reference[metric] / (1 + tolerance):
+            regressions.append(f'{key}: {metric} {result[metric]:.6g} < baseline {reference[metric]:.6g}')
+    return regressions
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmarks of the baseline algorithms")
+    parser.add_argument('-n', '--networks', nargs='+', default=list(NETWORKS), choices=list(NETWORKS))
+    parser.add_argument('-s', '--seeds', type=int, default=5, help="Number of seeds from scripts/30seeds.txt")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="Repetitions per seed of the schedule benchmarks")
+    parser.add_argument('-d', '--gcasp-duration', type=int, default=1000, help="Number of flows per GCASP run")
+    parser.add_argument('--no-gcasp', action='store_true', help="Skip the full GCASP runs")
+    parser.add_argument('-b', '--baseline', default=str(BENCHMARK_DIR / 'baseline.json'))
+    parser.add_argument('-t', '--tolerance', type=float, default=0.25,
+                        help="Allowed relative regression before the run fails")
+    parser.add_argument('--save-baseline', action='store_true', help="Store the results as the new baseline")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with open(PROJECT_ROOT / 'scripts' / '30seeds.txt') as f:
+        seeds = [int(line) for line in f if line.strip()][:args.seeds]
+
+    results = run_benchmarks(args.networks, seeds, args.repeat, args.gcasp_duration, not args.no_gcasp)
+    commit = get_commit()
+    report = dict(format_version=FORMAT_VERSION, commit=commit, timestamp=datetime.now().isoformat(),
+                  python=platform.python_version(), machine=platform.platform(), seeds=seeds, results=results)
+    results_dir = BENCHMARK_DIR / 'results'
+    results_dir.mkdir(parents=True, exist_ok=True)
+    results_file = results_dir / f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{commit}.json"
+    with open(results_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Saved results in {results_file}')
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        if not args.save_baseline:
+            print(f'No baseline at {args.baseline} yet, this first run becomes the baseline')
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Saved baseline in {args.baseline}')
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('format_version') != FORMAT_VERSION:
+        sys.exit(f'Baseline {args.baseline} has format version {baseline.get("format_version")}, '
+                 f'expected {FORMAT_VERSION}. Run with --save-baseline to recreate it.')
+    regressions = compare(results, baseline['results'], args.tolerance)
+    if regressions:
+        print(f'PERFORMANCE REGRESSIONS against baseline {baseline.get("commit")}:', file=sys.stderr)
+        for regression in regressions:
+            print(f'  {regression}', file=sys.stderr)
+        sys.exit(1)
+    print(f'No regressions against baseline {baseline.get("commit")} (tolerance {args.tolerance:.0%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+Scaling benchmarks of the baseline algorithms on synthetic networks of growing size, see
+auxiliary/topology_generator.py.
+
+Run from the main directory of the repo (where the README.md file is):
+    python benchmarks/bench_scaling.py                                   # all models, 100 ... 2000 nodes
+    python benchmarks/bench_scaling.py -m waxman ba -n 1000 2000 5000    # selected models and sizes
+
+Each benchmark runs in its own worker process, so that caches do not carry over between them. The wall time and the
+peak memory of a separate traced call of each benchmark are printed as a table and written to
+benchmarks/results/<timestamp>_<commit>_scaling.json. Runs without coord-sim: the networks are read and GCASP is run
+with the in-repo FlowSimulator.
+"""
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from algorithms import gcasp, loadBalance, shortestPath
+from auxiliary.network_cache import NetworkTables
+from auxiliary.topology_generator import MODELS, generate, write_network
+from sprinterface.flow_simulator import FlowSimParams, FlowSimulator, read_network
+
+# bump whenever the structure of the results file changes
+FORMAT_VERSION = 1
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+BENCHMARK_DIR = PROJECT_ROOT / 'benchmarks'
+SERVICES = 'res/services/abc-start_delay0.yaml'
+SIM_CONFIG = 'res/simulator/mean-10-poisson.yaml'
+SIZES = [100, 200, 500, 1000, 2000]
+
+
+class Scenario:
+    """ Inputs of the schedule benchmarks: the parsed network, its NetworkTables and the SF/SFC lists """
+
+    def __init__(self, network_file, services_file):
+        self.network, self.ingress_nodes, self.egress_nodes = read_network(network_file)
+        with open(PROJECT_ROOT / services_file) as f:
+            services = yaml.safe_load(f)
+        self.nodes_list = list(self.network.nodes)
+        self.sf_list = list(services['sf_list'])
+        self.sfc_list = list(services['sfc_list'])
+        self.nodes_cap = dict(self.network.nodes(data='cap'))
+        self.nodes_with_cap = [node for node in self.nodes_list if self.nodes_cap[node] > 0]
+        self.tables = NetworkTables.from_network(self.network, self.ingress_nodes, self.egress_nodes)
+        rows = [self.tables.node_index[node] for node in self.nodes_list]
+        self.delay = self.tables.delay[np.ix_(rows, rows)]
+
+
+def bench_read(network_file, scenario, flows, seed):
+    read_network(network_file)
+
+
+def bench_tables(network_file, scenario, flows, seed):
+    NetworkTables.from_network(scenario.network, scenario.ingress_nodes, scenario.egress_nodes)
+
+
+def bench_sp_placement_schedule(network_file, scenario, flows, seed):
+    shortestPath.get_placement_schedule(scenario.network, scenario.nodes_list, scenario.sf_list, scenario.sfc_list,
+                                        scenario.ingress_nodes, scenario.nodes_cap, tables=scenario.tables)
+
+
+def bench_lb_schedule(network_file, scenario, flows, seed):
+    loadBalance.get_placement(scenario.nodes_with_cap, scenario.sf_list)
+    loadBalance.get_schedule(scenario.nodes_list, scenario.nodes_with_cap, scenario.sf_list, scenario.sfc_list)
+
+
+def bench_lb_weighted_schedule(network_file, scenario, flows, seed):
+    loadBalance.get_weighted_schedule(scenario.nodes_list, scenario.nodes_cap, scenario.sf_list, scenario.sfc_list,
+                                      scenario.delay, delay_weight=0.1)
+
+
+def bench_gcasp(network_file, scenario, flows, seed):
+    """ Sets up GCASP and runs it for the given number of flows against the FlowSimulator """
+    with tempfile.TemporaryDirectory() as result_dir:
+        params = FlowSimParams(seed, str(PROJECT_ROOT / SIM_CONFIG), network_file, str(PROJECT_ROOT / SERVICES),
+                               duration=flows, result_dir=result_dir)
+        return gcasp.run(params, seed, simulator_class=FlowSimulator)
+
+
+# read: parsing the network; tables: all-pairs delays and neighbour order, which real runs cache on disk
+BENCHMARKS = {
+    'read': bench_read,
+    'tables': bench_tables,
+    'sp_placement_schedule': bench_sp_placement_schedule,
+    'lb_schedule': bench_lb_schedule,
+    'lb_weighted_schedule': bench_lb_weighted_schedule,
+    'gcasp': bench_gcasp,
+}
+
+
+def measure(name, network_file, flows, seed):
+    """
+    Runs a single benchmark inside a worker process. Returns the wall time, the peak memory of a separate traced call
+    and for GCASP the decisions per second
+    """
+    bench = BENCHMARKS[name]
+    # gcasp and read build their own inputs
+    scenario = Scenario(network_file, SERVICES) if name not in ('read', 'gcasp') else None
+    start = time.perf_counter()
+    value = bench(network_file, scenario, flows, seed)
+    wall_time = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        bench(network_file, scenario, flows, seed)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = dict(wall_time_s=wall_time, peak_memory_bytes=peak)
+    if value is not None:
+        result['decisions_per_s'] = value / wall_time
+    return result
+
+
+def run_benchmarks(models, sizes, benchmarks, flows, seed, ingress_share, network_dir):
+    """ Generates a network for each model and size and runs the benchmarks on it """
+    results = {}
+    for model in models:
+        for n in sizes:
+            graph = generate(model, n, seed, num_ingress=max(1, round(n * ingress_share)))
+            network_file = str(Path(network_dir) / f'{model}-n{len(graph)}-seed{seed}.graphml')
+            write_network(graph, network_file)
+            for name in benchmarks:
+                key = f'{name}/{model}/{len(graph)}'
+                print(f'Running {key}...', file=sys.stderr)
+                # a fresh process per benchmark, so that e.g. the path caches of GCASP are not reused
+                with Pool(1, maxtasksperchild=1) as pool:
+                    result = pool.apply(measure, (name, network_file, flows, seed))
+                results[key] = dict(result, nodes=graph.number_of_nodes(), links=graph.number_of_edges())
+    return results
+
+
+def format_table(results):
+    """ One line per benchmark, model and size """
+    lines = [f"{'benchmark':<24}{'model':<10}{'nodes':>7}{'links':>8}{'wall time [s]':>15}{'peak memory [MB]':>18}"]
+    for key, result in results.items():
+        name, model, _ = key.split('/')
+        lines.append(f"{name:<24}{model:<10}{result['nodes']:>7}{result['links']:>8}{result['wall_time_s']:>15.3f}"
+                     f"{result['peak_memory_bytes'] / (1 << 20):>18.1f}")
+    return '\n'.join(lines)
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scaling benchmarks of the baseline algorithms on synthetic networks")
+    parser.add_argument('-m', '--models', nargs='+', default=list(MODELS), choices=MODELS)
+    parser.add_argument('-n', '--nodes', nargs='+', type=int, default=SIZES, help="Number of nodes of the networks")
+    parser.add_argument('-b', '--benchmarks', nargs='+', default=list(BENCHMARKS), choices=list(BENCHMARKS))
+    parser.add_argument('-d', '--gcasp-duration', type=int, default=10000, help="Number of flows per GCASP run")
+    parser.add_argument('-s', '--seed', type=int, default=0, help="Seed of the networks and the GCASP runs")
+    parser.add_argument('--ingress-share', type=float, default=0.05, help="Share of the nodes that are ingress nodes")
+    parser.add_argument('--network-dir', default=None,
+                        help="Keep the generated networks in this directory instead of a temporary one")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    network_dir = args.network_dir or tempfile.mkdtemp(prefix='scaling-networks-')
+    try:
+        Path(network_dir).mkdir(parents=True, exist_ok=True)
+        results = run_benchmarks(args.models, args.nodes, args.benchmarks, args.gcasp_duration, args.seed,
+                                 args.ingress_share, network_dir)
+    finally:
+        if args.network_dir is None:
+            shutil.rmtree(network_dir, ignore_errors=True)
+    print(format_table(results))
+
+    commit = get_commit()
+    report = dict(format_version=FORMAT_VERSION, commit=commit, timestamp=datetime.now().isoformat(),
+                  python=platform.python_version(), machine=platform.platform(), seed=args.seed, results=results)
+    results_dir = BENCHMARK_DIR / 'results'
+    results_dir.mkdir(parents=True, exist_ok=True)
+    results_file = results_dir / f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{commit}_scaling.json"
+    with open(results_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Saved results in {results_file}')
+
+
+if __name__ == '__main__':
+    main()
@@ -9,4 +9,5 @@
 # run from project root! (where Readme is)
 
 # DO NOT try to parallelize running sp and lb; the files are saved to the same place and hard (impossible?) to distinguish; run first sp, then lb
+# Use 'baseline-bench' instead to run all algorithms at once with separate result directories
 parallel --bar 'sp' ::: "--network" :::: scripts/network_files.txt ::: "--service_functions" :::: scripts/service_files.txt ::: "--config" :::: scripts/config_files.txt ::: "--iterations" ::: "200" ::: "--seed" :::: scripts/30seeds.txt
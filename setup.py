@@ -5,12 +5,14 @@ from setuptools import setup, find_packages
 
 requirements = [
     'tqdm',
+    'numpy',
     'common-utils',
     'coord-sim'
 ]
 
 test_requirements = [
-    'flake8'
+    'flake8',
+    'pytest'
 ]
 
 setup(
@@ -27,7 +29,9 @@ setup(
         'console_scripts': [
             "rs=algorithms.randomSchedule:main",
             "lb=algorithms.loadBalance:main",
-            "sp=algorithms.shortestPath:main"
+            "sp=algorithms.shortestPath:main",
+            "baseline-bench=algorithms.orchestrator:main",
+            "baseline-topology=auxiliary.topology_generator:main"
         ],
     },
 )
@@ -1,186 +1,187 @@
 # GCASP: Greedy Coordination with Adaptive Shortest Paths
 # Code: https://github.com/CN-UPB/distributed-coordination/blob/master/src/algorithms/greedy/gpasp.py
 # Paper: http://dl.ifip.org/db/conf/cnsm/cnsm2020/1570653213.pdf
+# The classes of GCASP are in gcasp_core.py, which is only imported once a run starts or one of them is accessed here.
 
+import logging
+import os
 import random
-import copy
+import time
 
 import click
-import networkx as nx
-
-from sprinterface.params import Params
-from sprinterface.wrapper import SPRSimWrapper
-
-from auxiliary.link import Link
-
-
-class GCASP:
-    def __init__(self, sim_wrapper):
-        self.sim_wrapper = sim_wrapper
-        self.simulator = sim_wrapper.simulator
-        self.all_node_ids = list(self.simulator.network.nodes)
-        self.network_degree = self.sim_wrapper.params.net_degree
-        # create a dict of sfcs
-        self.sfcs = self.simulator.sfc_list
-        # copy of network for safe calculations without modifying real network
-        self.network_copy = self.get_network_copy()
-
-    def get_network_copy(self) -> nx.Graph:
-        """
-        Returns a deepcopy of the network topology and its current state. The returned network can be used by external
-        algorithms for e.g. calculating shortest path based on their restricted knowledge, without altering the internal
-        simulator state.
-        """
-        graph = nx.Graph()
-        for n in self.simulator.network.nodes(data=True):
-            graph.add_node(n[0], type=n[1]['type'], cap=n[1]['cap'], remaining_cap=n[1]['cap'],
-                           available_sf=copy.deepcopy(n[1]['available_sf']))
-        for e in self.simulator.network.edges(data=True):
-            graph.add_edge(e[0], e[1], delay=e[2]['delay'], cap=e[2]['cap'], remaining_cap=e[2]['cap'])
-        return graph
-
-    def init_flow(self, flow):
-        assert not hasattr(flow, 'metadata'), f"Flow {flow.flow_id} was already initialized by GCASP."
-        flow.metadata = dict()
-        flow.metadata['state'] = 'greedy'
-        flow.metadata['target_node_id'] = flow.egress_node_id
-        flow.metadata['blocked_links'] = []
-        try:
-            self.set_new_path(flow)
-        except nx.NetworkXNoPath:
-            flow.metadata['state'] = 'drop'
-            flow.metadata['path'] = []
-
-    def get_neighbor(self, node_id):
-        """Return neighbor index for given node ID. Raises an error if the node_id is not a neighbor."""
-        return self.sim_wrapper.node_and_neighbors.index(node_id)
-
-    def set_new_path(self, flow):
-        """
-        Calculate and set shortest path to the target node defined by target_node_id, taking blocked links into account.
-        """
-        assert self.network_copy.number_of_edges() == self.simulator.params.network.number_of_edges(), \
-            f'Pre edge count mismatch with internal state! Flow {flow.flow_id}'
-        for link in flow.metadata['blocked_links']:
-            self.network_copy.remove_edge(link[0], link[1])
-        try:
-            shortest_path = nx.shortest_path(self.network_copy, flow.current_node_id, flow.metadata['target_node_id'],
-                                             weight='delay')
-            shortest_path.pop(0)
-            flow.metadata['path'] = shortest_path
-        except nx.NetworkXNoPath:
-            raise
-        finally:
-            for link in flow.metadata['blocked_links']:
-                self.network_copy.add_edge(link[0], link[1], **link.attributes)
-            assert self.network_copy.number_of_edges() == self.simulator.params.network.number_of_edges(), \
-                'Post edge count mismatch with internal state!'
-
-    def drop_flow(self, flow):
-        """Since there's no drop flow option, just select a random action"""
-        flow.metadata['state'] = 'drop'
-        flow.metadata['path'] = []
-        return None
-
-    def select_neighbor(self, flow, link_rem_cap):
-        """
-        Select a neighbor by forwarding the flow along the precomputed path if possible. Else, reroute.
-        """
-        node_id = flow.current_node_id
-        assert len(flow.metadata['path']) > 0
-        next_neighbor_id = flow.metadata['path'].pop(0)
-        edge = self.simulator.params.network[node_id][next_neighbor_id]
-
-        # Can forward?
-        if edge['remaining_cap'] >= flow.dr:
-            # yes => forward to next neighbor on path
-            return self.get_neighbor(next_neighbor_id)
-        else:
-            # no => adapt path
-            # remove all incident links which cannot be crossed
-            for incident_edge in self.simulator.params.network.edges(node_id, data=True):
-                if (incident_edge[2]['remaining_cap'] - flow.dr) < 0:
-                    link = Link(incident_edge[0], incident_edge[1], **incident_edge[2])
-                    if link not in flow.metadata['blocked_links']:
-                        flow.metadata['blocked_links'].append(link)
-            try:
-                # Try to find new path
-                self.set_new_path(flow)
-                assert len(flow.metadata['path']) > 0
-                next_neighbor_id = flow.metadata['path'].pop(0)
-                # Set forwarding rule
-                return self.get_neighbor(next_neighbor_id)
-            except nx.NetworkXNoPath:
-                # all outgoing links are exhausted
-                return self.drop_flow(flow)
-
-        # this should never be reached
-        return None
-
-    def compute_action(self, state):
-        """
-        Copied and adjusted: https://github.com/CN-UPB/distributed-coordination/blob/master/src/algorithms/greedy/gpasp.py#L88
-        Computed action:
-        0 = process locally
-        i > 0 --> forward to neighbor i
-        None: drop flow
-        """
-        # state: info about the incoming flow as well as node, link capacities, and distances of each neighbor
-        flow = state['flow']
-        node_rem_cap = state['rem_node_cap']
-        link_rem_cap = state['rem_link_cap']
-
-        # init metadata for flow, needed by GCASP
-        if not hasattr(flow, 'metadata'):
-            self.init_flow(flow)
-
-        node_id = flow.current_node_id
-        # Is flow fully processed?
-        if flow.current_position == len(self.sfcs[flow.sfc]):
-            # Needs the state to change?
-            if flow.metadata['state'] != 'departure':
-                # yes => switch to departure, forward to egress node
-                flow.metadata['state'] = 'departure'
-                flow.metadata['target_node_id'] = flow.egress_node_id
-                flow.metadata['blocked_links'] = []
-                try:
-                    self.set_new_path(flow)
-                except nx.NetworkXNoPath:
-                    return self.drop_flow(flow)
-        else:
-            # no, not fully processed
-            if node_id == flow.metadata['target_node_id']:
-                # has flow arrived at targte node => set new random target distinct from the current node
-                while flow.metadata['target_node_id'] == node_id:
-                    flow.metadata['target_node_id'] = random.choice(self.all_node_ids)
-                flow.metadata['blocked_links'] = []
+
+log = logging.getLogger(__name__)
+
+# modules that are only imported once a run starts, see --profile-startup
+LAZY_IMPORTS = ('algorithms.gcasp_core', 'auxiliary.shared_topology', 'sprinterface.params', 'sprinterface.wrapper',
+                'auxiliary.decision_log', 'auxiliary.instrumentation', 'auxiliary.state_log')
+# file in the results directory written by --record-states
+STATE_LOG_NAME = 'states.gcasplog'
+
+
+def __getattr__(name):
+    """ Re-exports the classes and constants of gcasp_core, e.g. GCASP, importing it on first access """
+    if name.startswith('__'):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from algorithms import gcasp_core
+    try:
+        return getattr(gcasp_core, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+
+def run(params, seed, instrumentation=None, decision_log=None, topology=None, record_states=None,
+        simulator_class=None, reroute_paths=None, ttl_check=True, batched=False):
+    """
+    Run GCASP against the simulator until params.duration flows have arrived.
+    Returns the number of decisions taken. If a DecisionLog is given, every decision is recorded in it. A topology
+    built by build_topology for the same network can be given to skip building it again. If record_states is a
+    path, all states and decisions are recorded there for gcasp_replay.py. simulator_class replaces the simulator of
+    coord-sim, e.g. by sprinterface.flow_simulator.FlowSimulator. reroute_paths is the number of cached alternative
+    paths tried by reroutes, 0 to always search a new path, by default REROUTE_PATHS of gcasp_core. With ttl_check,
+    flows that cannot reach their egress within their remaining TTL are dropped early, see GCASP.min_remaining_delay.
+    With batched, all flows pending at the same time are decided together, see run_batches.
+    """
+    from algorithms.gcasp_core import GCASP, REROUTE_PATHS
+    from auxiliary.state_log import StateRecorder
+
+    from sprinterface.wrapper import SPRSimWrapper
+
+    if reroute_paths is None:
+        reroute_paths = REROUTE_PATHS
+    # GCASP only uses the remaining capacity of the current node
+    simulator_wrapper = SPRSimWrapper(params=params, minimal_state=True, instrumentation=instrumentation,
+                                      simulator_class=simulator_class)
+    gcasp = GCASP(simulator_wrapper, decision_log=decision_log, topology=topology, reroute_paths=reroute_paths,
+                  ttl_check=ttl_check)
+    if batched:
+        if record_states is not None:
+            # the records hold the capacities of the network, not those of the capacity snapshot of a batch
+            raise ValueError('States cannot be recorded in batched runs.')
+        return run_batches(simulator_wrapper, gcasp, seed, params.duration)
+    recorder = None
+    if record_states is not None:
+        # the replay constructs GCASP with the same SFs and options
+        recorder = StateRecorder(record_states, gcasp.topology, gcasp.sfcs, gcasp.network_degree, seed,
+                                 sf_list=gcasp.simulator.sf_list,
+                                 options=dict(reroute_paths=reroute_paths, ttl_check=ttl_check))
+        recorder.attach(gcasp)
+    try:
+        state, sim_state = simulator_wrapper.init(seed)
+        action = gcasp.compute_action(state)
+        decisions = 1
+        if recorder is not None:
+            recorder.record_decision(gcasp, state, action)
+
+        while sim_state.network_stats['total_flows'] < params.duration:
+            state, sim_state = simulator_wrapper.apply(action)
+            action = gcasp.compute_action(state)
+            decisions += 1
+            if recorder is not None:
+                recorder.record_decision(gcasp, state, action)
+    finally:
+        if recorder is not None:
+            recorder.close()
+    return decisions
+
+
+def run_batches(simulator_wrapper, gcasp, seed, duration):
+    """
+    Run GCASP until duration flows have arrived, with one simulator round trip per batch of the flows that are pending
+    at the same time (see SPRSimWrapper.apply_batch and GCASP.compute_actions). Takes the same decisions as the
+    per-flow loop of run, plus the decisions of the flows pending together with the last arrival.
+    Returns the number of decisions taken.
+    """
+    states, sim_states = simulator_wrapper.init_batch(seed)
+    decisions = 0
+    while True:
+        actions = gcasp.compute_actions(states)
+        decisions += len(states)
+        if sim_states[-1].network_stats['total_flows'] >= duration:
+            return decisions
+        states, sim_states = simulator_wrapper.apply_batch(actions)
+
+
+# topology attached by a worker process of run_seeds, reused for all of its seeds
+_worker_topology = None
+
+
+def run_seed(network, simulator_config, services, duration, seed, spec=None, instrument=False, decision_log=False,
+             reroute_paths=None, ttl_check=True, batched=False):
+    """ Runs a single seed inside a worker process of run_seeds and returns the number of decisions """
+    from sprinterface.params import Params
+
+    from auxiliary.decision_log import DecisionLog
+    from auxiliary.instrumentation import Instrumentation
+    from auxiliary.shared_topology import attach_topology
+
+    global _worker_topology
+    if spec is not None and (_worker_topology is None or _worker_topology.shared_memory.name != spec.name):
+        _worker_topology = attach_topology(spec)
+    topology = _worker_topology if spec is not None else None
+    params = Params(seed, simulator_config, network, services, duration=duration, test_mode=True)
+    instrumentation = Instrumentation() if instrument else None
+    if decision_log:
+        with DecisionLog(params.result_dir) as log_file:
+            decisions = run(params, seed, instrumentation=instrumentation, decision_log=log_file, topology=topology,
+                            reroute_paths=reroute_paths, ttl_check=ttl_check, batched=batched)
+    else:
+        decisions = run(params, seed, instrumentation=instrumentation, topology=topology, reroute_paths=reroute_paths,
+                        ttl_check=ttl_check, batched=batched)
+    if instrumentation is not None:
+        instrumentation.dump(params.result_dir)
+    return decisions
+
+
+def run_seeds(network, simulator_config, services, duration, seeds, workers=None, instrument=False,
+              decision_log=False, reroute_paths=None, ttl_check=True, batched=False):
+    """
+    Runs GCASP for several seeds of the same scenario on a pool of worker processes. The topology and the next-hop
+    table are built once and placed in shared memory, where all workers attach to them read-only; only the
+    path caches are private to each run. Without multiprocessing.shared_memory (Python < 3.8) every run builds its
+    own topology.
+
+    Returns:
+        list of the seeds that failed
+    """
+    # imported here, so that the command line starts fast
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from coordsim.reader.reader import read_network
+    from tqdm import tqdm
+
+    from algorithms.gcasp_core import build_topology
+    from auxiliary.shared_topology import SharedTopology
+
+    try:
+        shared = SharedTopology(build_topology(read_network(network)[0]))
+    except ImportError:
+        log.warning("multiprocessing.shared_memory is not available, each run builds its own topology")
+        shared = None
+    failed = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run_seed, network, simulator_config, services, duration, seed,
+                                       shared.spec if shared is not None else None, instrument, decision_log,
+                                       reroute_paths, ttl_check, batched): seed
+                       for seed in seeds}
+            for future in tqdm(as_completed(futures), total=len(futures), unit='run'):
                 try:
-                    self.set_new_path(flow)
-                except nx.NetworkXNoPath:
-                    return self.drop_flow(flow)
-
-        # Determine Flow state
-        if flow.metadata['state'] == 'greedy':
-            # One the way to the target, needs processing
-            # Can flow be processed at current node?
-            # TODO: adjust for other resource functions like here:
-            #  https://github.com/CN-UPB/distributed-coordination/blob/master/src/algorithms/greedy/gpasp.py#L140
-            if node_rem_cap[0] >= flow.dr:
-                # process locally (neighbor 0 = this node)
-                return 0
-            else:
-                # no => forward
-                return self.select_neighbor(flow, link_rem_cap)
-
-        elif flow.metadata['state'] == 'departure':
-            # Return to destination as soon as possible, no more processing necessary
-            if node_id != flow.egress_node_id:
-                return self.select_neighbor(flow, link_rem_cap)
-            return 0
-
-        # Should never be reached.
-        print("No action selected. This shouldn't happen.")
-        return None
+                    future.result()
+                except Exception:
+                    log.exception(f"Run with seed {futures[future]} failed")
+                    failed.append(futures[future])
+    finally:
+        if shared is not None:
+            shared.close()
+    return failed
+
+
+def profile_startup(ctx, param, value):
+    """ Eager click callback of --profile-startup, runs before the required arguments are checked """
+    if not value or ctx.resilient_parsing:
+        return
+    from auxiliary.startup import report_startup
+    ctx.exit(0 if report_startup('algorithms.gcasp', LAZY_IMPORTS) else 1)
 
 
 # Click decorators
@@ -190,25 +191,73 @@ class GCASP:
 @click.argument('services', type=click.Path(exists=True))
 @click.argument('duration', type=int)
 @click.argument('seed', type=int)
-def main(network, simulator_config, services, duration, seed):
+@click.option('--instrument', is_flag=True, help='Record per-decision latencies and write a summary to the results')
+@click.option('--decision-log', is_flag=True, help='Write a compressed record of every decision to the results')
+@click.option('--profile-startup', is_flag=True, is_eager=True, expose_value=False, callback=profile_startup,
+              help='Report the import time of this command and its dependencies, then exit')
+@click.option('--seeds', multiple=True,
+              help='Run these seeds in parallel instead of SEED, repeated or given as a file with one seed per line. '
+                   'The workers share one copy of the topology')
+@click.option('-w', '--workers', type=int, default=None, help='Number of worker processes for --seeds')
+@click.option('--flow-sim', is_flag=True,
+              help='Run against the lightweight in-repo FlowSimulator instead of coord-sim, e.g. for perf tests')
+@click.option('--record-states', is_flag=True,
+              help=f'Record all states and decisions to {STATE_LOG_NAME} in the results, see gcasp_replay.py')
+@click.option('--reroute-paths', type=int, default=None,
+              help='Cached shortest paths per source and target that a reroute tries before searching a new path, '
+                   '0 to always search. Defaults to REROUTE_PATHS of gcasp_core')
+@click.option('--no-ttl-check', 'ttl_check', is_flag=True, default=True, flag_value=False,
+              help='Keep forwarding flows that can no longer reach their egress within their TTL instead of dropping '
+                   'them early')
+@click.option('--batch', 'batched', is_flag=True,
+              help='Decide all flows pending at the same time together, with one simulator call per batch')
+def main(network, simulator_config, services, duration, seed, instrument, decision_log, seeds, workers, flow_sim,
+         record_states, reroute_paths, ttl_check, batched):
     """
     SPR-RL DRL Scaling and Placement main executable
     """
+    from algorithms.orchestrator import parse_seeds
+    from auxiliary.decision_log import DecisionLog
+    from auxiliary.instrumentation import Instrumentation
+
+    if batched and record_states:
+        raise click.UsageError('--batch cannot be combined with --record-states')
+    if seeds:
+        logging.basicConfig(level=logging.WARNING)
+        failed = run_seeds(network, simulator_config, services, duration, parse_seeds(seeds), workers, instrument,
+                           decision_log, reroute_paths, ttl_check, batched)
+        if failed:
+            raise SystemExit(1)
+        return
     # Get or set a seed
     if seed is None or seed == 'None':
         seed = random.randint(0, 9999)
     print(f"Starting heuristic with seed: {seed}")
     # Create the parameters object
-    params = Params(seed, simulator_config, network, services, duration=duration, test_mode=True)
+    simulator_class = None
+    if flow_sim:
+        from sprinterface.flow_simulator import FlowSimParams, FlowSimulator
+        params = FlowSimParams(seed, simulator_config, network, services, duration=duration)
+        simulator_class = FlowSimulator
+    else:
+        from sprinterface.params import Params
+        params = Params(seed, simulator_config, network, services, duration=duration, test_mode=True)
 
-    simulator_wrapper = SPRSimWrapper(params=params)
-    gcasp = GCASP(simulator_wrapper)
-    state, sim_state = simulator_wrapper.init(seed)
-    action = gcasp.compute_action(state)
-
-    while sim_state.network_stats['total_flows'] < duration:
-        state, sim_state = simulator_wrapper.apply(action)
-        action = gcasp.compute_action(state)
+    instrumentation = Instrumentation() if instrument else None
+    state_log = os.path.join(params.result_dir, STATE_LOG_NAME) if record_states else None
+    start = time.perf_counter()
+    if decision_log:
+        with DecisionLog(params.result_dir) as log_file:
+            run(params, seed, instrumentation=instrumentation, decision_log=log_file, record_states=state_log,
+                simulator_class=simulator_class, reroute_paths=reroute_paths, ttl_check=ttl_check, batched=batched)
+    else:
+        run(params, seed, instrumentation=instrumentation, record_states=state_log, simulator_class=simulator_class,
+            reroute_paths=reroute_paths, ttl_check=ttl_check, batched=batched)
+    if flow_sim:
+        elapsed = time.perf_counter() - start
+        print(f"{duration} flows in {elapsed:.1f}s ({60 * duration / elapsed:.0f} flows/min)")
+    if instrumentation is not None:
+        instrumentation.dump(params.result_dir)
 
 
 if __name__ == "__main__":
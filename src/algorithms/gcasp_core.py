@@ -0,0 +1,617 @@
+# Classes of GCASP, see gcasp.py for the runners and the command line. Kept apart from gcasp.py, so that the command
+# line only imports networkx and numpy once a run starts.
+
+import copy
+import heapq
+import random
+from collections import Counter
+from enum import Enum
+from functools import lru_cache
+
+import networkx as nx
+import numpy as np
+
+from auxiliary.link import EdgeIndex
+from auxiliary.shared_topology import Topology
+
+# number of alternative paths per (source, target) that reroutes try before searching a new path, see
+# ShortestPathEngine.alternative_paths, and the number of (source, target) pairs whose alternatives are cached
+REROUTE_PATHS = 8
+REROUTE_CACHE_SIZE = 4096
+
+
+def restricted_search(adjacency, source, target, delay_to_target, removed_nodes=(), removed_links=()):
+    """
+    Shortest (by delay) path from source to target in an adjacency list of (neighbor, delay, link) per node, not
+    using the removed nodes and links. A* search guided by the unrestricted delay of each node to the target, which
+    never overestimates the restricted one, so only nodes close to the shortest path are visited.
+    Returns the delay and the path (incl. both), or None if the target is unreachable.
+    """
+    dist = {source: 0.0}
+    predecessor = {}
+    done = set()
+    heap = [(delay_to_target[source], source)]
+    while heap:
+        _, node = heapq.heappop(heap)
+        if node == target:
+            path = [node]
+            while node != source:
+                node = predecessor[node]
+                path.append(node)
+            return dist[target], path[::-1]
+        if node in done:
+            continue
+        done.add(node)
+        delay = dist[node]
+        for neighbor, link_delay, link in adjacency[node]:
+            if neighbor in removed_nodes or link in removed_links:
+                continue
+            new_delay = delay + link_delay
+            if new_delay < dist.get(neighbor, float('inf')):
+                dist[neighbor] = new_delay
+                predecessor[neighbor] = node
+                heapq.heappush(heap, (new_delay + delay_to_target[neighbor], neighbor))
+    return None
+
+
+class KShortestPaths:
+    """
+    The k shortest (by delay) simple paths between two nodes, in increasing order of delay, found with Yen's
+    algorithm on the adjacency list of a ShortestPathEngine. Paths are only computed as far as they are iterated, so
+    a reroute that fits on the first alternatives never pays for the others.
+    """
+    __slots__ = ('engine', 'target', 'delay_to_target', 'k', 'paths', 'candidates', 'seen')
+
+    def __init__(self, engine, source, target, k):
+        self.engine = engine
+        self.target = target
+        self.delay_to_target = engine.delays_to(target)
+        self.k = k
+        # computed so far: (path incl. source and target, bitmask of its links)
+        self.paths = []
+        # heap of (delay, path) of the candidates for the next path
+        self.candidates = []
+        self.seen = set()
+        if self.delay_to_target[source] < float('inf'):
+            self.add_candidate(self.delay_to_target[source], engine.unrestricted_path(source, target))
+
+    def __iter__(self):
+        i = 0
+        while i < len(self.paths) or self.extend():
+            yield self.paths[i]
+            i += 1
+
+    def add_candidate(self, delay, path):
+        if tuple(path) not in self.seen:
+            self.seen.add(tuple(path))
+            heapq.heappush(self.candidates, (delay, path))
+
+    def extend(self):
+        """ Computes the next path, returns False once there are k paths or no more paths """
+        if len(self.paths) >= self.k or not self.candidates:
+            return False
+        _, path = heapq.heappop(self.candidates)
+        self.paths.append((path, self.engine.edge_index.path_mask(path)))
+        if len(self.paths) == self.k:
+            return True
+        # the candidates deviating from the new path at each of its nodes (spur nodes)
+        adjacency = self.engine.adjacency
+        link_ids = self.engine.edge_index.edge_ids
+        root_delay = 0.0
+        for i, spur in enumerate(path[:-1]):
+            root = path[:i + 1]
+            removed_links = {link_ids[(known[i], known[i + 1])] for known, _ in self.paths
+                             if len(known) > i + 1 and known[:i + 1] == root}
+            spur_path = restricted_search(adjacency, spur, self.target, self.delay_to_target, set(root[:-1]),
+                                          removed_links)
+            if spur_path is not None:
+                self.add_candidate(root_delay + spur_path[0], root[:-1] + spur_path[1])
+            root_delay += self.engine.graph[spur][path[i + 1]]['delay']
+        return True
+
+
+class ShortestPathEngine:
+    """
+    Answers delay-weighted shortest path queries on a static topology, optionally avoiding a set of blocked links.
+    Nodes are referred to by their index in node_ids and sets of links by bitmasks over edge_index.
+    The next-hop table is taken from the topology if it has one, e.g. when it was attached from shared memory.
+    Shortest paths of the unrestricted topology are computed once per source node. Queries with blocked links are
+    answered on a filtered view of the topology, so the underlying graph is never mutated. Results are cached per
+    (source, target, blocked links). For reroutes, the k shortest paths of each (source, target) are cached as well,
+    independent of the blocked links, in an LRU of reroute_cache_size pairs.
+    """
+    def __init__(self, topology: Topology, cache_size=65536, reroute_paths=REROUTE_PATHS,
+                 reroute_cache_size=REROUTE_CACHE_SIZE):
+        self.node_ids = topology.nodes
+        self.node_index = topology.node_index
+        # static topology with node indices and link delays only
+        self.graph = nx.Graph()
+        self.graph.add_nodes_from(range(len(self.node_ids)))
+        self.graph.add_weighted_edges_from(zip(topology.edges[:, 0].tolist(), topology.edges[:, 1].tolist(),
+                                               topology.edge_delay.tolist()), weight='delay')
+        self.edge_index = EdgeIndex(self.graph.edges)
+        # next_hop[node, target]: neighbor of node on a shortest path to target (node itself if node == target, -1
+        # if target is unreachable). Hop-by-hop forwarding along the table follows a shortest path to the target
+        self.next_hop = topology.next_hop if topology.next_hop is not None else self.build_next_hop_table()
+        # source node -> {target node: shortest path}, filled lazily with one Dijkstra run per source
+        self.source_paths = {}
+        self.cached_path = lru_cache(maxsize=cache_size)(self.compute_path)
+        # per node: (neighbor, delay, link index) of each link, used for the k shortest paths of reroutes
+        self.adjacency = [[(neighbor, attrs['delay'], self.edge_index.edge_ids[(node, neighbor)])
+                           for neighbor, attrs in self.graph.adj[node].items()] for node in self.graph]
+        self.reroute_paths = reroute_paths
+        # target node -> delay of each node to it, see delays_to
+        self.target_delays = {}
+        self.cached_alternatives = lru_cache(maxsize=reroute_cache_size)(
+            lambda source, target: KShortestPaths(self, source, target, reroute_paths))
+
+    def build_next_hop_table(self):
+        """Build the next-hop table from one shortest path tree per target node."""
+        num_nodes = len(self.node_ids)
+        next_hop = np.full((num_nodes, num_nodes), -1, dtype=np.int32)
+        for target in range(num_nodes):
+            # in the undirected graph, the predecessor of a node in the tree rooted at target is its next hop
+            predecessors, _ = nx.dijkstra_predecessor_and_distance(self.graph, target, weight='delay')
+            for node, node_predecessors in predecessors.items():
+                next_hop[node, target] = node_predecessors[0] if node_predecessors else node
+        return next_hop
+
+    def delays_to(self, target):
+        """Delay of the shortest path from each node to target (inf if unreachable), computed once per target."""
+        if target not in self.target_delays:
+            lengths = nx.single_source_dijkstra_path_length(self.graph, target, weight='delay')
+            self.target_delays[target] = [lengths.get(node, float('inf')) for node in range(len(self.node_ids))]
+        return self.target_delays[target]
+
+    def delays_via(self, target, via_nodes):
+        """
+        Delay of the shortest path from each node to target that visits at least one of via_nodes (inf if there is
+        none), i.e. min over v in via_nodes of delay(node, v) + delay(v, target). Without target, the delay to the
+        closest of via_nodes. One Dijkstra run seeded with the delay of each via node to target; not cached.
+        """
+        to_target = self.delays_to(target) if target is not None else None
+        dist = [float('inf')] * len(self.node_ids)
+        heap = []
+        for node in via_nodes:
+            dist[node] = to_target[node] if to_target is not None else 0.0
+            heap.append((dist[node], node))
+        heapq.heapify(heap)
+        while heap:
+            delay, node = heapq.heappop(heap)
+            if delay > dist[node]:
+                continue
+            for neighbor, link_delay, _ in self.adjacency[node]:
+                if delay + link_delay < dist[neighbor]:
+                    dist[neighbor] = delay + link_delay
+                    heapq.heappush(heap, (dist[neighbor], neighbor))
+        return dist
+
+    def unrestricted_path(self, source, target):
+        """Return the shortest path from source to target (incl. both) ignoring blocked links, or None."""
+        if source not in self.source_paths:
+            self.source_paths[source] = nx.single_source_dijkstra_path(self.graph, source, weight='delay')
+        return self.source_paths[source].get(target)
+
+    def compute_path(self, source, target, blocked_links: int):
+        """Compute the shortest path from source to target (incl. both) avoiding blocked links, or None."""
+        path = self.unrestricted_path(source, target)
+        if path is None or not blocked_links:
+            return path
+        # the precomputed path is still the shortest one if none of its links are blocked
+        if not self.edge_index.path_mask(path) & blocked_links:
+            return path
+        edge_ids = self.edge_index.edge_ids
+        view = nx.subgraph_view(self.graph, filter_edge=lambda u, v: not (blocked_links >> edge_ids[(u, v)]) & 1)
+        try:
+            return nx.shortest_path(view, source, target, weight='delay')
+        except nx.NetworkXNoPath:
+            return None
+
+    def alternative_paths(self, source, target):
+        """
+        Iterates over the k shortest paths from source to target (incl. both) with the bitmask of their links, computed
+        lazily and cached. Nothing is returned if reroute_paths is 0. The paths must not be modified.
+        """
+        if self.reroute_paths <= 0:
+            return iter(())
+        return iter(self.cached_alternatives(source, target))
+
+    def shortest_path(self, source, target, blocked_links=0):
+        """
+        Return the shortest path from source to target avoiding the blocked links (bitmask). The returned list
+        excludes the source node and can be modified by the caller. Raises NetworkXNoPath if the target is
+        unreachable.
+        """
+        path = self.cached_path(source, target, blocked_links)
+        if path is None:
+            raise nx.NetworkXNoPath(f'No path between {self.node_ids[source]} and {self.node_ids[target]} avoiding '
+                                    f'{self.edge_index.edges_in(blocked_links)}.')
+        return path[1:]
+
+
+class FlowState(Enum):
+    GREEDY = 'greedy'
+    DEPARTURE = 'departure'
+    DROP = 'drop'
+
+
+class FlowMeta:
+    """
+    Metadata GCASP attaches to each flow. Nodes are node indices of the path engine and blocked links a bitmask
+    over its edge index. Without blocked links, path is None and the flow follows the next-hop table of the path
+    engine towards target_node. Otherwise path holds the remaining nodes of the explicitly computed path.
+    """
+    __slots__ = ('state', 'target_node', 'path', 'blocked_links')
+
+    def __init__(self, state: FlowState, target_node: int, path=None, blocked_links=0):
+        self.state = state
+        self.target_node = target_node
+        self.path = path
+        self.blocked_links = blocked_links
+
+    def __repr__(self):
+        return f'FlowMeta({self.state.value}, target={self.target_node}, path={self.path}, ' \
+               f'blocked_links={bin(self.blocked_links)})'
+
+
+class CapacitySnapshot:
+    """
+    Remaining node and link capacities of the network at one point in time. Flows decided against the snapshot
+    reserve the resources they use, so later decisions on the same snapshot do not count on the same capacity.
+    """
+    def __init__(self, network: nx.Graph):
+        self.network = network
+        self.reserved_node_cap = Counter()
+        self.reserved_link_cap = Counter()
+
+    @staticmethod
+    def link_key(node_a, node_b):
+        return (node_a, node_b) if node_a <= node_b else (node_b, node_a)
+
+    def node_cap(self, node_id):
+        return self.network.nodes[node_id]['remaining_cap'] - self.reserved_node_cap[node_id]
+
+    def link_cap(self, node_a, node_b):
+        return self.network[node_a][node_b]['remaining_cap'] - self.reserved_link_cap[self.link_key(node_a, node_b)]
+
+    def reserve_node(self, node_id, dr):
+        self.reserved_node_cap[node_id] += dr
+
+    def reserve_link(self, node_a, node_b, dr):
+        self.reserved_link_cap[self.link_key(node_a, node_b)] += dr
+
+
+class GCASP:
+    # action returned by compute_actions for dropped flows
+    DROP_ACTION = -1
+
+    def __init__(self, sim_wrapper, decision_log=None, topology=None, reroute_paths=REROUTE_PATHS, ttl_check=True):
+        self.sim_wrapper = sim_wrapper
+        self.instrumentation = sim_wrapper.instrumentation
+        # optional DecisionLog receiving one record per decision
+        self.decision_log = decision_log
+        self.num_decisions = 0
+        # whether the current decision rerouted the flow and why it was dropped, if it was
+        self.rerouted = False
+        self.drop_reason = None
+        # source of the random target nodes, replaced when recording or replaying decisions, see auxiliary.state_log
+        self.random = random
+        self.simulator = sim_wrapper.simulator
+        self.all_node_ids = list(self.simulator.network.nodes)
+        self.network_degree = self.sim_wrapper.params.net_degree
+        # create a dict of sfcs
+        self.sfcs = self.simulator.sfc_list
+        # static topology, either attached from shared memory (see run_seeds) or built for this instance
+        self.topology = topology or build_topology(self.simulator.network)
+        if self.topology.nodes != self.all_node_ids:
+            raise ValueError('The topology does not match the network of the simulator.')
+        # shortest paths are computed on the static topology and cached, without mutating any graph
+        self.path_engine = ShortestPathEngine(self.topology, reroute_paths=reroute_paths)
+        # flow metadata refers to nodes by index and to links by bitmask, see FlowMeta
+        self.node_ids = self.path_engine.node_ids
+        self.node_index = self.path_engine.node_index
+        self.all_nodes = list(range(len(self.node_ids)))
+        # per node index: (neighbor ID, edge index) of each incident link, looked up for all links at once
+        indptr = self.topology.indptr
+        edge_ids = self.path_engine.edge_index.indices(np.repeat(self.all_nodes, np.diff(indptr)),
+                                                       self.topology.indices).tolist()
+        neighbor_ids = [self.node_ids[neighbor] for neighbor in self.topology.indices.tolist()]
+        self.incident_links = [list(zip(neighbor_ids[indptr[i]:indptr[i + 1]], edge_ids[indptr[i]:indptr[i + 1]]))
+                               for i in self.all_nodes]
+        # node and neighbor IDs of the current decision, action i forwards to node_and_neighbors[i]
+        self.node_and_neighbors = None
+        # capacity snapshot shared by the decisions of a batch, see compute_actions
+        self.snapshot = None
+        # whether flows that cannot reach their egress within their remaining TTL are dropped, see min_remaining_delay
+        self.ttl_check = ttl_check
+        # nodes with capacity, only these can process a flow
+        self.capable_nodes = np.flatnonzero(self.topology.node_cap > 0).tolist()
+        # per SFC: lower bound of the processing delay of the SFs from each position on (0 if it is random)
+        self.remaining_processing = {}
+        for sfc, sfs in self.sfcs.items():
+            delays = [0.0]
+            for sf in reversed(sfs):
+                attrs = self.simulator.sf_list.get(sf, {})
+                delays.append(delays[-1] + (0.0 if attrs.get('processing_delay_stdev') else
+                                            attrs.get('processing_delay_mean', 0.0)))
+            self.remaining_processing[sfc] = delays[::-1]
+        # egress node (None for flows without egress) -> (delay of each node to it, delay of each node to it via a node
+        # with capacity)
+        self.egress_delays = {}
+
+    def get_network_copy(self) -> nx.Graph:
+        """
+        Returns a deepcopy of the network topology and its current state. The returned network can be used by external
+        algorithms for e.g. calculating shortest path based on their restricted knowledge, without altering the internal
+        simulator state. GCASP itself only uses its topology and the remaining capacities of the states.
+        """
+        graph = nx.Graph()
+        for n in self.simulator.network.nodes(data=True):
+            graph.add_node(n[0], type=n[1]['type'], cap=n[1]['cap'], remaining_cap=n[1]['cap'],
+                           available_sf=copy.deepcopy(n[1]['available_sf']))
+        for e in self.simulator.network.edges(data=True):
+            graph.add_edge(e[0], e[1], delay=e[2]['delay'], cap=e[2]['cap'], remaining_cap=e[2]['cap'])
+        return graph
+
+    def init_flow(self, flow):
+        assert not hasattr(flow, 'metadata'), f"Flow {flow.flow_id} was already initialized by GCASP."
+        # flows without egress start at their target, so that a random target is chosen if they cannot be processed
+        target = flow.current_node_id if flow.egress_node_id is None else flow.egress_node_id
+        flow.metadata = FlowMeta(FlowState.GREEDY, self.node_index[target])
+        try:
+            self.set_new_path(flow)
+        except nx.NetworkXNoPath:
+            flow.metadata.state = FlowState.DROP
+            flow.metadata.path = []
+            self.drop_reason = 'no_path_to_egress'
+            self.instrumentation.count('drop')
+
+    def get_neighbor(self, node_id):
+        """Return neighbor index for given node ID. Raises an error if the node_id is not a neighbor."""
+        return self.node_and_neighbors.index(node_id)
+
+    def get_link_rem_cap(self, node_a, node_b):
+        """Remaining capacity of a link, taken from the batch snapshot if there is one."""
+        if self.snapshot is not None:
+            return self.snapshot.link_cap(node_a, node_b)
+        return self.simulator.params.network[node_a][node_b]['remaining_cap']
+
+    def path_fits(self, path, dr):
+        """Whether all links of a path of node indices have a remaining capacity of at least dr."""
+        node_ids = self.node_ids
+        return all(self.get_link_rem_cap(node_ids[a], node_ids[b]) >= dr for a, b in zip(path, path[1:]))
+
+    def reroute_path(self, flow, node):
+        """
+        Path from node to the target of a flow that avoids its blocked links, excluding node. Of the cached k shortest
+        paths that avoid the blocked links, the first one whose links currently all fit the flow is taken, else the
+        shortest of them, which is the shortest path avoiding the blocked links. Only if all k paths use a blocked
+        link, a new path is searched.
+        """
+        meta = flow.metadata
+        shortest = None
+        for path, links in self.path_engine.alternative_paths(node, meta.target_node):
+            if links & meta.blocked_links:
+                continue
+            if self.path_fits(path, flow.dr):
+                return path[1:]
+            if shortest is None:
+                shortest = path
+        if shortest is not None:
+            return shortest[1:]
+        self.instrumentation.count('reroute_search')
+        return self.path_engine.shortest_path(node, meta.target_node, meta.blocked_links)
+
+    def set_new_path(self, flow):
+        """
+        Calculate and set shortest path to the target node defined by target_node, taking blocked links into account.
+        Without blocked links, the flow follows the next-hop table and no explicit path is stored.
+        """
+        meta = flow.metadata
+        node = self.node_index[flow.current_node_id]
+        with self.instrumentation.phase('set_new_path'):
+            if meta.blocked_links:
+                meta.path = self.reroute_path(flow, node)
+            elif self.path_engine.next_hop[node, meta.target_node] < 0:
+                raise nx.NetworkXNoPath(f'No path between {flow.current_node_id} and '
+                                        f'{self.node_ids[meta.target_node]}.')
+            else:
+                meta.path = None
+
+    def next_node(self, flow):
+        """Return the ID of the next node of the flow, either from its explicit path or from the next-hop table."""
+        meta = flow.metadata
+        if meta.path is None:
+            node = self.node_index[flow.current_node_id]
+            next_node = int(self.path_engine.next_hop[node, meta.target_node])
+            assert next_node != node
+        else:
+            assert len(meta.path) > 0
+            next_node = meta.path.pop(0)
+        return self.node_ids[next_node]
+
+    def min_remaining_delay(self, flow, node):
+        """
+        Lower bound of the delay until a flow at node can leave the network at its egress node: the shortest delay to
+        the egress, via a node with capacity as long as SFs are left, plus the processing delay of the remaining SFs.
+        Flows without egress leave at any node once they are processed.
+        The delays to each egress node are computed on its first use, so each bound is a lookup.
+        """
+        egress = None if flow.egress_node_id is None else self.node_index[flow.egress_node_id]
+        delays = self.egress_delays.get(egress)
+        if delays is None:
+            delays = self.egress_delays[egress] = (
+                None if egress is None else self.path_engine.delays_to(egress),
+                self.path_engine.delays_via(egress, self.capable_nodes))
+        if flow.current_position == len(self.sfcs[flow.sfc]):
+            return 0.0 if egress is None else delays[0][node]
+        return delays[1][node] + self.remaining_processing[flow.sfc][flow.current_position]
+
+    def drop_flow(self, flow, reason):
+        """Since there's no drop flow option, just select a random action"""
+        flow.metadata.state = FlowState.DROP
+        flow.metadata.path = []
+        self.drop_reason = reason
+        self.instrumentation.count('drop')
+        return None
+
+    def select_neighbor(self, flow, link_rem_cap):
+        """
+        Select a neighbor by forwarding the flow along the precomputed path if possible. Else, reroute around the
+        links of the current node that lack capacity.
+        """
+        node_id = flow.current_node_id
+        meta = flow.metadata
+        next_neighbor_id = self.next_node(flow)
+
+        # Can forward?
+        if self.get_link_rem_cap(node_id, next_neighbor_id) >= flow.dr:
+            # yes => forward to next neighbor on path
+            return self.get_neighbor(next_neighbor_id)
+        else:
+            # no => adapt path
+            self.instrumentation.count('reroute')
+            self.rerouted = True
+            # remove all incident links which cannot be crossed
+            for neighbor_id, edge in self.incident_links[self.node_index[node_id]]:
+                if (self.get_link_rem_cap(node_id, neighbor_id) - flow.dr) < 0:
+                    meta.blocked_links |= 1 << edge
+            try:
+                # Try to find new path
+                self.set_new_path(flow)
+                next_neighbor_id = self.next_node(flow)
+                # Set forwarding rule
+                return self.get_neighbor(next_neighbor_id)
+            except nx.NetworkXNoPath:
+                # all outgoing links are exhausted
+                return self.drop_flow(flow, 'links_exhausted')
+
+        # this should never be reached
+        return None
+
+    def compute_action(self, state):
+        """
+        Compute the action for the flow in the given state, see decide()
+        """
+        self.instrumentation.count('decision')
+        self.num_decisions += 1
+        self.rerouted = False
+        self.drop_reason = None
+        with self.instrumentation.phase('compute_action'):
+            action = self.decide(state)
+        if self.decision_log is not None:
+            flow = state['flow']
+            self.decision_log.write(self.num_decisions, flow.flow_id, flow.current_node_id,
+                                    self.DROP_ACTION if action is None else action, self.rerouted, self.drop_reason)
+        return action
+
+    def compute_actions(self, states):
+        """
+        Compute the actions for several flows that are pending at the same time, e.g. returned by
+        SPRSimWrapper.apply_batch. The flows are decided one after another against a shared snapshot of the remaining
+        capacities, in which each decision reserves the node or link capacity it uses.
+        Returns an array with one action per state, using DROP_ACTION for dropped flows.
+        """
+        actions = np.full(len(states), self.DROP_ACTION, dtype=np.int64)
+        self.snapshot = CapacitySnapshot(self.simulator.params.network)
+        try:
+            for i, state in enumerate(states):
+                flow = state['flow']
+                action = self.compute_action(state)
+                if action is None:
+                    continue
+                actions[i] = action
+                if action > 0:
+                    self.snapshot.reserve_link(flow.current_node_id, self.node_and_neighbors[action], flow.dr)
+                elif flow.metadata.state == FlowState.GREEDY:
+                    self.snapshot.reserve_node(flow.current_node_id, flow.dr)
+        finally:
+            self.snapshot = None
+        return actions
+
+    def decide(self, state):
+        """
+        Copied and adjusted:
+        https://github.com/CN-UPB/distributed-coordination/blob/master/src/algorithms/greedy/gpasp.py#L88
+        Computed action:
+        0 = process locally
+        i > 0 --> forward to neighbor i
+        None: drop flow
+        """
+        # state: info about the incoming flow as well as node, link capacities, and distances of each neighbor
+        flow = state['flow']
+        node_rem_cap = state['rem_node_cap']
+        link_rem_cap = state.get('rem_link_cap')
+        self.node_and_neighbors = state.get('node_and_neighbors') or self.sim_wrapper.node_and_neighbors
+
+        # init metadata for flow, needed by GCASP
+        if not hasattr(flow, 'metadata'):
+            with self.instrumentation.phase('init_flow'):
+                self.init_flow(flow)
+
+        meta = flow.metadata
+        node_id = flow.current_node_id
+        node = self.node_index[node_id]
+        # Is flow fully processed?
+        if flow.current_position == len(self.sfcs[flow.sfc]):
+            # Needs the state to change?
+            if meta.state != FlowState.DEPARTURE:
+                # yes => switch to departure, forward to egress node
+                meta.state = FlowState.DEPARTURE
+                meta.blocked_links = 0
+                if flow.egress_node_id is not None:
+                    meta.target_node = self.node_index[flow.egress_node_id]
+                    try:
+                        self.set_new_path(flow)
+                    except nx.NetworkXNoPath:
+                        return self.drop_flow(flow, 'no_path_to_egress')
+        else:
+            # no, not fully processed
+            if node == meta.target_node:
+                # has flow arrived at targte node => set new random target distinct from the current node
+                while meta.target_node == node:
+                    meta.target_node = self.random.choice(self.all_nodes)
+                meta.blocked_links = 0
+                try:
+                    self.set_new_path(flow)
+                except nx.NetworkXNoPath:
+                    return self.drop_flow(flow, 'no_path_to_target')
+
+        # Can the flow still leave at its egress before its TTL runs out? If not, drop it now instead of letting it
+        # use capacity that other flows need
+        if self.ttl_check and flow.ttl < self.min_remaining_delay(flow, node):
+            return self.drop_flow(flow, 'ttl_infeasible')
+
+        # Determine Flow state
+        if meta.state == FlowState.GREEDY:
+            # One the way to the target, needs processing
+            # Can flow be processed at current node?
+            # TODO: adjust for other resource functions like here:
+            #  https://github.com/CN-UPB/distributed-coordination/blob/master/src/algorithms/greedy/gpasp.py#L140
+            own_rem_cap = node_rem_cap[0] if self.snapshot is None else self.snapshot.node_cap(node_id)
+            if own_rem_cap >= flow.dr:
+                # process locally (neighbor 0 = this node)
+                return 0
+            else:
+                # no => forward
+                with self.instrumentation.phase('select_neighbor'):
+                    return self.select_neighbor(flow, link_rem_cap)
+
+        elif meta.state == FlowState.DEPARTURE:
+            # Return to destination as soon as possible, no more processing necessary. Flows without egress leave
+            # right away
+            if flow.egress_node_id is not None and node_id != flow.egress_node_id:
+                with self.instrumentation.phase('select_neighbor'):
+                    return self.select_neighbor(flow, link_rem_cap)
+            return 0
+
+        # Should never be reached.
+        print("No action selected. This shouldn't happen.")
+        return None
+
+
+def build_topology(network):
+    """ Topology of a network including the next-hop table of GCASP, e.g. to share it with the workers of run_seeds """
+    topology = Topology.from_network(network)
+    topology.next_hop = ShortestPathEngine(topology).next_hop
+    return topology
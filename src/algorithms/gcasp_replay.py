@@ -0,0 +1,143 @@
+# Replays the states recorded by 'gcasp.py --record-states' into GCASP without the simulator, so that the cost of the
+# decisions can be profiled and changes of GCASP can be compared offline and deterministically:
+#     python src/algorithms/gcasp_replay.py results/<...>/states.gcasplog --repeat 5 --instrument
+
+import random
+import time
+from types import SimpleNamespace
+
+import click
+import networkx as nx
+import numpy as np
+
+from algorithms.gcasp_core import GCASP
+from auxiliary.instrumentation import Instrumentation, NullInstrumentation
+from auxiliary.state_log import read_state_log
+
+
+class ReplayFlow:
+    """ The attributes of a flow that GCASP reads, restored from the records """
+
+    def __init__(self, flow_id, sfc, dr, egress_node_id):
+        self.flow_id = flow_id
+        self.sfc = sfc
+        self.dr = dr
+        self.ttl = None
+        self.egress_node_id = egress_node_id
+        self.current_node_id = None
+        self.current_position = 0
+
+
+class ReplayRandom:
+    """
+    Returns the recorded random choice of the current decision, so that the replay picks the same target nodes as the
+    recorded run. Choices that were not recorded, e.g. of a changed GCASP, are drawn from a seeded generator.
+    """
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.next_choice = None
+
+    def choice(self, seq):
+        value, self.next_choice = self.next_choice, None
+        return self.rng.choice(seq) if value is None else value
+
+
+class ReplayWrapper:
+    """
+    Stands in for SPRSimWrapper. Its simulator only provides the network, whose remaining link capacities are set from
+    the records and their link reads before each decision, and the SFCs and SFs.
+    """
+
+    def __init__(self, header, instrumentation=None):
+        topology = header['topology']
+        network = nx.Graph()
+        for node_id, cap in zip(topology.nodes, topology.node_cap.tolist()):
+            network.add_node(node_id, cap=cap, remaining_cap=cap)
+        edges = zip(topology.edges.tolist(), topology.edge_delay.tolist(), topology.edge_cap.tolist())
+        for (a, b), delay, cap in edges:
+            network.add_edge(topology.nodes[a], topology.nodes[b], delay=delay, cap=cap, remaining_cap=cap)
+        self.simulator = SimpleNamespace(network=network, sfc_list=header['sfcs'], sf_list=header['sf_list'],
+                                         params=SimpleNamespace(network=network))
+        self.params = SimpleNamespace(net_degree=header['net_degree'])
+        self.instrumentation = instrumentation or NullInstrumentation()
+        self.node_and_neighbors = None
+
+
+def replay(path, instrumentation=None):
+    """
+    Feeds all states of a state log to a new GCASP instance with the recorded options, in the minimal state format of
+    SPRSimWrapper.
+
+    Returns:
+        - number of decisions
+        - number of decisions that differ from the recorded ones
+        - total wall time of GCASP.compute_action in seconds, excluding the decoding of the records
+    """
+    header, records, link_reads = read_state_log(path)
+    topology = header['topology']
+    wrapper = ReplayWrapper(header, instrumentation)
+    gcasp = GCASP(wrapper, topology=topology, **header['options'])
+    rng = gcasp.random = ReplayRandom(header['seed'])
+    nodes = topology.nodes
+    sfcs = list(header['sfcs'])
+    network = wrapper.simulator.network
+    # per node index: the node and neighbor IDs in the recorded order and the attributes of the links to the neighbors
+    node_and_neighbors = [[node_id] + [nodes[neighbor] for neighbor in topology.neighbours(i).tolist()]
+                          for i, node_id in enumerate(nodes)]
+    link_attrs = [[network[ids[0]][neighbor_id] for neighbor_id in ids[1:]] for ids in node_and_neighbors]
+    # per link read: the attributes of the link and its recorded capacity, see StateRecorder.attach
+    read_attrs = [(network[nodes[a]][nodes[b]], cap) for a, b, cap in link_reads.tolist()]
+    num_reads = 0
+    rem_node_cap = np.zeros(1, dtype=np.float32)
+    flows = {}
+    mismatches = 0
+    elapsed = 0.0
+    for flow_number, node, egress, sfc, position, dr, ttl, node_cap, link_cap, action, choice, reads \
+            in records.tolist():
+        flow = flows.get(flow_number)
+        if flow is None:
+            flow = flows[flow_number] = ReplayFlow(flow_number, sfcs[sfc], dr, None if egress < 0 else nodes[egress])
+        flow.current_node_id = nodes[node]
+        flow.current_position = position
+        flow.ttl = ttl
+        for attrs, cap in zip(link_attrs[node], link_cap.tolist()):
+            attrs['remaining_cap'] = cap
+        for attrs, cap in read_attrs[num_reads:num_reads + reads]:
+            attrs['remaining_cap'] = cap
+        num_reads += reads
+        rem_node_cap[0] = node_cap
+        rng.next_choice = None if choice < 0 else choice
+        state = {'flow': flow, 'node_and_neighbors': node_and_neighbors[node], 'rem_node_cap': rem_node_cap}
+
+        start = time.perf_counter()
+        result = gcasp.compute_action(state)
+        elapsed += time.perf_counter() - start
+        if (GCASP.DROP_ACTION if result is None else result) != action:
+            mismatches += 1
+        if action == GCASP.DROP_ACTION:
+            # dropped flows do not come back
+            del flows[flow_number]
+    return len(records), mismatches, elapsed
+
+
+@click.command()
+@click.argument('state_log', type=click.Path(exists=True))
+@click.option('-r', '--repeat', type=int, default=1, help='Number of replays')
+@click.option('--instrument', is_flag=True, help='Print the per-phase latencies of the decisions of each replay')
+def main(state_log, repeat, instrument):
+    """
+    Replay the states recorded by gcasp.py --record-states into GCASP
+    """
+    for i in range(repeat):
+        instrumentation = Instrumentation() if instrument else None
+        decisions, mismatches, elapsed = replay(state_log, instrumentation)
+        print(f'Replay {i + 1}: {decisions} decisions in {elapsed:.3f}s ({decisions / max(elapsed, 1e-9):.0f} '
+              f'decisions/s), {mismatches} differ from the recording')
+        if instrumentation is not None:
+            for phase, stats in instrumentation.summary()['phases'].items():
+                print(f'  {phase}: {stats}')
+
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,15 @@ import argparse
 import logging
 import os
 import random
+import sys
 from collections import defaultdict
-from datetime import datetime
-from pathlib import Path
 
-from common.common_functionalities import normalize_scheduling_probabilities, create_input_file, copy_input_files, \
-    get_ingress_nodes_and_cap
-from siminterface.simulator import Simulator
-from spinterface import SimulatorAction
-from tqdm import tqdm
+from algorithms.orchestrator import get_default_results_dir, get_timestamp, parse_seeds, run_seeds
 
 log = logging.getLogger(__name__)
-DATETIME = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-PROJECT_ROOT = str(Path(__file__).parent.parent.parent)
+# heavy modules that are only imported once they are needed, see --profile-startup
+LAZY_IMPORTS = ('numpy', 'tqdm', 'siminterface.simulator', 'spinterface', 'common.common_functionalities',
+                'auxiliary.network_cache', 'auxiliary.schedule')
 
 
 def get_placement(nodes_list, sf_list):
@@ -36,9 +32,9 @@ def get_placement(nodes_list, sf_list):
 
 
 def get_schedule(nodes_list, nodes_with_cap, sf_list, sfc_list):
-    """  return a dict of schedule for each node of the network
+    """  return a schedule for each node of the network, uniformly distributed over all nodes with capacity
        '''
-        Schedule is of the following form:
+        Schedule can be read like a dict of the following form:
             schedule : dict
                 {
                     'node id' : dict
@@ -55,26 +51,52 @@ def get_schedule(nodes_list, nodes_with_cap, sf_list, sfc_list):
         '''
     Parameters:
         nodes_list
+        nodes_with_cap
         sf_list
         sfc_list
 
     Returns:
-         schedule of the form shown above
+         schedule of the form shown above as a SparseSchedule. All (src, sfc, sf) share the same row, only
+         listing the nodes with capacity; all other nodes read as 0
     """
-    schedule = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(float))))
-    for outer_node in nodes_list:
-        for sfc in sfc_list:
-            for sf in sf_list:
-                # all 0's list
-                uniform_prob_list = [0 for _ in range(len(nodes_with_cap))]
-                # Uniformly distributing the schedules between all nodes
-                uniform_prob_list = normalize_scheduling_probabilities(uniform_prob_list)
-                for inner_node in nodes_list:
-                    if inner_node in nodes_with_cap:
-                        schedule[outer_node][sfc][sf][inner_node] = uniform_prob_list.pop()
-                    else:
-                        schedule[outer_node][sfc][sf][inner_node] = 0
-    return schedule
+    from auxiliary.schedule import SparseSchedule
+    return SparseSchedule(nodes_list, sfc_list, sf_list, default_dst_nodes=nodes_with_cap)
+
+
+def get_weighted_schedule(nodes_list, nodes_cap, sf_list, sfc_list, delay=None, delay_weight=0.0):
+    """  return a schedule for each node of the network, weighted by the capacity of the destination nodes
+    The probability of scheduling from src to dst is proportional to
+        cap(dst) / (1 + delay_weight * delay(src, dst))
+    so with delay_weight = 0 every node gets traffic proportional to its capacity, and with delay_weight > 0 nearby
+    nodes are preferred. Unreachable nodes and nodes without capacity get no traffic. The weights of all sources are
+    computed at once as an (src, dst) array; the row of a source is shared by all its SFCs and SFs.
+
+    Parameters:
+        nodes_list
+        nodes_cap: Capacity of each node in the network
+        sf_list
+        sfc_list
+        delay: optional array of shape (src, dst) with the delay between each pair of nodes, in the order of
+               nodes_list. Required if delay_weight > 0
+        delay_weight: discount per unit of delay
+
+    Returns:
+         schedule of the same form as get_schedule() as a SparseSchedule
+    """
+    import numpy as np
+
+    from auxiliary.schedule import SparseSchedule, normalize_rows
+
+    cap = np.array([max(nodes_cap[node], 0) for node in nodes_list], dtype=np.float64)
+    if not delay_weight:
+        # all rows are equal, so the default row is enough
+        return SparseSchedule(nodes_list, sfc_list, sf_list, default_dst_nodes=dict(zip(nodes_list, cap.tolist())))
+    if delay is None:
+        raise ValueError('The delay between the nodes is required for a delay_weight > 0.')
+    # unreachable nodes have an infinite delay and therefore a weight of 0
+    weights = cap[np.newaxis, :] / (1.0 + delay_weight * np.asarray(delay, dtype=np.float64))
+    probs = normalize_rows(weights, mask=cap > 0)
+    return SparseSchedule.from_source_probs(nodes_list, sfc_list, sf_list, probs)
 
 
 def parse_args():
@@ -84,55 +106,122 @@ def parse_args():
     parser.add_argument('-n', '--network', required=True, dest='network')
     parser.add_argument('-sf', '--service_functions', required=True, dest="service_functions")
     parser.add_argument('-c', '--config', required=True, dest="config")
+    parser.add_argument('--seeds', required=False, nargs='+', dest="seeds",
+                        help="Run several seeds in parallel, given as a list or a file with one seed per line")
+    parser.add_argument('--profile-startup', action='store_true', dest="profile_startup",
+                        help="Report the import time of this command and its dependencies, then exit")
+    parser.add_argument('-w', '--workers', required=False, default=os.cpu_count(), dest="workers", type=int,
+                        help="Number of worker processes for --seeds")
+    parser.add_argument('--weighted', action='store_true', dest="weighted",
+                        help="Schedule proportionally to the capacity of the nodes instead of uniformly")
+    parser.add_argument('--delay-weight', required=False, default=0.0, dest="delay_weight", type=float,
+                        help="With --weighted, discount the capacity of a node by 1 / (1 + delay_weight * delay)")
     return parser.parse_args()
 
 
-def main():
-    # Parse arguments
-    args = parse_args()
-    if not args.seed:
-        args.seed = random.randint(1, 9999)
-    logging.basicConfig(level=logging.WARNING)
-    logging.getLogger("coordsim").setLevel(logging.WARNING)
+def run(network, service_functions, config, iterations, seed, results_dir=None, cache=None, progress=True,
+        weighted=False, delay_weight=0.0):
+    """
+    Runs the Load Balance algorithm against the simulator and writes the simulator results to results_dir
 
-    # Creating the results directory variable where the simulator result files will be written
-    network_stem = os.path.splitext(os.path.basename(args.network))[0]
-    service_function_stem = os.path.splitext(os.path.basename(args.service_functions))[0]
-    simulator_config_stem = os.path.splitext(os.path.basename(args.config))[0]
+    Parameters:
+        network: path of the network file
+        service_functions: path of the service functions file
+        config: path of the simulator config file
+        iterations: the number of times apply() is called
+        seed: seed of the simulator
+        results_dir: directory for the result files, by default
+                     results/<network>/<service functions>/<config>/<current time>_seed<seed>
+        cache: optional dict to reuse the fixed action of previous runs with the same network and service functions
+        progress: whether to show a progress bar of the iterations
+        weighted: schedule proportionally to the node capacities, see get_weighted_schedule
+        delay_weight: with weighted, discount of the node capacities by the delay from the source node
 
-    results_dir = f"{PROJECT_ROOT}/results/{network_stem}/{service_function_stem}/{simulator_config_stem}" \
-                  f"/{DATETIME}_seed{args.seed}"
+    Returns:
+        the results directory
+    """
+    # the simulator and its dependencies are only imported once a run starts, so that the command line starts fast
+    import numpy as np
+    from common.common_functionalities import create_input_file, copy_input_files, get_ingress_nodes_and_cap
+    from siminterface.simulator import Simulator
+    from spinterface import SimulatorAction
+    from tqdm import tqdm
+
+    from auxiliary.network_cache import load_network_tables
+
+    if results_dir is None:
+        # Creating the results directory variable where the simulator result files will be written
+        results_dir = get_default_results_dir(network, service_functions, config, seed)
+    network = os.path.abspath(network)
+    service_functions = os.path.abspath(service_functions)
+    config = os.path.abspath(config)
 
     # creating the simulator
-    simulator = Simulator(os.path.abspath(args.network),
-                          os.path.abspath(args.service_functions),
-                          os.path.abspath(args.config), test_mode=True, test_dir=results_dir)
-    init_state = simulator.init(args.seed)
+    simulator = Simulator(network, service_functions, config, test_mode=True, test_dir=results_dir)
+    init_state = simulator.init(seed)
     log.info("Network Stats after init(): %s", init_state.network_stats)
-    nodes_list = [node['id'] for node in init_state.network.get('nodes')]
-    nodes_with_capacity = []
-    for node in simulator.network.nodes(data=True):
-        if node[1]['cap'] > 0:
-            nodes_with_capacity.append(node[0])
-    sf_list = list(init_state.service_functions.keys())
-    sfc_list = list(init_state.sfcs.keys())
-    ingress_nodes = get_ingress_nodes_and_cap(simulator.network)
-    # we place every sf on each node of the network with some capacity, so placement is calculated only once
-    placement = get_placement(nodes_with_capacity, sf_list)
-    # Uniformly distributing the schedule for all Nodes with some capacity
-    schedule = get_schedule(nodes_list, nodes_with_capacity, sf_list, sfc_list)
-    # Since the placement and the schedule are fixed , the action would also be the same throughout
-    action = SimulatorAction(placement, schedule)
+    cache_key = ("LB", network, service_functions, weighted, delay_weight)
+    if cache is not None and cache_key in cache:
+        action, num_ingress = cache[cache_key]
+    else:
+        nodes_list = [node['id'] for node in init_state.network.get('nodes')]
+        nodes_with_capacity = []
+        for node in simulator.network.nodes(data=True):
+            if node[1]['cap'] > 0:
+                nodes_with_capacity.append(node[0])
+        sf_list = list(init_state.service_functions.keys())
+        sfc_list = list(init_state.sfcs.keys())
+        num_ingress = len(get_ingress_nodes_and_cap(simulator.network))
+        # we place every sf on each node of the network with some capacity, so placement is calculated only once
+        placement = get_placement(nodes_with_capacity, sf_list)
+        if weighted:
+            # Distributing the schedule proportionally to the capacity of the nodes
+            nodes_cap = {node: cap for node, cap in simulator.network.nodes(data='cap')}
+            delay = None
+            if delay_weight:
+                tables = load_network_tables(network)
+                rows = [tables.node_index[node] for node in nodes_list]
+                delay = tables.delay[np.ix_(rows, rows)]
+            schedule = get_weighted_schedule(nodes_list, nodes_cap, sf_list, sfc_list, delay, delay_weight)
+        else:
+            # Uniformly distributing the schedule for all Nodes with some capacity
+            schedule = get_schedule(nodes_list, nodes_with_capacity, sf_list, sfc_list)
+        # Since the placement and the schedule are fixed , the action would also be the same throughout
+        action = SimulatorAction(placement, schedule)
+        if cache is not None:
+            cache[cache_key] = (action, num_ingress)
     # iterations define the number of time we wanna call apply()
-    log.info(f"Running for {args.iterations} iterations...")
-    for i in tqdm(range(args.iterations)):
+    log.info(f"Running for {iterations} iterations...")
+    for i in tqdm(range(iterations), disable=not progress):
         _ = simulator.apply(action)
     # We copy the input files(network, simulator config....) to  the results directory
-    copy_input_files(results_dir, os.path.abspath(args.network), os.path.abspath(args.service_functions),
-                     os.path.abspath(args.config))
+    copy_input_files(results_dir, network, service_functions, config)
     # Creating the input file in the results directory containing the num_ingress and the Algo used attributes
-    create_input_file(results_dir, len(ingress_nodes), "LB")
+    create_input_file(results_dir, num_ingress, "LB")
     log.info(f"Saved results in {results_dir}")
+    return results_dir
+
+
+def main():
+    if '--profile-startup' in sys.argv[1:]:
+        # checked before parsing, so that the required arguments can be omitted
+        from auxiliary.startup import report_startup
+        raise SystemExit(0 if report_startup('algorithms.loadBalance', LAZY_IMPORTS) else 1)
+    # Parse arguments
+    args = parse_args()
+    if not args.seed:
+        args.seed = random.randint(1, 9999)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("coordsim").setLevel(logging.WARNING)
+    if args.seeds:
+        failed = run_seeds('lb', args.network, args.service_functions, args.config, args.iterations,
+                           parse_seeds(args.seeds), get_timestamp(), workers=args.workers,
+                           options=dict(weighted=args.weighted, delay_weight=args.delay_weight))
+        if failed:
+            raise SystemExit(1)
+        return
+    run(args.network, args.service_functions, args.config, args.iterations, args.seed,
+        weighted=args.weighted, delay_weight=args.delay_weight)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,196 @@
+import argparse
+import importlib
+import logging
+import os
+import time
+from datetime import datetime
+from itertools import product
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+PROJECT_ROOT = str(Path(__file__).parent.parent.parent)
+# modules of the algorithms that can be run by the orchestrator; each of them provides a run() function
+ALGORITHMS = {
+    'rs': 'algorithms.randomSchedule',
+    'lb': 'algorithms.loadBalance',
+    'sp': 'algorithms.shortestPath',
+}
+# written to the results directory of a run once it finished successfully
+COMPLETED_MARKER = '.completed'
+
+# cache that lives as long as the worker process, so that runs on the same network and service functions can reuse
+# the fixed actions of the static algorithms
+_worker_cache = {}
+
+
+def read_list_file(path):
+    """ Reads a file with one entry per line, e.g. scripts/network_files.txt, ignoring empty lines """
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def parse_seeds(values):
+    """ Seeds given on the command line, either as a list of integers or as a single file with one seed per line """
+    if len(values) == 1 and os.path.isfile(values[0]):
+        values = read_list_file(values[0])
+    return [int(seed) for seed in values]
+
+
+def get_timestamp():
+    return datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+
+def get_default_results_dir(network, service_functions, config, seed, timestamp=None):
+    """
+    Returns the default results directory of a single run of rs, lb or sp:
+        <project root>/results/<network>/<service functions>/<config>/<timestamp>_seed<seed>
+    The timestamp defaults to the current time.
+    """
+    timestamp = timestamp or get_timestamp()
+    network_stem = os.path.splitext(os.path.basename(network))[0]
+    service_function_stem = os.path.splitext(os.path.basename(service_functions))[0]
+    simulator_config_stem = os.path.splitext(os.path.basename(config))[0]
+    return f"{PROJECT_ROOT}/results/{network_stem}/{service_function_stem}/{simulator_config_stem}" \
+           f"/{timestamp}_seed{seed}"
+
+
+def get_results_dir(results_root, algo, network, service_functions, config, seed):
+    """
+    Returns the results directory of a single run. Runs are namespaced by algorithm so that all algorithms can run
+    at the same time:
+        <results_root>/<algo>/<network>/<service functions>/<config>/seed<seed>
+    """
+    network_stem = os.path.splitext(os.path.basename(network))[0]
+    service_function_stem = os.path.splitext(os.path.basename(service_functions))[0]
+    simulator_config_stem = os.path.splitext(os.path.basename(config))[0]
+    return os.path.join(results_root, algo, network_stem, service_function_stem, simulator_config_stem, f"seed{seed}")
+
+
+def get_scenarios(algorithms, networks, services, configs, seeds, iterations, results_root, force=False):
+    """
+    Creates the scenario matrix algorithms x networks x services x configs x seeds.
+
+    Returns:
+        - list of scenarios to run, each a dict with the arguments of run_scenario()
+        - number of skipped scenarios whose results already exist
+    """
+    scenarios = []
+    skipped = 0
+    for algo, network, service_functions, config, seed in product(algorithms, networks, services, configs, seeds):
+        results_dir = get_results_dir(results_root, algo, network, service_functions, config, seed)
+        if not force and os.path.exists(os.path.join(results_dir, COMPLETED_MARKER)):
+            skipped += 1
+            continue
+        scenarios.append(dict(algo=algo, network=network, service_functions=service_functions, config=config,
+                              iterations=iterations, seed=int(seed), results_dir=results_dir))
+    return scenarios, skipped
+
+
+def run_scenario(algo, network, service_functions, config, iterations, seed, results_dir, options=None):
+    """
+    Runs a single scenario inside a worker process and returns its wall time in seconds.
+    options are passed on to the run() function of the algorithm, e.g. weighted for lb.
+    """
+    logging.getLogger("coordsim").setLevel(logging.WARNING)
+    module = importlib.import_module(ALGORITHMS[algo])
+    kwargs = dict(results_dir=results_dir, progress=False, **(options or {}))
+    # the static algorithms can reuse their action between runs of the same worker
+    if algo != 'rs':
+        kwargs['cache'] = _worker_cache
+    start = time.perf_counter()
+    module.run(network, service_functions, config, iterations, seed, **kwargs)
+    os.makedirs(results_dir, exist_ok=True)
+    Path(results_dir, COMPLETED_MARKER).touch()
+    return time.perf_counter() - start
+
+
+def run_all(scenarios, workers):
+    """
+    Runs all scenarios on a pool of worker processes and reports progress and throughput.
+
+    Returns:
+        list of scenarios that failed
+    """
+    # imported here, so that the command line tools that use this module start fast
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from tqdm import tqdm
+
+    failed = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_scenario, **scenario): scenario for scenario in scenarios}
+        with tqdm(total=len(futures), unit='run') as progress:
+            for future in as_completed(futures):
+                scenario = futures[future]
+                try:
+                    future.result()
+                except Exception:
+                    log.exception(f"Run failed: {scenario}")
+                    failed.append(scenario)
+                progress.update()
+                elapsed = time.perf_counter() - start
+                progress.set_postfix(runs_per_min=f"{60 * progress.n / elapsed:.1f}", failed=len(failed))
+    elapsed = time.perf_counter() - start
+    log.info(f"Finished {len(scenarios)} runs in {elapsed:.1f}s ({60 * len(scenarios) / max(elapsed, 1e-9):.1f} "
+             f"runs/min), {len(failed)} failed")
+    return failed
+
+
+def run_seeds(algo, network, service_functions, config, iterations, seeds, timestamp, workers=None, options=None):
+    """
+    Runs one algorithm on a single scenario for several seeds on a pool of worker processes, e.g. for the --seeds
+    option of rs, lb and sp. Each worker imports the algorithm once and reuses the fixed action of lb and sp for all of
+    its seeds. Every seed writes to its own default results directory, see get_default_results_dir.
+
+    Returns:
+        list of scenarios that failed
+    """
+    scenarios = [dict(algo=algo, network=network, service_functions=service_functions, config=config,
+                      iterations=iterations, seed=seed, options=options,
+                      results_dir=get_default_results_dir(network, service_functions, config, seed, timestamp))
+                 for seed in seeds]
+    log.info(f"Running {len(seeds)} seeds on {workers or os.cpu_count()} workers")
+    return run_all(scenarios, workers)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the baseline algorithms for all scenarios in parallel")
+    parser.add_argument('-a', '--algorithms', required=False, nargs='+', default=list(ALGORITHMS),
+                        choices=list(ALGORITHMS), dest="algorithms")
+    parser.add_argument('-n', '--networks', required=False, dest='networks',
+                        default=os.path.join('scripts', 'network_files.txt'),
+                        help="File with one network file location per line")
+    parser.add_argument('-sf', '--service_functions', required=False, dest="service_functions",
+                        default=os.path.join('scripts', 'service_files.txt'),
+                        help="File with one SFC file location per line")
+    parser.add_argument('-c', '--configs', required=False, dest="configs",
+                        default=os.path.join('scripts', 'config_files.txt'),
+                        help="File with one simulator config file location per line")
+    parser.add_argument('-s', '--seeds', required=False, dest="seeds",
+                        default=os.path.join('scripts', '30seeds.txt'), help="File with one seed per line")
+    parser.add_argument('-i', '--iterations', required=False, default=200, dest="iterations", type=int)
+    parser.add_argument('-w', '--workers', required=False, default=os.cpu_count(), dest="workers", type=int)
+    parser.add_argument('-o', '--output', required=False, default=os.path.join(PROJECT_ROOT, 'results'),
+                        dest="output", help="Root directory of the results")
+    parser.add_argument('-f', '--force', required=False, action='store_true', dest="force",
+                        help="Rerun scenarios whose results already exist")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("coordsim").setLevel(logging.WARNING)
+
+    scenarios, skipped = get_scenarios(args.algorithms, read_list_file(args.networks),
+                                       read_list_file(args.service_functions), read_list_file(args.configs),
+                                       read_list_file(args.seeds), args.iterations, os.path.abspath(args.output),
+                                       force=args.force)
+    log.info(f"Running {len(scenarios)} runs on {args.workers} workers, skipping {skipped} completed runs")
+    failed = run_all(scenarios, args.workers)
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,21 +2,15 @@ import argparse
 import logging
 import os
 import random
+import sys
 from collections import defaultdict
-from datetime import datetime
-from pathlib import Path
-from random import uniform
 
-from common.common_functionalities import normalize_scheduling_probabilities, \
-    get_ingress_nodes_and_cap, copy_input_files, create_input_file
-# for use with the flow-level simulator https://github.com/RealVNF/coordination-simulation (after installation)
-from siminterface.simulator import Simulator
-from spinterface import SimulatorAction
-from tqdm import tqdm
+from algorithms.orchestrator import get_default_results_dir, get_timestamp, parse_seeds, run_seeds
 
 log = logging.getLogger(__name__)
-DATETIME = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-PROJECT_ROOT = str(Path(__file__).parent.parent.parent)
+# heavy modules that are only imported once they are needed, see --profile-startup
+LAZY_IMPORTS = ('tqdm', 'siminterface.simulator', 'spinterface', 'common.common_functionalities',
+                'auxiliary.schedule')
 
 
 def get_placement(nodes_list, sf_list):
@@ -38,10 +32,11 @@ def get_placement(nodes_list, sf_list):
 
 
 def get_schedule(nodes_list, sf_list, sfc_list):
-    """  return a dict of schedule for each node of the network
-    for each node in the network, we generate floating point random numbers in the range 0 to 1
+    """  return a schedule for each node of the network
+    for each node in the network, we generate floating point random numbers in the range 0 to 1 and normalize them
+    to sum up to 1. All entries are sampled in one batch into a ScheduleTensor of shape (src, sfc, sf, dst)
         '''
-        Schedule is of the following form:
+        Schedule can be read like a dict of the following form:
             schedule : dict
                 {
                     'node id' : dict
@@ -64,21 +59,8 @@ def get_schedule(nodes_list, sf_list, sfc_list):
     Returns:
          schedule of the form shown above
     """
-    schedule = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(float))))
-    for outer_node in nodes_list:
-        for sfc in sfc_list:
-            for sf in sf_list:
-                # this list may not sum to 1
-                random_prob_list = [uniform(0, 1) for _ in range(len(nodes_list))]
-                # Because of floating point precision (.59 + .33 + .08) can be equal to .99999999
-                # So we correct the sum only if the absolute diff. is more than a tolerance(0.000000014901161193847656)
-                random_prob_list = normalize_scheduling_probabilities(random_prob_list)
-                for inner_node in nodes_list:
-                    if len(random_prob_list) != 0:
-                        schedule[outer_node][sfc][sf][inner_node] = random_prob_list.pop()
-                    else:
-                        schedule[outer_node][sfc][sf][inner_node] = 0
-    return schedule
+    from auxiliary.schedule import ScheduleTensor
+    return ScheduleTensor.random(nodes_list, sfc_list, sf_list)
 
 
 def parse_args():
@@ -88,30 +70,49 @@ def parse_args():
     parser.add_argument('-n', '--network', required=True, dest='network')
     parser.add_argument('-sf', '--service_functions', required=True, dest="service_functions")
     parser.add_argument('-c', '--config', required=True, dest="config")
+    parser.add_argument('--seeds', required=False, nargs='+', dest="seeds",
+                        help="Run several seeds in parallel, given as a list or a file with one seed per line")
+    parser.add_argument('--profile-startup', action='store_true', dest="profile_startup",
+                        help="Report the import time of this command and its dependencies, then exit")
+    parser.add_argument('-w', '--workers', required=False, default=os.cpu_count(), dest="workers", type=int,
+                        help="Number of worker processes for --seeds")
     return parser.parse_args()
 
 
-def main():
-    # Parse arguments
-    args = parse_args()
-    if not args.seed:
-        args.seed = random.randint(1, 9999)
-    logging.basicConfig(level=logging.INFO)
-    logging.getLogger("coordsim").setLevel(logging.WARNING)
+def run(network, service_functions, config, iterations, seed, results_dir=None, progress=True):
+    """
+    Runs the Random Schedule algorithm against the simulator and writes the simulator results to results_dir
 
-    # Creating the results directory variable where the simulator result files will be written
-    network_stem = os.path.splitext(os.path.basename(args.network))[0]
-    service_function_stem = os.path.splitext(os.path.basename(args.service_functions))[0]
-    simulator_config_stem = os.path.splitext(os.path.basename(args.config))[0]
+    Parameters:
+        network: path of the network file
+        service_functions: path of the service functions file
+        config: path of the simulator config file
+        iterations: the number of times apply() is called
+        seed: seed of the simulator
+        results_dir: directory for the result files, by default
+                     results/<network>/<service functions>/<config>/<current time>_seed<seed>
+        progress: whether to show a progress bar of the iterations
 
-    results_dir = f"{PROJECT_ROOT}/results/{network_stem}/{service_function_stem}/{simulator_config_stem}" \
-                  f"/{DATETIME}_seed{args.seed}"
+    Returns:
+        the results directory
+    """
+    # the simulator and its dependencies are only imported once a run starts, so that the command line starts fast
+    from common.common_functionalities import create_input_file, copy_input_files, get_ingress_nodes_and_cap
+    # for use with the flow-level simulator https://github.com/RealVNF/coordination-simulation (after installation)
+    from siminterface.simulator import Simulator
+    from spinterface import SimulatorAction
+    from tqdm import tqdm
+
+    if results_dir is None:
+        # Creating the results directory variable where the simulator result files will be written
+        results_dir = get_default_results_dir(network, service_functions, config, seed)
+    network = os.path.abspath(network)
+    service_functions = os.path.abspath(service_functions)
+    config = os.path.abspath(config)
 
     # creating the simulator
-    simulator = Simulator(os.path.abspath(args.network),
-                          os.path.abspath(args.service_functions),
-                          os.path.abspath(args.config), test_mode=True, test_dir=results_dir)
-    init_state = simulator.init(args.seed)
+    simulator = Simulator(network, service_functions, config, test_mode=True, test_dir=results_dir)
+    init_state = simulator.init(seed)
     log.info("Network Stats after init(): %s", init_state.network_stats)
     nodes_list = [node['id'] for node in init_state.network.get('nodes')]
     sf_list = list(init_state.service_functions.keys())
@@ -120,18 +121,38 @@ def main():
     # we place every sf in each node of the network, so placement is calculated only once
     placement = get_placement(nodes_list, sf_list)
     # iterations define the number of time we wanna call apply()
-    log.info(f"Running for {args.iterations} iterations...")
-    for i in tqdm(range(args.iterations)):
+    log.info(f"Running for {iterations} iterations...")
+    for i in tqdm(range(iterations), disable=not progress):
         schedule = get_schedule(nodes_list, sf_list, sfc_list)
         action = SimulatorAction(placement, schedule)
         _ = simulator.apply(action)
 
     # We copy the input files(network, simulator config....) to  the results directory
-    copy_input_files(results_dir, os.path.abspath(args.network), os.path.abspath(args.service_functions),
-                     os.path.abspath(args.config))
+    copy_input_files(results_dir, network, service_functions, config)
     # Creating the input file in the results directory containing the num_ingress and the Algo used attributes
     create_input_file(results_dir, len(ingress_nodes), "Rand")
     log.info(f"Saved results in {results_dir}")
+    return results_dir
+
+
+def main():
+    if '--profile-startup' in sys.argv[1:]:
+        # checked before parsing, so that the required arguments can be omitted
+        from auxiliary.startup import report_startup
+        raise SystemExit(0 if report_startup('algorithms.randomSchedule', LAZY_IMPORTS) else 1)
+    # Parse arguments
+    args = parse_args()
+    if not args.seed:
+        args.seed = random.randint(1, 9999)
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("coordsim").setLevel(logging.WARNING)
+    if args.seeds:
+        failed = run_seeds('rs', args.network, args.service_functions, args.config, args.iterations,
+                           parse_seeds(args.seeds), get_timestamp(), workers=args.workers)
+        if failed:
+            raise SystemExit(1)
+        return
+    run(args.network, args.service_functions, args.config, args.iterations, args.seed)
 
 
 if __name__ == '__main__':
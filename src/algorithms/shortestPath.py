@@ -2,81 +2,111 @@ import argparse
 import logging
 import os
 import random
+import sys
 from collections import defaultdict
-from datetime import datetime
-from pathlib import Path
 
-from common.common_functionalities import normalize_scheduling_probabilities, create_input_file, \
-    copy_input_files, get_ingress_nodes_and_cap
-from siminterface.simulator import Simulator
-from spinterface import SimulatorAction
-from tqdm import tqdm
+from algorithms.orchestrator import get_default_results_dir, get_timestamp, parse_seeds, run_seeds
 
 log = logging.getLogger(__name__)
-DATETIME = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-PROJECT_ROOT = str(Path(__file__).parent.parent.parent)
+# heavy modules that are only imported once they are needed, see --profile-startup
+LAZY_IMPORTS = ('numpy', 'tqdm', 'siminterface.simulator', 'spinterface', 'common.common_functionalities',
+                'auxiliary.network_cache', 'auxiliary.schedule')
 
 
-def get_closest_neighbours(network, nodes_list):
+def get_neighbour_order(network, nodes_list, tables=None):
     """
-    Finding the closest neighbours to each node in the network. For each node of the network we maintain a list of
-    neighbours sorted in increasing order of distance to it.
+    Sorts the other nodes of each node of the network by increasing delay.
     params:
         network: A networkX graph
         nodes_list: a list of nodes in the Network
+        tables: optional NetworkTables of the network with the precomputed neighbour order, avoids sorting
     Returns:
-         closest_neighbour: A dict containing lists of closest neighbour to each node in the network sorted in
-                            increasing order to distance.
+         array of shape (N, N - 1): row i holds the indices (in nodes_list) of the neighbours of nodes_list[i],
+         sorted in increasing order of distance
     """
+    import numpy as np
+    from auxiliary.network_cache import sort_neighbours_by_delay
+
+    node_index = {node: i for i, node in enumerate(nodes_list)}
+    if tables is not None and set(tables.nodes) == set(nodes_list):
+        # translate the node indices of the tables to indices in nodes_list
+        to_list_index = np.array([node_index[node] for node in tables.nodes], dtype=np.int32)
+        rows = [tables.node_index[node] for node in nodes_list]
+        return to_list_index[tables.neighbour_order[rows]]
 
     all_pair_shortest_paths = network.graph['shortest_paths']
-    closest_neighbours = defaultdict(list)
+    delay = np.zeros((len(nodes_list), len(nodes_list)))
     for source in nodes_list:
-        neighbours = defaultdict(int)
         for dest in nodes_list:
             if source != dest:
-                delay = all_pair_shortest_paths[(source, dest)][1]
-                neighbours[dest] = delay
-        sorted_neighbours = [k for k, v in sorted(neighbours.items(), key=lambda item: item[1])]
-        closest_neighbours[source] = sorted_neighbours
+                delay[node_index[source], node_index[dest]] = all_pair_shortest_paths[(source, dest)][1]
+    return sort_neighbours_by_delay(delay)
+
+
+def get_closest_neighbours(network, nodes_list, tables=None):
+    """
+    Finding the closest neighbours to each node in the network. For each node of the network we maintain a list of
+    neighbours sorted in increasing order of distance to it.
+    params:
+        network: A networkX graph
+        nodes_list: a list of nodes in the Network
+        tables: optional NetworkTables of the network with the precomputed neighbour order, avoids sorting
+    Returns:
+         closest_neighbour: A dict containing lists of closest neighbour to each node in the network sorted in
+                            increasing order to distance.
+    """
+    neighbour_order = get_neighbour_order(network, nodes_list, tables)
+    closest_neighbours = defaultdict(list)
+    for source, order in zip(nodes_list, neighbour_order):
+        closest_neighbours[source] = [nodes_list[i] for i in order]
     return closest_neighbours
 
 
-def next_neighbour(index, num_vnfs_filled, node, placement, closest_neighbours, sf_list, nodes_cap):
+def next_neighbour(node, num_vnfs_filled, neighbours, non_ingress_neighbours, num_sfs):
     """
-    Finds the next available neighbour to the index node
+    Finds the closest available neighbour of a node
     Args:
-        index: closest neighbours of 'node' is a list, index tells which closest neighbour to start looking from
+        node: index of the node whose closest neighbour is to be found
         num_vnfs_filled: Tells the number of VNFs present on all nodes e.g: every node in the network has atleast 1 VNF,
                           some might have more than that. This tells us the minimum every node has
-        node: The node whose closest neighbour is to be found
-        placement: placeement of VNFs in the entire network
-        closest_neighbours: neighbours of each node in the network in the increasing order of distance
-        sf_list: The VNFs in the network
-        nodes_cap: Capacity of each node in the network
+        neighbours: NeighbourIndex of all nodes with some capacity
+        non_ingress_neighbours: NeighbourIndex of all nodes with some capacity that are not ingress nodes
+        num_sfs: The number of VNFs in the network
 
     Returns:
-            The next closest neighbour of the requested node that:
+            The position in the neighbour order of node of the next closest neighbour that:
             - has some capacity
+            - while some nodes in the network has 0 VNFs , is not an Ingress node
             - while some of the nodes in the network have 0 VNFs it returns the closest neighbour that has 0 VNFs,
               If some nodes in the network has just 1 VNF, it returns the closest neighbour with just 1 VNF and so on
     """
-    while len(placement[closest_neighbours[node][index]]) > num_vnfs_filled[0] or \
-            nodes_cap[closest_neighbours[node][index]] == 0:
-        index += 1
-        if index == len(closest_neighbours[node]):
-            num_vnfs_filled[0] += 1
-            index = 0
-        if num_vnfs_filled[0] > len(sf_list):
-            index = 0
-            break
+    if num_vnfs_filled[0] > num_sfs:
+        # no neighbour was available at any level, fall back to the closest neighbour
+        return 0
+    if num_vnfs_filled[0] == 0:
+        index = non_ingress_neighbours.first(node, 0)
+        if index is not None:
+            return index
+        # only ingress nodes are left without VNFs; the farthest neighbour is still taken if it is one of them
+        last = neighbours.num_positions - 1
+        if neighbours.value(node, last) <= 0:
+            return last
+        num_vnfs_filled[0] += 1
+        if num_vnfs_filled[0] > num_sfs:
+            return 0
+    index = neighbours.first(node, num_vnfs_filled[0])
+    while index is None:
+        num_vnfs_filled[0] += 1
+        if num_vnfs_filled[0] > num_sfs:
+            return 0
+        index = neighbours.first(node, num_vnfs_filled[0])
     return index
 
 
-def get_placement_schedule(network, nodes_list, sf_list, sfc_list, ingress_nodes, nodes_cap):
+def get_placement_schedule(network, nodes_list, sf_list, sfc_list, ingress_nodes, nodes_cap, tables=None):
     """
         '''
-        Schedule is of the following form:
+        Schedule can be read like a dict of the following form:
             schedule : dict
                 {
                     'node id' : dict
@@ -99,80 +129,172 @@ def get_placement_schedule(network, nodes_list, sf_list, sfc_list, ingress_nodes
         sfc_list: all the SFCs in the network, right now assuming to be just 1
         ingress_nodes: all the ingress nodes in the network
         nodes_cap: Capacity of each node in the network
+        tables: optional NetworkTables of the network, see get_neighbour_order
 
     Returns:
         - a placement Dictionary with:
               key = nodes of the network
               value = list of all the SFs in the network
-        - schedule of the form shown above
-    """
-    placement = defaultdict(list)
-    schedule = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(float))))
-    # Initializing the schedule for all nodes, for all SFs to 0
-    for src in nodes_list:
-        for sfc in sfc_list:
-            for sf in sf_list:
-                for dstn in nodes_list:
-                    schedule[src][sfc][sf][dstn] = 0
-    # Getting the closest neighbours to each node in the network
-    closest_neighbours = get_closest_neighbours(network, nodes_list)
-
-    # - For each Ingress node of the network we start by placing the first VNF of the SFC on it and then place the
-    #  2nd VNF of the SFC on the closest neighbour of the Ingress, then the 3rd VNF on the closest neighbour of the node
-    #  where we placed the 2nd VNF and so on.
-    # - The closest neighbour is chosen based on the following criteria:
-    #   - while some nodes in the network has 0 VNFs , the closest neighbour cannot be an Ingress node
-    #   - The closest neighbour must have some capacity
-    #   - while some of the nodes in the network have 0 VNFs it chooses the closest neighbour that has 0 VNFs,
-    #     If some nodes in the network has just 1 VNF, it returns the closest neighbour with just 1 VNF and so on
-    for ingress in ingress_nodes:
+        - schedule of the form shown above as a SparseSchedule, which only stores the non-zero destinations
+    """
+    planner = ShortestPathPlanner(network, nodes_list, sf_list, sfc_list, ingress_nodes, nodes_cap, tables)
+    return planner.placement, planner.schedule
+
+
+def get_hot_nodes(network, threshold):
+    """
+    Returns the nodes whose utilization (share of used capacity) is at least threshold. network is the network of
+    the simulator, whose nodes hold their capacity 'cap' and their currently remaining capacity 'remaining_cap'
+    """
+    return {node for node, attrs in network.nodes(data=True)
+            if attrs['cap'] > 0 and 1 - attrs['remaining_cap'] / attrs['cap'] >= threshold}
+
+
+class ShortestPathPlanner:
+    """
+    Placement and schedule of the Shortest Path algorithm, see get_placement_schedule. The planner remembers the chain
+    of nodes placed for each ingress node and how often each VNF and schedule entry is used, so that single chains
+    can be placed again (see reschedule) without recomputing the others.
+    """
+
+    def __init__(self, network, nodes_list, sf_list, sfc_list, ingress_nodes, nodes_cap, tables=None):
+        import numpy as np
+
+        from auxiliary.neighbour_index import NeighbourIndex
+        from auxiliary.schedule import SparseSchedule
+
+        self.nodes_list = nodes_list
+        self.sf_list = sf_list
+        self.sfc_list = sfc_list
+        self.ingress_nodes = ingress_nodes
+        self.nodes_cap = nodes_cap
+        self.placement = defaultdict(list)
+        # Initializing an empty schedule; only the entries set below are stored
+        self.schedule = SparseSchedule(nodes_list, sfc_list, sf_list)
+        # Getting the neighbours of each node sorted by distance and indexing them by their number of VNFs
+        self.neighbour_order = get_neighbour_order(network, nodes_list, tables)
+        self.node_index = {node: i for i, node in enumerate(nodes_list)}
+        has_cap = np.array([nodes_cap[node] > 0 for node in nodes_list])
+        is_ingress = np.zeros(len(nodes_list), dtype=bool)
+        is_ingress[[self.node_index[node] for node in ingress_nodes]] = True
+        self.neighbours = NeighbourIndex(self.neighbour_order, has_cap)
+        self.non_ingress_neighbours = NeighbourIndex(self.neighbour_order, has_cap & ~is_ingress)
+        # nodes that are currently avoided because they are overloaded, see reschedule
+        self.hot_nodes = set()
+        # per ingress node: the node of each SF of its chain
+        self.chains = {}
+        # (node, sf) -> number of chains using that VNF
+        self.vnf_users = defaultdict(int)
+        # (src, sf) -> {dst: number of chains scheduling the SF from src to dst}
+        self.weights = defaultdict(dict)
+
+        # - For each Ingress node of the network we start by placing the first VNF of the SFC on it and then place the
+        #  2nd VNF of the SFC on the closest neighbour of the Ingress, then the 3rd VNF on the closest neighbour of the
+        #  node where we placed the 2nd VNF and so on.
+        # - The closest neighbour is chosen based on the following criteria:
+        #   - while some nodes in the network has 0 VNFs , the closest neighbour cannot be an Ingress node
+        #   - The closest neighbour must have some capacity
+        #   - while some of the nodes in the network have 0 VNFs it chooses the closest neighbour that has 0 VNFs,
+        #     If some nodes in the network has just 1 VNF, it returns the closest neighbour with just 1 VNF and so on
+        for ingress in ingress_nodes:
+            self.chains[ingress] = self.place_chain(ingress)
+
+        # Since the sum of schedule probabilities for each SF of each node may not be 1 , we make it 1.
+        # Rows without any weight are distributed equally over all nodes, materialized only when they are looked up.
+        for (src, sf), weights in self.weights.items():
+            self.schedule.set_row(src, sfc_list[0], sf, weights)
+
+    def closest_neighbour(self, node, num_vnfs_filled):
+        index = next_neighbour(self.node_index[node], num_vnfs_filled, self.neighbours, self.non_ingress_neighbours,
+                               len(self.sf_list))
+        return self.nodes_list[self.neighbour_order[self.node_index[node], index]]
+
+    def set_num_vnfs(self, node):
+        self.neighbours.set_num_vnfs(self.node_index[node], len(self.placement[node]))
+        self.non_ingress_neighbours.set_num_vnfs(self.node_index[node], len(self.placement[node]))
+
+    def place(self, node, sf, src):
+        """ Places the sf on node, if it is not there yet, and schedules it from src to node """
+        if sf not in self.placement[node]:
+            self.placement[node].append(sf)
+            self.set_num_vnfs(node)
+        self.vnf_users[(node, sf)] += 1
+        row = self.weights[(src, sf)]
+        row[node] = row.get(node, 0) + 1
+
+    def unplace(self, node, sf, src):
+        """ Reverts place(); the sf is removed from the node once no chain uses it anymore """
+        self.vnf_users[(node, sf)] -= 1
+        if self.vnf_users[(node, sf)] == 0:
+            del self.vnf_users[(node, sf)]
+            self.placement[node].remove(sf)
+            self.set_num_vnfs(node)
+        row = self.weights[(src, sf)]
+        row[node] -= 1
+        if row[node] == 0:
+            del row[node]
+
+    def place_chain(self, ingress):
+        """ Places all SFs of the SFC starting at the ingress node and returns the node of each SF """
         node = ingress
         # We choose a list with just one element because a list is mutable in python and we want 'next_neighbour'
         # function to change the value of this variable
         num_vnfs_filled = [0]
         # Placing the 1st VNF of the SFC on the ingress nodes if the ingress node has some capacity
         # Otherwise we find the closest neighbour of the Ingress that has some capacity and place the 1st VNF on it
-        if nodes_cap[ingress] > 0:
-            if sf_list[0] not in placement[node]:
-                placement[node].append(sf_list[0])
-            schedule[node][sfc_list[0]][sf_list[0]][node] += 1
-        else:
+        if self.nodes_cap[ingress] <= 0 or ingress in self.hot_nodes:
             # Finding the next neighbour which is not an ingress node and has some capacity
-            index = next_neighbour(0, num_vnfs_filled, ingress, placement, closest_neighbours, sf_list, nodes_cap)
-            while num_vnfs_filled[0] == 0 and closest_neighbours[ingress][index] in ingress_nodes:
-                if index + 1 >= len(closest_neighbours[ingress]):
-                    break
-                index = next_neighbour(index + 1, num_vnfs_filled, ingress, placement, closest_neighbours,
-                                       sf_list, nodes_cap)
-            node = closest_neighbours[ingress][index]
-            if sf_list[0] not in placement[node]:
-                placement[node].append(sf_list[0])
-            schedule[ingress][sfc_list[0]][sf_list[0]][node] += 1
+            node = self.closest_neighbour(ingress, num_vnfs_filled)
+        self.place(node, self.sf_list[0], ingress)
+        chain = [node]
 
         # For the remaining VNFs in the SFC we look for the closest neighbour and place the VNFs on them
-        for j in range(len(sf_list) - 1):
-            index = next_neighbour(0, num_vnfs_filled, node, placement, closest_neighbours, sf_list, nodes_cap)
-            while num_vnfs_filled[0] == 0 and closest_neighbours[node][index] in ingress_nodes:
-                if index + 1 >= len(closest_neighbours[node]):
-                    break
-                index = next_neighbour(index + 1, num_vnfs_filled, node, placement, closest_neighbours,
-                                       sf_list, nodes_cap)
-            new_node = closest_neighbours[node][index]
-            if sf_list[j + 1] not in placement[new_node]:
-                placement[new_node].append(sf_list[j + 1])
-            schedule[node][sfc_list[0]][sf_list[j + 1]][new_node] += 1
+        for sf in self.sf_list[1:]:
+            new_node = self.closest_neighbour(node, num_vnfs_filled)
+            self.place(new_node, sf, node)
+            chain.append(new_node)
             node = new_node
+        return chain
+
+    def remove_chain(self, ingress):
+        chain = self.chains.pop(ingress)
+        for src, node, sf in zip([ingress] + chain[:-1], chain, self.sf_list):
+            self.unplace(node, sf, src)
+        return chain
+
+    def reschedule(self, hot_nodes):
+        """
+        Avoids the given overloaded nodes from now on and places the chains that use any of them again. All other
+        chains and their schedule rows stay as they are. Nodes that are not hot anymore can be used again by the
+        chains that are placed from now on.
 
-    # Since the sum of schedule probabilities for each SF of each node may not be 1 , we make it 1 using the
-    # 'normalize_scheduling_probabilities' function.
-    for src in nodes_list:
-        for sfc in sfc_list:
-            for sf in sf_list:
-                unnormalized_probs_list = list(schedule[src][sfc][sf].values())
-                normalized_probs = normalize_scheduling_probabilities(unnormalized_probs_list)
-                for i in range(len(nodes_list)):
-                    schedule[src][sfc][sf][nodes_list[i]] = normalized_probs[i]
-    return placement, schedule
+        Returns:
+            list of the ingress nodes whose chains were placed again
+        """
+        hot_nodes = set(hot_nodes)
+        for node in hot_nodes ^ self.hot_nodes:
+            eligible = node not in hot_nodes and self.nodes_cap[node] > 0
+            self.neighbours.set_eligible(self.node_index[node], eligible)
+            self.non_ingress_neighbours.set_eligible(self.node_index[node],
+                                                     eligible and node not in self.ingress_nodes)
+        self.hot_nodes = hot_nodes
+        affected = [ingress for ingress, chain in self.chains.items() if hot_nodes.intersection(chain)]
+        if not affected:
+            return affected
+
+        # remove all affected chains first, so that their VNFs do not count when placing them again
+        old_rows = set()
+        for ingress in affected:
+            chain = self.remove_chain(ingress)
+            old_rows.update(zip([ingress] + chain[:-1], self.sf_list))
+        new_rows = set()
+        for ingress in affected:
+            chain = self.chains[ingress] = self.place_chain(ingress)
+            new_rows.update(zip([ingress] + chain[:-1], self.sf_list))
+        # only the schedule rows of the affected chains change
+        for src, sf in old_rows | new_rows:
+            self.schedule.set_row(src, self.sfc_list[0], sf, self.weights[(src, sf)])
+        return affected
 
 
 def parse_args():
@@ -182,50 +304,150 @@ def parse_args():
     parser.add_argument('-n', '--network', required=True, dest='network')
     parser.add_argument('-sf', '--service_functions', required=True, dest="service_functions")
     parser.add_argument('-c', '--config', required=True, dest="config")
+    parser.add_argument('--seeds', required=False, nargs='+', dest="seeds",
+                        help="Run several seeds in parallel, given as a list or a file with one seed per line")
+    parser.add_argument('--profile-startup', action='store_true', dest="profile_startup",
+                        help="Report the import time of this command and its dependencies, then exit")
+    parser.add_argument('-w', '--workers', required=False, default=os.cpu_count(), dest="workers", type=int,
+                        help="Number of worker processes for --seeds")
+    parser.add_argument('--adapt-every', required=False, default=0, dest="adapt_every", type=int,
+                        help="Check the observed load every K iterations and place the chains using overloaded nodes "
+                             "again if flows were dropped (0: fixed placement and schedule)")
+    parser.add_argument('--hot-threshold', required=False, default=0.9, dest="hot_threshold", type=float,
+                        help="Utilization of a node from which it is avoided by --adapt-every")
     return parser.parse_args()
 
 
-def main():
-    # Parse arguments
-    args = parse_args()
-    if not args.seed:
-        args.seed = random.randint(1, 9999)
-    logging.basicConfig(level=logging.WARNING)
-    logging.getLogger("coordsim").setLevel(logging.WARNING)
+def run(network, service_functions, config, iterations, seed, results_dir=None, cache=None, progress=True,
+        adapt_every=0, hot_threshold=0.9):
+    """
+    Runs the Shortest Path algorithm against the simulator and writes the simulator results to results_dir
 
-    # Creating the results directory variable where the simulator result files will be written
-    network_stem = os.path.splitext(os.path.basename(args.network))[0]
-    service_function_stem = os.path.splitext(os.path.basename(args.service_functions))[0]
-    simulator_config_stem = os.path.splitext(os.path.basename(args.config))[0]
+    Parameters:
+        network: path of the network file
+        service_functions: path of the service functions file
+        config: path of the simulator config file
+        iterations: the number of times apply() is called
+        seed: seed of the simulator
+        results_dir: directory for the result files, by default
+                     results/<network>/<service functions>/<config>/<current time>_seed<seed>
+        cache: optional dict to reuse the fixed action of previous runs with the same network and service functions
+        progress: whether to show a progress bar of the iterations
+        adapt_every: if > 0, the observed load is checked every adapt_every iterations. If flows were dropped since
+                     the last check, the nodes with a utilization of at least hot_threshold are avoided and only the
+                     chains that use them are placed again (see ShortestPathPlanner.reschedule). The action then
+                     changes over time, so it is not cached
+        hot_threshold: utilization of a node from which it counts as overloaded
 
-    results_dir = f"{PROJECT_ROOT}/results/{network_stem}/{service_function_stem}/{simulator_config_stem}" \
-                  f"/{DATETIME}_seed{args.seed}"
+    Returns:
+        the results directory
+    """
+    # the simulator and its dependencies are only imported once a run starts, so that the command line starts fast
+    from common.common_functionalities import create_input_file, copy_input_files, get_ingress_nodes_and_cap
+    from siminterface.simulator import Simulator
+    from spinterface import SimulatorAction
+    from tqdm import tqdm
+
+    from auxiliary.network_cache import load_network_tables
+
+    if results_dir is None:
+        # Creating the results directory variable where the simulator result files will be written
+        results_dir = get_default_results_dir(network, service_functions, config, seed)
+    network = os.path.abspath(network)
+    service_functions = os.path.abspath(service_functions)
+    config = os.path.abspath(config)
 
     # creating the simulator
-    simulator = Simulator(os.path.abspath(args.network),
-                          os.path.abspath(args.service_functions),
-                          os.path.abspath(args.config), test_mode=True, test_dir=results_dir)
-    init_state = simulator.init(args.seed)
+    simulator = Simulator(network, service_functions, config, test_mode=True, test_dir=results_dir)
+    init_state = simulator.init(seed)
     log.info("Network Stats after init(): %s", init_state.network_stats)
+    cache_key = ("SP", network, service_functions)
+    if adapt_every:
+        num_ingress = run_adaptive(simulator, init_state, network, iterations, adapt_every, hot_threshold, progress)
+    elif cache is not None and cache_key in cache:
+        action, num_ingress = cache[cache_key]
+    else:
+        nodes_list = [node['id'] for node in init_state.network.get('nodes')]
+        sf_list = list(init_state.service_functions.keys())
+        sfc_list = list(init_state.sfcs.keys())
+        ingress_nodes, nodes_cap = get_ingress_nodes_and_cap(simulator.network, cap=True)
+        num_ingress = len(ingress_nodes)
+        # getting the placement and schedule, using the cached neighbour order of the network
+        placement, schedule = get_placement_schedule(simulator.network, nodes_list, sf_list, sfc_list, ingress_nodes,
+                                                     nodes_cap, tables=load_network_tables(network))
+        # Since the placement and the schedule are fixed , the action would also be the same throughout
+        action = SimulatorAction(placement, schedule)
+        if cache is not None:
+            cache[cache_key] = (action, num_ingress)
+    if not adapt_every:
+        # iterations define the number of time we wanna call apply(); use tqdm for progress bar
+        log.info(f"Running for {iterations} iterations...")
+        for i in tqdm(range(iterations), disable=not progress):
+            _ = simulator.apply(action)
+    # We copy the input files(network, simulator config....) to  the results directory
+    copy_input_files(results_dir, network, service_functions, config)
+    # Creating the input file in the results directory containing the num_ingress and the Algo used attributes
+    create_input_file(results_dir, num_ingress, "SP")
+    log.info(f"Saved results in {results_dir}")
+    return results_dir
+
+
+def run_adaptive(simulator, init_state, network, iterations, adapt_every, hot_threshold, progress=True):
+    """
+    Applies the Shortest Path action for the given iterations and places the chains using overloaded nodes again
+    every adapt_every iterations, see run(). Returns the number of ingress nodes.
+    """
+    from common.common_functionalities import get_ingress_nodes_and_cap
+    from spinterface import SimulatorAction
+    from tqdm import tqdm
+
+    from auxiliary.network_cache import load_network_tables
+
     nodes_list = [node['id'] for node in init_state.network.get('nodes')]
     sf_list = list(init_state.service_functions.keys())
     sfc_list = list(init_state.sfcs.keys())
     ingress_nodes, nodes_cap = get_ingress_nodes_and_cap(simulator.network, cap=True)
-    # getting the placement and schedule
-    placement, schedule = get_placement_schedule(simulator.network, nodes_list, sf_list, sfc_list, ingress_nodes,
-                                                 nodes_cap)
-    # Since the placement and the schedule are fixed , the action would also be the same throughout
-    action = SimulatorAction(placement, schedule)
-    # iterations define the number of time we wanna call apply(); use tqdm for progress bar
-    log.info(f"Running for {args.iterations} iterations...")
-    for i in tqdm(range(args.iterations)):
-        _ = simulator.apply(action)
-    # We copy the input files(network, simulator config....) to  the results directory
-    copy_input_files(results_dir, os.path.abspath(args.network), os.path.abspath(args.service_functions),
-                     os.path.abspath(args.config))
-    # Creating the input file in the results directory containing the num_ingress and the Algo used attributes
-    create_input_file(results_dir, len(ingress_nodes), "SP")
-    log.info(f"Saved results in {results_dir}")
+    planner = ShortestPathPlanner(simulator.network, nodes_list, sf_list, sfc_list, ingress_nodes, nodes_cap,
+                                  tables=load_network_tables(network))
+    action = SimulatorAction(planner.placement, planner.schedule)
+    dropped_flows = init_state.network_stats['dropped_flows']
+    log.info(f"Running for {iterations} iterations, adapting every {adapt_every} iterations...")
+    for i in tqdm(range(iterations), disable=not progress):
+        state = simulator.apply(action)
+        if (i + 1) % adapt_every:
+            continue
+        # nodes are only avoided while flows are dropped; otherwise the previously avoided nodes are used again
+        hot_nodes = set()
+        if state.network_stats['dropped_flows'] > dropped_flows:
+            hot_nodes = get_hot_nodes(simulator.network, hot_threshold)
+        dropped_flows = state.network_stats['dropped_flows']
+        replaced = planner.reschedule(hot_nodes)
+        if replaced:
+            log.info("Iteration %d: placed the chains of %s again, avoiding %s", i + 1, replaced, sorted(hot_nodes))
+            action = SimulatorAction(planner.placement, planner.schedule)
+    return len(ingress_nodes)
+
+
+def main():
+    if '--profile-startup' in sys.argv[1:]:
+        # checked before parsing, so that the required arguments can be omitted
+        from auxiliary.startup import report_startup
+        raise SystemExit(0 if report_startup('algorithms.shortestPath', LAZY_IMPORTS) else 1)
+    # Parse arguments
+    args = parse_args()
+    if not args.seed:
+        args.seed = random.randint(1, 9999)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("coordsim").setLevel(logging.WARNING)
+    if args.seeds:
+        failed = run_seeds('sp', args.network, args.service_functions, args.config, args.iterations,
+                           parse_seeds(args.seeds), get_timestamp(), workers=args.workers,
+                           options=dict(adapt_every=args.adapt_every, hot_threshold=args.hot_threshold))
+        if failed:
+            raise SystemExit(1)
+        return
+    run(args.network, args.service_functions, args.config, args.iterations, args.seed,
+        adapt_every=args.adapt_every, hot_threshold=args.hot_threshold)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,102 @@
+import csv
+import gzip
+import io
+import os
+import queue
+import threading
+
+FIELDS = ('decision', 'flow_id', 'node', 'action', 'reroute', 'drop_reason')
+
+
+class DecisionLog:
+    """
+    Asynchronous writer of per-flow decision records for long runs.
+    write() only appends the record to the current chunk. Full chunks are handed to a background thread through a
+    bounded queue, which writes them as gzip compressed CSV files <name>-00000.csv.gz, <name>-00001.csv.gz, ... and
+    starts a new file once the current one exceeds max_bytes (compressed). Each file has its own header.
+    The decision loop only blocks if the writer falls more than max_queue chunks behind, so memory stays bounded.
+    """
+
+    def __init__(self, result_dir, name='decisions', chunk_size=8192, max_queue=16, max_bytes=256 << 20,
+                 compresslevel=1):
+        self.result_dir = result_dir
+        self.name = name
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.compresslevel = compresslevel
+        os.makedirs(result_dir, exist_ok=True)
+        # paths of the files written so far
+        self.files = []
+        self.chunk = []
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self.run_writer, name=f'{name}-writer', daemon=True)
+        self.thread.start()
+
+    def write(self, decision, flow_id, node, action, reroute, drop_reason):
+        self.chunk.append((decision, flow_id, node, action, int(reroute), drop_reason or ''))
+        if len(self.chunk) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """ Hands the current chunk to the writer thread """
+        if self.error is not None:
+            raise RuntimeError(f'Writing the {self.name} log failed.') from self.error
+        if self.chunk:
+            self.queue.put(self.chunk)
+            self.chunk = []
+
+    def close(self):
+        """ Writes all pending records and waits for the writer thread """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.flush()
+        finally:
+            self.queue.put(None)
+            self.thread.join()
+        if self.error is not None:
+            raise RuntimeError(f'Writing the {self.name} log failed.') from self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def open_file(self):
+        path = os.path.join(self.result_dir, f'{self.name}-{len(self.files):05d}.csv.gz')
+        raw = open(path, 'wb')
+        file = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=self.compresslevel)
+        file.write((','.join(FIELDS) + '\n').encode())
+        self.files.append(path)
+        return raw, file
+
+    def run_writer(self):
+        raw = file = None
+        try:
+            while True:
+                chunk = self.queue.get()
+                if chunk is None:
+                    break
+                # the compressed size is only known approximately because of gzip's internal buffer
+                if file is None or raw.tell() >= self.max_bytes:
+                    if file is not None:
+                        file.close()
+                        raw.close()
+                    raw, file = self.open_file()
+                text = io.StringIO()
+                csv.writer(text).writerows(chunk)
+                file.write(text.getvalue().encode())
+        except Exception as error:
+            self.error = error
+            # keep consuming, so that the decision loop never blocks on a full queue
+            while self.queue.get() is not None:
+                pass
+        finally:
+            if file is not None:
+                file.close()
+                raw.close()
@@ -0,0 +1,158 @@
+import csv
+import json
+import os
+import time
+from collections import Counter, defaultdict
+
+# Values below 2^SUB_BUCKET_BITS ns are recorded exactly, larger values with a relative error below 2^-(BITS - 1)
+SUB_BUCKET_BITS = 7
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of latencies in nanoseconds. Each power of two range is split into equally sized
+    sub-buckets, so the memory is logarithmic in the value range while keeping a bounded relative error.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.total_count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def bucket_index(value):
+        if value < (1 << SUB_BUCKET_BITS):
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+    @staticmethod
+    def bucket_value(index):
+        """ Highest value that is recorded in the bucket with the given index """
+        shift = index >> SUB_BUCKET_BITS
+        if shift == 0:
+            return index
+        sub_bucket = index & ((1 << SUB_BUCKET_BITS) - 1)
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, value):
+        value = max(int(value), 0)
+        self.counts[self.bucket_index(value)] += 1
+        self.total_count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percentile):
+        """ Returns the value below which the given percentage of recorded values fall """
+        if self.total_count == 0:
+            return None
+        threshold = self.total_count * percentile / 100
+        cumulative = 0
+        for index in sorted(self.counts):
+            cumulative += self.counts[index]
+            if cumulative >= threshold:
+                return min(self.bucket_value(index), self.max)
+        return self.max
+
+    def summary(self):
+        summary = dict(count=self.total_count, mean_ns=self.total / self.total_count if self.total_count else None,
+                       min_ns=self.min, max_ns=self.max)
+        for percentile in PERCENTILES:
+            summary[f'p{percentile}_ns'] = self.percentile(percentile)
+        return summary
+
+
+class PhaseTimer:
+    """ Context manager recording the wall time of a phase into a histogram """
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.record((time.perf_counter() - self.start) * 1e9)
+        return False
+
+
+class Instrumentation:
+    """
+    Records per-decision latencies split by phase (e.g. process_state, init_flow, set_new_path, select_neighbor,
+    simulator_apply) and counts events (e.g. decisions, reroutes, drops) per second of wall time.
+    Phases may be nested; each phase records its inclusive time.
+    """
+    enabled = True
+
+    def __init__(self):
+        self.histograms = defaultdict(LatencyHistogram)
+        self.counters = Counter()
+        # event counts per second of wall time since the start
+        self.timeline = defaultdict(Counter)
+        self.start_time = time.perf_counter()
+
+    def phase(self, name):
+        return PhaseTimer(self.histograms[name])
+
+    def count(self, event, n=1):
+        self.counters[event] += n
+        self.timeline[int(time.perf_counter() - self.start_time)][event] += n
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start_time
+        return dict(
+            wall_time_s=elapsed,
+            phases={name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+            counters=dict(self.counters),
+            rates_per_s={event: count / elapsed for event, count in self.counters.items()} if elapsed > 0 else {},
+            timeline=[dict(second=second, **counts) for second, counts in sorted(self.timeline.items())],
+        )
+
+    def dump(self, result_dir, name='instrumentation'):
+        """ Writes the summary as <name>.json and the phase latencies as <name>.csv to result_dir """
+        summary = self.summary()
+        os.makedirs(result_dir, exist_ok=True)
+        with open(os.path.join(result_dir, f'{name}.json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+        with open(os.path.join(result_dir, f'{name}.csv'), 'w', newline='') as f:
+            fields = ['phase', 'count', 'mean_ns', 'min_ns', 'max_ns'] + [f'p{p}_ns' for p in PERCENTILES]
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for phase, stats in summary['phases'].items():
+                writer.writerow(dict(phase=phase, **stats))
+        return summary
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullInstrumentation:
+    """ Drop-in replacement for Instrumentation that records nothing, used when instrumentation is disabled """
+    enabled = False
+    _timer = _NullTimer()
+
+    def phase(self, name):
+        return self._timer
+
+    def count(self, event, n=1):
+        pass
+
+    def summary(self):
+        return {}
+
+    def dump(self, result_dir, name='instrumentation'):
+        return {}
@@ -1,29 +1,32 @@
-import copy
+from types import MappingProxyType
+
+import numpy as np
+
 
 class Link:
+    """
+    Immutable undirected link between two nodes with optional (read-only) attributes. The attributes are stored as
+    given, without copying them. The hash does not depend on the direction and is computed once.
+    Sets of links of a network are better stored as bitmasks of an EdgeIndex, which converts from and to Links.
+    """
+    __slots__ = ('edge', 'attributes', '_hash')
+
     def __init__(self, a: str, b: str, **kwargs):
-        self.edge = (a, b)
-        self.attributes = {}
-        for key, value in kwargs.items():
-            self.attributes[key] = copy.deepcopy(value)
+        object.__setattr__(self, 'edge', (a, b))
+        object.__setattr__(self, 'attributes', MappingProxyType(kwargs))
+        # hash(a) ^ hash(b) would collide for all links between equal nodes and for many pairs of small ints
+        object.__setattr__(self, '_hash', hash(frozenset(self.edge)))
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Link is immutable.')
 
     def __eq__(self, other):
         if isinstance(other, Link):
-            return (self.edge[0] == other.edge[0] and self.edge[1] == other.edge[1]) \
-                   or (self.edge[0] == other.edge[1] and self.edge[1] == other.edge[0])
+            return self._hash == other._hash and (self.edge == other.edge or self.edge == other.edge[::-1])
         return False
 
     def __hash__(self):
-        """
-        Simple commutative property
-        """
-        return hash(self.edge[0]) ^ hash(self.edge[1])
-
-    def __setitem__(self, key, item: str):
-        if key == 0 or key == 1:
-            raise KeyError('Cannot set nodes.')
-        else:
-            self.attributes[key] = item
+        return self._hash
 
     def __getitem__(self, key):
         if key == 0 or key == 1:
@@ -32,4 +35,105 @@ class Link:
             return self.attributes[key]
 
     def __repr__(self):
-        return f'({self.edge[0]}, {self.edge[1]})'
\ No newline at end of file
+        return f'({self.edge[0]}, {self.edge[1]})'
+
+    def __reduce__(self):
+        return _make_link, (self.edge, dict(self.attributes))
+
+
+def _make_link(edge, attributes):
+    return Link(edge[0], edge[1], **attributes)
+
+
+class EdgeIndex:
+    """
+    Maps each undirected edge of a network to a dense integer index, so that sets of links can be stored as bitmasks
+    (ints) with bit i set for the edge with index i. Set operations on the bitmasks are plain int operations, e.g.
+    mask_a | mask_b (union), mask_a & mask_b (intersection) and mask_a & ~mask_b (difference).
+    """
+
+    def __init__(self, edges):
+        # edge index -> (a, b) in the order of first appearance
+        self.edges = []
+        # (a, b) and (b, a) -> edge index
+        self.edge_ids = {}
+        for a, b in edges:
+            if (a, b) in self.edge_ids:
+                continue
+            self.edge_ids[(a, b)] = self.edge_ids[(b, a)] = len(self.edges)
+            self.edges.append((a, b))
+        # sorted keys of both directions of all edges and their edge indices, built by indices() on first use
+        self.key_base = None
+        self.sorted_keys = None
+        self.sorted_ids = None
+
+    def __len__(self):
+        return len(self.edges)
+
+    def index(self, a, b):
+        """ Index of the edge between a and b. Raises KeyError if there is no such edge """
+        return self.edge_ids[(a, b)]
+
+    def indices(self, a, b):
+        """
+        Vectorized index(): indices of the edges between the nodes in the arrays a and b, -1 where there is no edge.
+        Only supported if the nodes are non-negative ints, e.g. node indices.
+        """
+        if self.sorted_keys is None:
+            self.build_sorted_keys()
+        a = np.asarray(a, dtype=np.int64)
+        b = np.asarray(b, dtype=np.int64)
+        valid = (a >= 0) & (a < self.key_base) & (b >= 0) & (b < self.key_base)
+        keys = np.where(valid, a * self.key_base + b, -1)
+        positions = np.searchsorted(self.sorted_keys, keys)
+        # one extra entry at the end, so that keys beyond the last edge do not index out of bounds
+        found = valid & (np.append(self.sorted_keys, -1)[positions] == keys)
+        return np.where(found, np.append(self.sorted_ids, -1)[positions], -1)
+
+    def build_sorted_keys(self):
+        ends = np.array(self.edges, dtype=np.int64).reshape(-1, 2)
+        # the key of the edge (a, b) is a * key_base + b
+        self.key_base = int(ends.max()) + 1 if len(ends) else 0
+        keys = np.concatenate([ends[:, 0] * self.key_base + ends[:, 1], ends[:, 1] * self.key_base + ends[:, 0]])
+        order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[order]
+        self.sorted_ids = np.tile(np.arange(len(ends)), 2)[order]
+
+    @staticmethod
+    def contains(mask, index):
+        """ Whether the edge with the given index is in the bitmask """
+        return (mask >> index) & 1 == 1
+
+    @staticmethod
+    def count(mask):
+        """ Number of edges in the bitmask """
+        return bin(mask).count('1')
+
+    def path_mask(self, path):
+        """ Bitmask of the edges along a path of nodes """
+        mask = 0
+        for edge in zip(path, path[1:]):
+            mask |= 1 << self.edge_ids[edge]
+        return mask
+
+    def mask(self, edges):
+        """ Bitmask of the given (a, b) pairs or Links """
+        mask = 0
+        for edge in edges:
+            mask |= 1 << self.edge_ids[(edge[0], edge[1])]
+        return mask
+
+    def edges_in(self, mask):
+        """ List of the (a, b) pairs contained in a bitmask """
+        edges = []
+        index = 0
+        while mask:
+            if mask & 1:
+                edges.append(self.edges[index])
+            mask >>= 1
+            index += 1
+        return edges
+
+    def links_in(self, mask):
+        """ List of the Links contained in a bitmask """
+        return [Link(a, b) for a, b in self.edges_in(mask)]
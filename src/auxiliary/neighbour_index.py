@@ -0,0 +1,78 @@
+import numpy as np
+
+
+class NeighbourIndex:
+    """
+    Finds the closest neighbour of a node that has at most a given number of VNFs in O(log N).
+    For each queried node a min segment tree over its neighbour order holds the number of VNFs of the neighbour at
+    each position, or INF for neighbours that are not eligible (e.g. without capacity). The tree of a node is built on
+    its first query and kept up to date by set_num_vnfs() and set_eligible().
+    """
+    INF = np.iinfo(np.int64).max
+
+    def __init__(self, neighbour_order, eligible):
+        self.neighbour_order = neighbour_order
+        self.num_positions = neighbour_order.shape[1]
+        # number of leaves, the smallest power of two that fits all positions
+        self.size = 1 << max(self.num_positions - 1, 0).bit_length()
+        self.eligible = np.array(eligible, dtype=bool)
+        self.num_vnfs = np.zeros(len(self.eligible), dtype=np.int64)
+        # value of each node in the trees
+        self.values = np.where(self.eligible, 0, self.INF).astype(np.int64)
+        # node index -> segment tree, with the root at 1 and the leaves at size + position
+        self.trees = {}
+        # node index -> position of each other node in its neighbour order (-1 for the node itself)
+        self.positions = {}
+
+    def tree(self, node):
+        tree = self.trees.get(node)
+        if tree is None:
+            order = self.neighbour_order[node]
+            tree = np.full(2 * self.size, self.INF, dtype=np.int64)
+            tree[self.size:self.size + self.num_positions] = self.values[order]
+            level = self.size
+            while level > 1:
+                tree[level // 2:level] = np.minimum(tree[level:2 * level:2], tree[level + 1:2 * level:2])
+                level //= 2
+            position = np.full(len(self.values), -1, dtype=np.int64)
+            position[order] = np.arange(self.num_positions)
+            self.trees[node] = tree
+            self.positions[node] = position
+        return tree
+
+    def value(self, node, position):
+        return self.tree(node)[self.size + position]
+
+    def first(self, node, max_vnfs):
+        """ First position in the neighbour order of node with at most max_vnfs VNFs, None if there is none """
+        tree = self.tree(node)
+        if tree[1] > max_vnfs:
+            return None
+        i = 1
+        while i < self.size:
+            i = 2 * i if tree[2 * i] <= max_vnfs else 2 * i + 1
+        return i - self.size
+
+    def set_num_vnfs(self, node, num_vnfs):
+        self.num_vnfs[node] = num_vnfs
+        if self.eligible[node]:
+            self.update(node, num_vnfs)
+
+    def set_eligible(self, node, eligible):
+        """ Includes or excludes a node from the results of first(), e.g. while it is overloaded """
+        if self.eligible[node] != eligible:
+            self.eligible[node] = eligible
+            self.update(node, self.num_vnfs[node] if eligible else self.INF)
+
+    def update(self, node, value):
+        self.values[node] = value
+        for source, tree in self.trees.items():
+            i = self.positions[source][node]
+            if i < 0:
+                continue
+            i += self.size
+            tree[i] = value
+            i //= 2
+            while i:
+                tree[i] = min(tree[2 * i], tree[2 * i + 1])
+                i //= 2
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import networkx as nx
+import numpy as np
+
+# bump whenever the cached tables change, so that stale cache entries are not used anymore
+FORMAT_VERSION = 1
+# cache location, can be changed with the BASELINE_CACHE_DIR environment variable
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'baseline-algorithms', 'networks')
+ARRAYS = ('node_cap', 'edges', 'edge_delay', 'edge_cap', 'delay', 'hops', 'neighbour_order')
+
+
+def sort_neighbours_by_delay(delay):
+    """
+    Sorts the other nodes of each node by increasing delay in one argsort over the (N, N) delay matrix.
+    Ties keep the node order. Returns the node indices, shape (N, N - 1)
+    """
+    # the node itself is moved to the front and dropped
+    sort_keys = np.array(delay, dtype=np.float64)
+    np.fill_diagonal(sort_keys, -np.inf)
+    return np.argsort(sort_keys, axis=1, kind='stable')[:, 1:].astype(np.int32)
+
+
+class NetworkTables:
+    """
+    Static tables of a network that are expensive to compute for every run. Nodes are referred to by their index
+    in 'nodes'.
+
+    Attributes:
+        nodes: list of node ids
+        ingress_nodes, egress_nodes: lists of node ids, as returned by read_network
+        node_cap: capacity of each node, shape (N,)
+        edges: node indices of each (undirected) edge, shape (E, 2)
+        edge_delay, edge_cap: delay and capacity of each edge, shape (E,)
+        delay: delay of the shortest (by delay) path between each pair of nodes, inf if unreachable, shape (N, N)
+        hops: number of hops of these shortest paths, -1 if unreachable, shape (N, N)
+        neighbour_order: for each node the indices of all other nodes sorted by increasing delay, shape (N, N - 1)
+    """
+
+    def __init__(self, nodes, ingress_nodes, egress_nodes, **arrays):
+        self.nodes = list(nodes)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        self.ingress_nodes = list(ingress_nodes)
+        self.egress_nodes = list(egress_nodes)
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @property
+    def degree(self):
+        """ Degree of each node, shape (N,) """
+        return np.bincount(self.edges.ravel(), minlength=len(self.nodes))
+
+    @classmethod
+    def from_network(cls, network: nx.Graph, ingress_nodes, egress_nodes):
+        """ Computes the tables from a network as returned by read_network """
+        nodes = list(network.nodes)
+        node_index = {node: i for i, node in enumerate(nodes)}
+        num_nodes = len(nodes)
+        node_cap = np.array([network.nodes[node]['cap'] for node in nodes], dtype=np.float64)
+        edges = np.array([(node_index[u], node_index[v]) for u, v in network.edges], dtype=np.int32).reshape(-1, 2)
+        edge_delay = np.array([d['delay'] for _, _, d in network.edges(data=True)], dtype=np.float64)
+        edge_cap = np.array([d['cap'] for _, _, d in network.edges(data=True)], dtype=np.float64)
+
+        delay = np.full((num_nodes, num_nodes), np.inf)
+        hops = np.full((num_nodes, num_nodes), -1, dtype=np.int32)
+        for source in nodes:
+            lengths, paths = nx.single_source_dijkstra(network, source, weight='delay')
+            i = node_index[source]
+            for target, length in lengths.items():
+                delay[i, node_index[target]] = length
+                hops[i, node_index[target]] = len(paths[target]) - 1
+
+        return cls(nodes, ingress_nodes, egress_nodes, node_cap=node_cap, edges=edges, edge_delay=edge_delay,
+                   edge_cap=edge_cap, delay=delay, hops=hops, neighbour_order=sort_neighbours_by_delay(delay))
+
+    def save(self, directory):
+        """ Writes the tables as .npy files and a small json file with the node ids to the directory """
+        os.makedirs(directory, exist_ok=True)
+        meta = dict(version=FORMAT_VERSION, nodes=self.nodes, ingress_nodes=self.ingress_nodes,
+                    egress_nodes=self.egress_nodes)
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """ Loads tables written by save(). The arrays are memory-mapped read-only by default """
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f'Unsupported network cache version {meta.get("version")} in {directory}.')
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode) for name in ARRAYS}
+        return cls(meta['nodes'], meta['ingress_nodes'], meta['egress_nodes'], **arrays)
+
+
+def network_file_hash(network_file):
+    """ Returns a hash of the contents of the network file and the cache format version """
+    sha = hashlib.sha256(f'v{FORMAT_VERSION}'.encode())
+    with open(network_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def get_cache_dir():
+    return os.environ.get('BASELINE_CACHE_DIR', DEFAULT_CACHE_DIR)
+
+
+def load_network_tables(network_file, cache_dir=None):
+    """
+    Returns the NetworkTables of a network file. The tables are cached on disk, keyed by the hash of the file
+    contents, so the network file is only parsed the first time. Cached tables are memory-mapped, so parallel
+    workers share the same pages.
+    """
+    # coord-sim is only needed to parse networks that are not cached yet
+    from coordsim.reader.reader import read_network
+
+    cache_dir = cache_dir or get_cache_dir()
+    entry = os.path.join(cache_dir, network_file_hash(network_file))
+    if os.path.exists(os.path.join(entry, 'meta.json')):
+        try:
+            return NetworkTables.load(entry)
+        except (OSError, ValueError):
+            # incomplete or outdated entry, recompute it below
+            shutil.rmtree(entry, ignore_errors=True)
+
+    network, ingress_nodes, egress_nodes = read_network(network_file)
+    tables = NetworkTables.from_network(network, ingress_nodes, egress_nodes)
+    # write to a temporary directory first and move it in place, so concurrent workers never see partial entries
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=cache_dir, prefix='.tmp-')
+    try:
+        tables.save(tmp_dir)
+        os.rename(tmp_dir, entry)
+    except OSError:
+        # another process created the entry in the meantime
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return tables
@@ -0,0 +1,313 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+
+def normalize_rows(probs, mask=None):
+    """
+    Normalizes the last axis of an array of scheduling probabilities so that every row sums up to 1.
+    Vectorized counterpart of 'normalize_scheduling_probabilities' for whole schedules at once.
+
+    Parameters:
+        probs: array of non-negative weights, the last axis holds the destination nodes
+        mask: optional boolean array over the destination nodes. Entries outside the mask are set to 0
+
+    Returns:
+        a new array of the same shape. Rows with only 0 weights are distributed equally over the mask
+    """
+    probs = np.asarray(probs, dtype=np.float64)
+    if mask is None:
+        mask = np.ones(probs.shape[-1], dtype=bool)
+    if not mask.any():
+        raise ValueError('Cannot normalize scheduling probabilities without any destination node.')
+    probs = np.where(mask, probs, 0.0)
+    sums = probs.sum(axis=-1, keepdims=True)
+    empty = sums == 0
+    uniform = mask / mask.sum()
+    probs = np.where(empty, uniform, probs / np.where(empty, 1.0, sums))
+    # Because of floating point precision the rows may not sum up to exactly 1, so we add the remainder to the
+    # largest element of each row
+    offset = 1.0 - probs.sum(axis=-1, keepdims=True)
+    largest = probs.argmax(axis=-1)[..., np.newaxis]
+    np.put_along_axis(probs, largest, np.take_along_axis(probs, largest, axis=-1) + offset, axis=-1)
+    return probs
+
+
+class ScheduleView(Mapping):
+    """
+    Read-only nested mapping on top of a schedule array, e.g. view[src][sfc][sf][dst]. Each level of the mapping
+    indexes one axis of the array. The last level is a plain dict of floats over the destinations, materialized once
+    per row on first access and memoized together with the views above it, so repeated lookups cost a dict access.
+    """
+    __slots__ = ('array', 'axes', 'prefix', 'cache')
+
+    def __init__(self, array, axes, prefix=(), cache=None):
+        self.array = array
+        # one dict per remaining axis, mapping the key to its index on that axis
+        self.axes = axes
+        # keys of the levels above this view and the memoized views and rows below the root view, by their keys
+        self.prefix = prefix
+        self.cache = {} if cache is None else cache
+
+    def __getitem__(self, key):
+        prefix = self.prefix + (key,)
+        try:
+            return self.cache[prefix]
+        except KeyError:
+            pass
+        index = self.axes[0][key]
+        if len(self.axes) == 1:
+            return float(self.array[index])
+        if len(self.axes) == 2:
+            value = dict(zip(self.axes[1], self.array[index].tolist()))
+        else:
+            value = ScheduleView(self.array[index], self.axes[1:], prefix, self.cache)
+        self.cache[prefix] = value
+        return value
+
+    def __iter__(self):
+        return iter(self.axes[0])
+
+    def __len__(self):
+        return len(self.axes[0])
+
+    def keys(self):
+        return self.axes[0].keys()
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.to_dict()})'
+
+    def to_dict(self):
+        """ Materializes the view as nested dicts, e.g. for writing it to a file """
+        if len(self.axes) <= 2:
+            return {key: dict(value) if len(self.axes) == 2 else value for key, value in self.items()}
+        return {key: value.to_dict() for key, value in self.items()}
+
+
+class ScheduleTensor(ScheduleView):
+    """
+    Schedule backed by a single array of shape (src, sfc, sf, dst).
+    It can be passed to SimulatorAction as the schedule, which reads it as
+        schedule[src node id][SFC id][SF id][dst node id] = probability
+    The rows read through the mapping are memoized, so changes of probs must go through add, normalize or
+    invalidate.
+    """
+
+    def __init__(self, nodes_list, sfc_list, sf_list, probs=None):
+        self.nodes_list = list(nodes_list)
+        self.sfc_list = list(sfc_list)
+        self.sf_list = list(sf_list)
+        node_index = {node: i for i, node in enumerate(self.nodes_list)}
+        sfc_index = {sfc: i for i, sfc in enumerate(self.sfc_list)}
+        sf_index = {sf: i for i, sf in enumerate(self.sf_list)}
+        shape = (len(node_index), len(sfc_index), len(sf_index), len(node_index))
+        if probs is None:
+            probs = np.zeros(shape)
+        elif probs.shape != shape:
+            raise ValueError(f'Schedule probabilities have shape {probs.shape}, expected {shape}.')
+        super().__init__(probs, [node_index, sfc_index, sf_index, node_index])
+
+    @property
+    def probs(self):
+        return self.array
+
+    def node_mask(self, nodes):
+        """ Returns a boolean array over the destination axis that is True for the given nodes """
+        mask = np.zeros(len(self.nodes_list), dtype=bool)
+        mask[[self.axes[3][node] for node in nodes]] = True
+        return mask
+
+    def invalidate(self):
+        """ Drops the memoized rows after probs was changed in place """
+        self.cache.clear()
+
+    def add(self, src, sfc, sf, dst, value=1.0):
+        """ Adds value to the (unnormalized) scheduling weight of a single entry """
+        self.array[self.axes[0][src], self.axes[1][sfc], self.axes[2][sf], self.axes[3][dst]] += value
+        self.invalidate()
+
+    def normalize(self, dst_nodes=None):
+        """ Normalizes all rows in place, optionally restricting the destinations to dst_nodes """
+        mask = None if dst_nodes is None else self.node_mask(dst_nodes)
+        self.array[...] = normalize_rows(self.array, mask)
+        self.invalidate()
+        return self
+
+    @classmethod
+    def uniform(cls, nodes_list, sfc_list, sf_list, dst_nodes=None):
+        """ Creates a schedule distributing each SF equally over dst_nodes (default: all nodes) """
+        return cls(nodes_list, sfc_list, sf_list).normalize(dst_nodes)
+
+    @classmethod
+    def random(cls, nodes_list, sfc_list, sf_list, dirichlet=False, random_state=np.random):
+        """
+        Creates a random schedule, sampling all rows in one batch.
+        By default each weight is drawn uniformly from [0, 1) and the rows are normalized afterwards. With
+        dirichlet=True the rows are instead drawn uniformly from the probability simplex.
+        """
+        schedule = cls(nodes_list, sfc_list, sf_list)
+        shape = schedule.array.shape
+        if dirichlet:
+            weights = random_state.dirichlet(np.ones(shape[-1]), size=shape[:-1])
+        else:
+            weights = random_state.random_sample(shape)
+        schedule.array[...] = normalize_rows(weights)
+        schedule.invalidate()
+        return schedule
+
+
+def normalize_weights(weights):
+    """
+    Normalizes a dict of non-negative weights to probabilities summing up to 1, dropping zero weights.
+    Returns None if all weights are 0.
+    """
+    weights = {key: weight for key, weight in weights.items() if weight > 0}
+    total = sum(weights.values())
+    if total == 0:
+        return None
+    probs = {key: weight / total for key, weight in weights.items()}
+    # add the floating point remainder to the largest element
+    largest = max(probs, key=probs.get)
+    probs[largest] += 1.0 - sum(probs.values())
+    return probs
+
+
+class ScheduleRow(Mapping):
+    """
+    Scheduling probabilities of one (src, sfc, sf) over the destination nodes. Only destinations with a non-zero
+    probability are stored and iterated; looking up any other destination returns 0.
+    """
+    __slots__ = ('probs',)
+
+    def __init__(self, probs):
+        self.probs = probs
+
+    def __getitem__(self, dst):
+        return self.probs.get(dst, 0.0)
+
+    def __contains__(self, dst):
+        return dst in self.probs
+
+    # delegated to the dict, the defaults of Mapping go through __getitem__ for every destination
+    def __iter__(self):
+        return iter(self.probs)
+
+    def __len__(self):
+        return len(self.probs)
+
+    def keys(self):
+        return self.probs.keys()
+
+    def items(self):
+        return self.probs.items()
+
+    def values(self):
+        return self.probs.values()
+
+    def __repr__(self):
+        return f'ScheduleRow({self.probs})'
+
+
+class SparseScheduleView(Mapping):
+    """ One level of the nested mapping of a SparseSchedule, e.g. schedule[src] or schedule[src][sfc] """
+    __slots__ = ('schedule', 'prefix')
+
+    def __init__(self, schedule, prefix):
+        self.schedule = schedule
+        self.prefix = prefix
+
+    def __getitem__(self, key):
+        if key not in self.schedule.levels[len(self.prefix)]:
+            raise KeyError(key)
+        prefix = self.prefix + (key,)
+        if len(prefix) == 3:
+            return self.schedule.row(*prefix)
+        return SparseScheduleView(self.schedule, prefix)
+
+    def __iter__(self):
+        return iter(self.schedule.levels[len(self.prefix)])
+
+    def __len__(self):
+        return len(self.schedule.levels[len(self.prefix)])
+
+    def keys(self):
+        return self.schedule.levels[len(self.prefix)].keys()
+
+    def to_dict(self):
+        """ Materializes the view as nested dicts, containing only the non-zero destinations """
+        return {key: dict(value) if len(self.prefix) == 2 else value.to_dict() for key, value in self.items()}
+
+
+class SparseSchedule(SparseScheduleView):
+    """
+    Schedule that only stores the non-zero destinations of each (src, sfc, sf). Rows that were never set use a
+    shared default row, which distributes the flows equally over default_dst_nodes (default: all nodes). If
+    default_dst_nodes is a mapping, the flows are distributed proportionally to its values, e.g. node capacities.
+    It can be passed to SimulatorAction as the schedule, which reads it as
+        schedule[src node id][SFC id][SF id][dst node id] = probability
+    """
+
+    def __init__(self, nodes_list, sfc_list, sf_list, default_dst_nodes=None):
+        self.nodes_list = list(nodes_list)
+        self.sfc_list = list(sfc_list)
+        self.sf_list = list(sf_list)
+        # valid keys of the src, sfc and sf levels
+        self.levels = (dict.fromkeys(self.nodes_list), dict.fromkeys(self.sfc_list), dict.fromkeys(self.sf_list))
+        if default_dst_nodes is None:
+            default_dst_nodes = self.nodes_list
+        if not isinstance(default_dst_nodes, Mapping):
+            default_dst_nodes = dict.fromkeys(default_dst_nodes, 1.0)
+        default_probs = normalize_weights(default_dst_nodes)
+        if default_probs is None:
+            raise ValueError('Cannot create a schedule without any destination node.')
+        self.default_row = ScheduleRow(default_probs)
+        # (src, sfc, sf) -> ScheduleRow, holding unnormalized weights until normalize() is called
+        self.rows = {}
+        super().__init__(self, ())
+
+    @classmethod
+    def from_source_probs(cls, nodes_list, sfc_list, sf_list, probs):
+        """
+        Creates a schedule from an array of shape (src, dst) of normalized probabilities that apply to all SFCs and
+        SFs of a source node. The row of a source is stored once and shared by all its (sfc, sf).
+        """
+        schedule = cls(nodes_list, sfc_list, sf_list)
+        nodes = np.array(schedule.nodes_list, dtype=object)
+        for i, src in enumerate(schedule.nodes_list):
+            dst_indices = np.flatnonzero(probs[i])
+            row = ScheduleRow(dict(zip(nodes[dst_indices].tolist(), probs[i, dst_indices].tolist())))
+            for sfc in schedule.sfc_list:
+                for sf in schedule.sf_list:
+                    schedule.rows[(src, sfc, sf)] = row
+        return schedule
+
+    def row(self, src, sfc, sf):
+        return self.rows.get((src, sfc, sf), self.default_row)
+
+    def set_row(self, src, sfc, sf, weights):
+        """ Replaces a row by the normalized weights; without any weight the row falls back to the default row """
+        probs = normalize_weights(weights)
+        if probs is None:
+            self.rows.pop((src, sfc, sf), None)
+        else:
+            self.rows[(src, sfc, sf)] = ScheduleRow(probs)
+
+    def add(self, src, sfc, sf, dst, value=1.0):
+        """ Adds value to the (unnormalized) scheduling weight of a single entry """
+        for level, key in zip(self.levels + (self.levels[0],), (src, sfc, sf, dst)):
+            if key not in level:
+                raise KeyError(key)
+        row = self.rows.get((src, sfc, sf))
+        if row is None:
+            row = self.rows[(src, sfc, sf)] = ScheduleRow({})
+        row.probs[dst] = row.probs.get(dst, 0.0) + value
+
+    def normalize(self):
+        """ Normalizes all stored rows in place; rows without any weight fall back to the default row """
+        for key, row in list(self.rows.items()):
+            probs = normalize_weights(row.probs)
+            if probs is None:
+                del self.rows[key]
+            else:
+                row.probs = probs
+        return self
@@ -0,0 +1,138 @@
+from collections import namedtuple
+
+import networkx as nx
+import numpy as np
+
+# arrays of a Topology, in the order they are laid out in shared memory
+ARRAYS = ('node_cap', 'edges', 'edge_delay', 'edge_cap', 'indptr', 'indices', 'incident_edges', 'next_hop')
+# alignment of each array in the shared memory block, in bytes
+ALIGNMENT = 64
+
+# picklable description of a SharedTopology that workers use to attach to it, see attach_topology
+TopologySpec = namedtuple('TopologySpec', ['name', 'nodes', 'layout'])
+
+
+class Topology:
+    """
+    Compact, array based snapshot of the static topology of a network. Nodes are referred to by their index in
+    'nodes' and links by their index in 'edges'. The neighbours of node i are stored in CSR form as
+    indices[indptr[i]:indptr[i + 1]], in the adjacency order of the network, and incident_edges holds the link of
+    each of these entries. All arrays are treated as read-only, so the same topology can be shared by many runs,
+    see SharedTopology. State that changes during a run, e.g. the remaining capacities, belongs to the run.
+
+    Attributes:
+        nodes: list of node ids
+        node_cap: capacity of each node, shape (N,)
+        edges: node indices of each (undirected) link, shape (E, 2)
+        edge_delay, edge_cap: delay and capacity of each link, shape (E,)
+        indptr: shape (N + 1,)
+        indices: neighbour node index of each adjacency entry, shape (2E,)
+        incident_edges: link index of each adjacency entry, shape (2E,)
+        next_hop: optional table of the next node on a shortest path from each node to each target, shape (N, N)
+    """
+
+    def __init__(self, nodes, **arrays):
+        self.nodes = list(nodes)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+        for name in ARRAYS:
+            setattr(self, name, arrays.get(name))
+        # SharedMemory the arrays are backed by, if the topology was attached by attach_topology
+        self.shared_memory = None
+
+    @classmethod
+    def from_network(cls, network: nx.Graph, next_hop=None):
+        """ Creates the topology of a network as returned by read_network """
+        nodes = list(network.nodes)
+        node_index = {node: i for i, node in enumerate(nodes)}
+        node_cap = np.array([network.nodes[node]['cap'] for node in nodes], dtype=np.float64)
+        edges = np.array([(node_index[u], node_index[v]) for u, v in network.edges], dtype=np.int32).reshape(-1, 2)
+        edge_delay = np.array([d['delay'] for _, _, d in network.edges(data=True)], dtype=np.float64)
+        edge_cap = np.array([d['cap'] for _, _, d in network.edges(data=True)], dtype=np.float64)
+        edge_ids = {}
+        for i, (u, v) in enumerate(network.edges):
+            edge_ids[(u, v)] = edge_ids[(v, u)] = i
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        indices = []
+        incident_edges = []
+        for i, node in enumerate(nodes):
+            for neighbour in network[node]:
+                indices.append(node_index[neighbour])
+                incident_edges.append(edge_ids[(node, neighbour)])
+            indptr[i + 1] = len(indices)
+        return cls(nodes, node_cap=node_cap, edges=edges, edge_delay=edge_delay, edge_cap=edge_cap, indptr=indptr,
+                   indices=np.array(indices, dtype=np.int32), incident_edges=np.array(incident_edges, dtype=np.int32),
+                   next_hop=next_hop)
+
+    @property
+    def nbytes(self):
+        """ Total size of the arrays in bytes """
+        return sum(getattr(self, name).nbytes for name in ARRAYS if getattr(self, name) is not None)
+
+    def neighbours(self, node):
+        """ Node indices of the neighbours of a node index, in the adjacency order of the network """
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def links(self, node):
+        """ Link indices of the links of a node index, in the same order as neighbours() """
+        return self.incident_edges[self.indptr[node]:self.indptr[node + 1]]
+
+
+class SharedTopology:
+    """
+    Copies a Topology into a single block of shared memory (multiprocessing.shared_memory, Python 3.8+), so that
+    worker processes on the same host can attach to it with attach_topology instead of each building and holding their
+    own copy. Only the picklable spec is sent to the workers.
+    The process that created the SharedTopology owns the block and must close() it once all workers are done, which
+    also happens when it is used as a context manager.
+    """
+
+    def __init__(self, topology):
+        from multiprocessing import shared_memory
+
+        layout = []
+        size = 0
+        for name in ARRAYS:
+            array = getattr(topology, name)
+            if array is None:
+                continue
+            offset = -(-size // ALIGNMENT) * ALIGNMENT
+            layout.append((name, array.dtype.str, array.shape, offset))
+            size = offset + array.nbytes
+        self.shared_memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for name, dtype, shape, offset in layout:
+            target = np.ndarray(shape, dtype=dtype, buffer=self.shared_memory.buf, offset=offset)
+            target[...] = getattr(topology, name)
+            del target
+        self.spec = TopologySpec(self.shared_memory.name, topology.nodes, tuple(layout))
+
+    def close(self):
+        """ Releases the shared memory block; workers that are still attached keep their mapping """
+        if self.shared_memory is not None:
+            self.shared_memory.close()
+            self.shared_memory.unlink()
+            self.shared_memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def attach_topology(spec):
+    """
+    Attaches to the shared memory of a SharedTopology and returns a Topology whose arrays are read-only views of it.
+    The block stays mapped as long as the returned topology is alive.
+    """
+    from multiprocessing import shared_memory
+
+    memory = shared_memory.SharedMemory(name=spec.name)
+    arrays = {}
+    for name, dtype, shape, offset in spec.layout:
+        array = np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=offset)
+        array.flags.writeable = False
+        arrays[name] = array
+    topology = Topology(spec.nodes, **arrays)
+    topology.shared_memory = memory
+    return topology
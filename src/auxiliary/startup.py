@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+
+# acceptable import time of an entry point module, without the dependencies it imports lazily when a run starts
+IMPORT_BUDGET_S = 0.1
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(args):
+    """ Runs a fresh interpreter that can import the packages of this repo """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [SRC_DIR, env.get('PYTHONPATH')]))
+    return subprocess.run([sys.executable] + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env,
+                          universal_newlines=True, check=True)
+
+
+def measure_import_time(modules):
+    """ Returns the wall time in seconds of importing the modules in a fresh interpreter """
+    code = 'import time\nstart = time.perf_counter()\n' + ''.join(f'import {module}\n' for module in modules) \
+        + 'print(time.perf_counter() - start)'
+    return float(run_python(['-c', code]).stdout.split()[-1])
+
+
+def slowest_imports(module, top=10):
+    """
+    Returns (cumulative seconds, module name) of the slowest imports triggered by importing the module, taken from
+    'python -X importtime'. Returns an empty list on Python < 3.7, which does not support it.
+    """
+    if sys.version_info < (3, 7):
+        return []
+    result = run_python(['-X', 'importtime', '-c', f'import {module}'])
+    times = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(times, reverse=True)[:top]
+
+
+def report_startup(module, lazy_imports=(), budget=IMPORT_BUDGET_S):
+    """
+    Prints how long importing an entry point module takes, its slowest imports and how long the lazily imported
+    dependencies take once a run starts. Returns whether the import of the module is within the budget.
+    """
+    import_time = measure_import_time([module])
+    print(f'Import of {module}: {import_time * 1000:.1f} ms (budget {budget * 1000:.0f} ms)')
+    for cumulative, name in slowest_imports(module):
+        print(f'  {cumulative * 1000:8.1f} ms  {name}')
+    if lazy_imports:
+        try:
+            lazy_time = measure_import_time(lazy_imports)
+            print(f'Imported when a run starts: {lazy_time * 1000:.1f} ms ({", ".join(lazy_imports)})')
+        except subprocess.CalledProcessError as error:
+            print(f'Could not import the dependencies of a run: {error.stderr.strip().splitlines()[-1]}')
+    within_budget = import_time <= budget
+    print('Within budget' if within_budget else 'OVER BUDGET')
+    return within_budget
@@ -0,0 +1,193 @@
+import json
+import struct
+
+import numpy as np
+
+from auxiliary.shared_topology import Topology
+
+MAGIC = b'GCASPLOG'
+# bump whenever the header or the records change
+FORMAT_VERSION = 4
+# number of records and of link reads at the end of a closed log
+TRAILER = struct.Struct('<QQ')
+# capacity of a link beyond the current node that the algorithm read during a decision, see StateRecorder.attach
+LINK_READ_DTYPE = np.dtype([('a', '<i4'), ('b', '<i4'), ('cap', '<f8')])
+# arrays of the Topology stored in the header; the next-hop table is cheaper to recompute than to store
+TOPOLOGY_ARRAYS = ('node_cap', 'edges', 'edge_delay', 'edge_cap', 'indptr', 'indices', 'incident_edges')
+
+
+def record_dtype(max_degree):
+    """
+    Fixed size record of one decision. Nodes are node indices of the topology in the header, flows are numbered in
+    the order they first appear.
+        ttl: remaining TTL of the flow
+        node_cap: remaining capacity of the current node as seen by the algorithm (rem_node_cap[0])
+        link_cap: remaining capacity of the links to the neighbors of the current node, in the order of the neighbors
+        action: the action taken, -1 for a dropped flow
+        choice: node index randomly chosen as new target during the decision, -1 if there was none
+        link_reads: number of link reads of the decision, which follow those of the previous records
+    """
+    return np.dtype([('flow', '<i8'), ('node', '<i4'), ('egress', '<i4'), ('sfc', '<i2'), ('position', '<i2'),
+                     ('dr', '<f8'), ('ttl', '<f8'), ('node_cap', '<f4'), ('link_cap', '<f8', (max_degree,)),
+                     ('action', '<i4'), ('choice', '<i4'), ('link_reads', '<i4')])
+
+
+class RecordingRandom:
+    """ Delegates choice() to a random generator and remembers the last choice, see StateRecorder """
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.last = None
+
+    def choice(self, seq):
+        self.last = self.rng.choice(seq)
+        return self.last
+
+
+class StateRecorder:
+    """
+    Records the states an algorithm decided on, together with its actions, into a compact binary log that can be
+    replayed without the simulator (see algorithms/gcasp_replay.py).
+    The file starts with MAGIC, the format version and the length of a JSON header holding the topology, the SFCs, the
+    SFs, the seed and the options the algorithm was constructed with, e.g. {'ttl_check': False}. The fixed size
+    records of record_dtype follow, written in chunks of chunk_size, then the link reads of all records and TRAILER.
+    Besides the state itself, each record holds the remaining capacities of the links of the current node, which
+    GCASP reads from the network, and the random choices of the decision, so that a replay takes the same decisions.
+    The capacities of other links that the decision read, e.g. along the alternative paths of a reroute, are stored as
+    link reads of LINK_READ_DTYPE.
+    """
+
+    def __init__(self, path, topology: Topology, sfcs, net_degree, seed, sf_list=None, options=None, chunk_size=4096):
+        self.topology = topology
+        self.sfc_index = {sfc: i for i, sfc in enumerate(sfcs)}
+        self.max_degree = int(np.diff(topology.indptr).max()) if len(topology.nodes) else 0
+        self.dtype = record_dtype(self.max_degree)
+        self.chunk = np.zeros(chunk_size, dtype=self.dtype)
+        self.size = 0
+        self.num_records = 0
+        # flow ID -> number of the flow in the records
+        self.flow_numbers = {}
+        # (node ID, node ID) -> capacity of the links read during the current decision
+        self.link_reads = {}
+        # link reads of all records, kept until close() as they follow the records in the file
+        self.read_chunks = []
+        header = dict(nodes=topology.nodes, sfcs={sfc: list(sfs) for sfc, sfs in sfcs.items()},
+                      sf_list={sf: dict(attrs) for sf, attrs in (sf_list or {}).items()}, net_degree=net_degree,
+                      seed=seed, options=options or {}, max_degree=self.max_degree,
+                      topology={name: (getattr(topology, name).dtype.str, getattr(topology, name).shape,
+                                       getattr(topology, name).ravel().tolist()) for name in TOPOLOGY_ARRAYS})
+        encoded = json.dumps(header).encode()
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + struct.pack('<II', FORMAT_VERSION, len(encoded)) + encoded)
+
+    def attach(self, algorithm):
+        """
+        Records the random choices and the link capacities read by the algorithm, which has to draw them from its
+        'random' attribute and read the capacities with get_link_rem_cap(node_a, node_b)
+        """
+        algorithm.random = RecordingRandom(algorithm.random)
+        get_link_rem_cap = algorithm.get_link_rem_cap
+        link_reads = self.link_reads
+
+        def recording_get_link_rem_cap(node_a, node_b):
+            cap = link_reads[(node_a, node_b)] = get_link_rem_cap(node_a, node_b)
+            return cap
+
+        algorithm.get_link_rem_cap = recording_get_link_rem_cap
+
+    def record(self, state, network, action, choice=None, link_reads=None):
+        """
+        Records the state of a decision, the remaining link capacities in network and the action taken. link_reads
+        maps (node ID, node ID) to the capacity of each link the decision read; those of the current node are already
+        part of the record.
+        """
+        flow = state['flow']
+        node = self.topology.node_index[flow.current_node_id]
+        record = self.chunk[self.size]
+        record['flow'] = self.flow_numbers.setdefault(flow.flow_id, len(self.flow_numbers))
+        record['node'] = node
+        record['egress'] = -1 if flow.egress_node_id is None else self.topology.node_index[flow.egress_node_id]
+        record['sfc'] = self.sfc_index[flow.sfc]
+        record['position'] = flow.current_position
+        record['dr'] = flow.dr
+        record['ttl'] = flow.ttl
+        record['node_cap'] = state['rem_node_cap'][0]
+        node_id = flow.current_node_id
+        neighbors = state['node_and_neighbors'][1:]
+        record['link_cap'][:len(neighbors)] = [network[node_id][neighbor]['remaining_cap'] for neighbor in neighbors]
+        record['link_cap'][len(neighbors):] = 0
+        record['action'] = -1 if action is None else action
+        record['choice'] = -1 if choice is None else choice
+        reads = [(a, b, cap) for (a, b), cap in (link_reads or {}).items() if node_id not in (a, b)]
+        record['link_reads'] = len(reads)
+        if reads:
+            node_index = self.topology.node_index
+            self.read_chunks.append(np.array([(node_index[a], node_index[b], cap) for a, b, cap in reads],
+                                             dtype=LINK_READ_DTYPE))
+        self.size += 1
+        self.num_records += 1
+        if self.size == len(self.chunk):
+            self.flush()
+
+    def record_decision(self, algorithm, state, action):
+        """ record() for an algorithm that was attached to the recorder, consuming its last random choice and reads """
+        choice = algorithm.random.last
+        algorithm.random.last = None
+        self.record(state, algorithm.simulator.params.network, action, choice, self.link_reads)
+        self.link_reads.clear()
+
+    def flush(self):
+        self.file.write(self.chunk[:self.size].tobytes())
+        self.size = 0
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            num_reads = 0
+            for reads in self.read_chunks:
+                self.file.write(reads.tobytes())
+                num_reads += len(reads)
+            self.file.write(TRAILER.pack(self.num_records, num_reads))
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def read_state_log(path):
+    """
+    Reads a log written by StateRecorder.
+
+    Returns:
+        - the header dict, with the Topology under 'topology'
+        - the records as a structured array of record_dtype, memory-mapped from the file
+        - the link reads of all records as a structured array of LINK_READ_DTYPE, in the order of the records
+    """
+    with open(path, 'rb') as f:
+        prefix = f.read(len(MAGIC) + 8)
+        if prefix[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a state log.')
+        version, header_size = struct.unpack('<II', prefix[len(MAGIC):])
+        if version != FORMAT_VERSION:
+            raise ValueError(f'{path} has format version {version}, expected {FORMAT_VERSION}.')
+        header = json.loads(f.read(header_size).decode())
+        size = f.seek(0, 2)
+        f.seek(size - TRAILER.size)
+        num_records, num_reads = TRAILER.unpack(f.read(TRAILER.size))
+    records_dtype = record_dtype(header['max_degree'])
+    offset = len(MAGIC) + 8 + header_size
+    if size != offset + num_records * records_dtype.itemsize + num_reads * LINK_READ_DTYPE.itemsize + TRAILER.size:
+        raise ValueError(f'{path} is incomplete, the recording was not closed.')
+    arrays = {name: np.array(values, dtype=dtype).reshape(shape)
+              for name, (dtype, shape, values) in header['topology'].items()}
+    header['topology'] = Topology(header['nodes'], **arrays)
+    records = np.zeros(0, dtype=records_dtype) if num_records == 0 else \
+        np.memmap(path, dtype=records_dtype, mode='r', offset=offset, shape=(num_records,))
+    offset += num_records * records_dtype.itemsize
+    link_reads = np.zeros(0, dtype=LINK_READ_DTYPE) if num_reads == 0 else \
+        np.memmap(path, dtype=LINK_READ_DTYPE, mode='r', offset=offset, shape=(num_reads,))
+    return header, records, link_reads
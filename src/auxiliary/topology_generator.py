@@ -0,0 +1,247 @@
+import argparse
+import logging
+import math
+import os
+
+import networkx as nx
+import numpy as np
+
+log = logging.getLogger(__name__)
+MODELS = ('waxman', 'ba', 'grid', 'fat-tree')
+# the unit square of the node positions is mapped onto this area, so that the networks also work with readers that
+# compute the link delays from the coordinates
+LATITUDE_RANGE = (25.0, 50.0)
+LONGITUDE_RANGE = (-125.0, -65.0)
+# number of node pairs per block when the O(N^2) pairs of the Waxman model are processed
+PAIR_BLOCK_SIZE = 1 << 22
+
+
+def waxman_graph(n, rng, mean_degree=4.0, alpha=0.4):
+    """
+    Waxman graph on n nodes placed uniformly at random in the unit square. Two nodes at distance d are linked with
+    probability beta * exp(-d / (alpha * L)), L being the diagonal of the square. Instead of a fixed beta, beta is
+    chosen so that the expected mean degree is mean_degree, which keeps the networks of different sizes comparable.
+    Smaller components are linked to the closest node of the largest one, so the graph is always connected.
+    The pairs are processed in blocks of rows, so time is O(N^2) but memory stays O(N).
+    """
+    pos = rng.random_sample((n, 2))
+    scale = alpha * math.sqrt(2)
+    block = max(1, PAIR_BLOCK_SIZE // max(n, 1))
+
+    def pair_weights(start):
+        # weights of the pairs (i, j) with start <= i < start + block and i < j < n, the other pairs are 0
+        rows = np.arange(start, min(start + block, n))
+        dist = np.sqrt(((pos[rows, np.newaxis, :] - pos[np.newaxis, start:, :]) ** 2).sum(axis=-1))
+        weights = np.exp(-dist / scale)
+        weights[np.arange(start, n)[np.newaxis, :] <= rows[:, np.newaxis]] = 0.0
+        return rows, weights
+
+    total = sum(pair_weights(start)[1].sum() for start in range(0, n, block))
+    beta = min(1.0, mean_degree * n / 2 / total) if total > 0 else 0.0
+    if beta == 1.0:
+        log.warning(f"Waxman graph with n={n} and alpha={alpha} cannot reach a mean degree of {mean_degree}")
+    graph = nx.Graph()
+    graph.add_nodes_from(range(n))
+    for start in range(0, n, block):
+        rows, weights = pair_weights(start)
+        sources, targets = np.nonzero(rng.random_sample(weights.shape) < beta * weights)
+        graph.add_edges_from(zip(rows[sources].tolist(), (targets + start).tolist()))
+    connect_components(graph, pos)
+    return graph, pos
+
+
+def connect_components(graph, pos):
+    """ Links each smaller component to the closest node of the largest component, by a link from its first node """
+    components = sorted(nx.connected_components(graph), key=len, reverse=True)
+    if len(components) < 2:
+        return
+    largest = np.array(sorted(components[0]))
+    for component in components[1:]:
+        node = min(component)
+        closest = largest[((pos[largest] - pos[node]) ** 2).sum(axis=-1).argmin()]
+        graph.add_edge(node, int(closest))
+
+
+def barabasi_albert_graph(n, rng, m=2):
+    """ Barabási–Albert graph on n nodes, each new node linking to m existing ones; random positions """
+    graph = nx.barabasi_albert_graph(n, m, seed=int(rng.randint(2 ** 31)))
+    return graph, rng.random_sample((n, 2))
+
+
+def grid_graph(n):
+    """
+    Grid of n nodes, filled row by row into a nearly square grid of ceil(n / rows) columns; the last row may be
+    incomplete but stays connected to the row above.
+    """
+    rows = max(1, int(math.sqrt(n)))
+    cols = math.ceil(n / rows)
+    graph = nx.Graph()
+    graph.add_nodes_from(range(n))
+    for node in range(n):
+        if (node + 1) % cols and node + 1 < n:
+            graph.add_edge(node, node + 1)
+        if node + cols < n:
+            graph.add_edge(node, node + cols)
+    pos = np.array([((node % cols) / max(cols - 1, 1), (node // cols) / max(rows - 1, 1)) for node in range(n)])
+    return graph, pos.reshape(-1, 2)
+
+
+def fat_tree_graph(k):
+    """
+    k-ary fat-tree (k even) of (k / 2)^2 core switches and k pods of k / 2 aggregation and k / 2 edge switches each,
+    5k^2 / 4 nodes in total. The role of each node ('core', 'aggregation' or 'edge') is stored as node attribute.
+    """
+    if k < 2 or k % 2:
+        raise ValueError(f'A fat-tree needs an even k >= 2, got {k}.')
+    half = k // 2
+    graph = nx.Graph()
+    core = list(range(half * half))
+    graph.add_nodes_from(core, role='core')
+    positions = [((i + 0.5) / len(core), 1.0) for i in core]
+    for pod in range(k):
+        aggregation = list(range(len(graph), len(graph) + half))
+        graph.add_nodes_from(aggregation, role='aggregation')
+        edge = list(range(len(graph), len(graph) + half))
+        graph.add_nodes_from(edge, role='edge')
+        positions += [((pod + (i + 0.5) / half) / k, 0.5) for i in range(half)]
+        positions += [((pod + (i + 0.5) / half) / k, 0.0) for i in range(half)]
+        graph.add_edges_from((a, e) for a in aggregation for e in edge)
+        # aggregation switch i of each pod links to the core switches i * k / 2 ... (i + 1) * k / 2 - 1
+        for i, a in enumerate(aggregation):
+            graph.add_edges_from((a, c) for c in core[i * half:(i + 1) * half])
+    return graph, np.array(positions)
+
+
+def fat_tree_k(n):
+    """ Smallest fat-tree parameter k with at least n nodes """
+    k = 2
+    while 5 * k * k // 4 < n:
+        k += 2
+    return k
+
+
+def generate(model, n, seed=None, num_ingress=1, num_egress=1, node_cap=(0, 2), link_cap=(1, 10), max_delay=50,
+             mean_degree=4.0, alpha=0.4, m=2):
+    """
+    Generates a synthetic network of about n nodes with the attributes read by coordsim.reader.read_network.
+    grid and fat-tree only exist in certain sizes: grid generates exactly n nodes, fat-tree the smallest fat-tree with
+    at least n nodes.
+
+    Parameters:
+        model: one of MODELS
+        n: number of nodes
+        seed: seed of all random choices
+        num_ingress, num_egress: number of nodes of type Ingress and Egress. Ingress nodes are the edge switches of a
+                                 fat-tree and egress nodes its core switches; both are chosen randomly for the other
+                                 models
+        node_cap, link_cap: inclusive (min, max) of the uniformly drawn integer NodeCap and LinkFwdCap
+        max_delay: LinkDelay of a link across the side of the unit square of the node positions, at least 1.
+                   fat-tree links all have a LinkDelay of 1
+        mean_degree, alpha: parameters of waxman_graph
+        m: parameter of barabasi_albert_graph
+
+    Returns:
+        networkX graph with integer nodes 0 ... N - 1, to be written by write_network
+    """
+    rng = np.random.RandomState(seed)
+    if model == 'waxman':
+        graph, pos = waxman_graph(n, rng, mean_degree, alpha)
+    elif model == 'ba':
+        graph, pos = barabasi_albert_graph(n, rng, m)
+    elif model == 'grid':
+        graph, pos = grid_graph(n)
+    elif model == 'fat-tree':
+        graph, pos = fat_tree_graph(fat_tree_k(n))
+    else:
+        raise ValueError(f'Unknown topology model {model}, expected one of {MODELS}.')
+    n = len(graph)
+    if num_ingress + num_egress > n:
+        raise ValueError(f'{num_ingress} ingress and {num_egress} egress nodes do not fit into {n} nodes.')
+
+    roles = nx.get_node_attributes(graph, 'role')
+    ingress_candidates = [node for node in graph if roles.get(node) == 'edge'] or list(graph)
+    ingress = rng.choice(ingress_candidates, num_ingress, replace=False).tolist()
+    egress_candidates = [node for node in graph if roles.get(node) == 'core'] or list(graph)
+    egress_candidates = sorted(set(egress_candidates) - set(ingress))
+    egress = rng.choice(egress_candidates, num_egress, replace=False).tolist()
+
+    caps = rng.randint(node_cap[0], node_cap[1] + 1, size=n).tolist()
+    for node in graph:
+        attrs = graph.nodes[node]
+        attrs.pop('role', None)
+        attrs.update(id=node, label=f'{model}{node}', NodeCap=caps[node],
+                     Latitude=float(LATITUDE_RANGE[0] + pos[node, 1] * (LATITUDE_RANGE[1] - LATITUDE_RANGE[0])),
+                     Longitude=float(LONGITUDE_RANGE[0] + pos[node, 0] * (LONGITUDE_RANGE[1] - LONGITUDE_RANGE[0])))
+    for node in ingress:
+        graph.nodes[node]['NodeType'] = 'Ingress'
+    for node in egress:
+        graph.nodes[node]['NodeType'] = 'Egress'
+
+    edges = np.array(graph.edges, dtype=np.int64).reshape(-1, 2)
+    if model == 'fat-tree':
+        delays = np.ones(len(edges), dtype=np.int64)
+    else:
+        lengths = np.sqrt(((pos[edges[:, 0]] - pos[edges[:, 1]]) ** 2).sum(axis=-1))
+        delays = np.maximum(1, np.rint(lengths * max_delay)).astype(np.int64)
+    link_caps = rng.randint(link_cap[0], link_cap[1] + 1, size=len(edges))
+    for (a, b), delay, cap in zip(edges.tolist(), delays.tolist(), link_caps.tolist()):
+        graph.edges[a, b].update(LinkDelay=delay, LinkFwdCap=cap)
+    graph.graph.update(Network=f'{model}-n{n}-seed{seed}', Creator='baseline-algorithms topology_generator')
+    return graph
+
+
+def write_network(graph, path):
+    """ Writes a generated network as GraphML """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    nx.write_graphml(graph, path)
+    return path
+
+
+def default_network_path(model, n, seed, directory=os.path.join('res', 'networks', 'synthetic')):
+    """ e.g. res/networks/synthetic/waxman-n1000-seed0.graphml """
+    return os.path.join(directory, f'{model}-n{n}-seed{seed}.graphml')
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic networks for scaling studies")
+    parser.add_argument('model', choices=MODELS)
+    parser.add_argument('-n', '--nodes', required=True, type=int, nargs='+', dest='nodes',
+                        help="Number of nodes, one network per value")
+    parser.add_argument('-s', '--seed', required=False, default=0, type=int, dest='seed')
+    parser.add_argument('-o', '--output', required=False, default=None, dest='output',
+                        help="Output file, only for a single size. Default: res/networks/synthetic/<model>-n<N>-"
+                             "seed<seed>.graphml")
+    parser.add_argument('--ingress', required=False, default=1, type=int, dest='ingress',
+                        help="Number of ingress nodes")
+    parser.add_argument('--egress', required=False, default=1, type=int, dest='egress', help="Number of egress nodes")
+    parser.add_argument('--node-cap', required=False, default=[0, 2], type=int, nargs=2, dest='node_cap',
+                        metavar=('MIN', 'MAX'), help="Range of the node capacities")
+    parser.add_argument('--link-cap', required=False, default=[1, 10], type=int, nargs=2, dest='link_cap',
+                        metavar=('MIN', 'MAX'), help="Range of the link capacities")
+    parser.add_argument('--max-delay', required=False, default=50, type=float, dest='max_delay',
+                        help="Delay of a link across the whole area of the network")
+    parser.add_argument('--mean-degree', required=False, default=4.0, type=float, dest='mean_degree',
+                        help="Expected mean degree of waxman networks")
+    parser.add_argument('--alpha', required=False, default=0.4, type=float, dest='alpha',
+                        help="Distance decay of waxman networks, smaller values favour short links")
+    parser.add_argument('-m', required=False, default=2, type=int, dest='m',
+                        help="Links of each new node of ba networks")
+    args = parser.parse_args(args)
+    if args.output is not None and len(args.nodes) > 1:
+        parser.error('--output can only be used with a single number of nodes')
+    return args
+
+
+def main(args=None):
+    args = parse_args(args)
+    for n in args.nodes:
+        graph = generate(args.model, n, args.seed, args.ingress, args.egress, tuple(args.node_cap),
+                         tuple(args.link_cap), args.max_delay, args.mean_degree, args.alpha, args.m)
+        path = write_network(graph, args.output or default_network_path(args.model, len(graph), args.seed))
+        print(f"Wrote {path}: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} links")
+
+
+if __name__ == '__main__':
+    main()
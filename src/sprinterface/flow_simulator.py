@@ -0,0 +1,354 @@
+import heapq
+import logging
+import math
+import os
+import random
+from collections.abc import Mapping
+from datetime import datetime
+from types import SimpleNamespace
+
+import networkx as nx
+import numpy as np
+import yaml
+
+log = logging.getLogger(__name__)
+
+# used for the propagation delay of links without LinkDelay, as in coord-sim
+SPEED_OF_LIGHT = 299792458  # meter per second
+PROPAGATION_FACTOR = 0.77
+EARTH_RADIUS = 6371008.8  # meter
+# capacity of links without LinkFwdCap, as in coord-sim
+DEFAULT_LINK_CAP = 1000
+
+# kinds of events, in the order they are handled at the same time
+STATE_SWITCH, RELEASE_NODE, RELEASE_LINK, ARRIVAL, DECISION = range(5)
+
+
+def link_delay(node_a, node_b):
+    """
+    Propagation delay in ms between two nodes with Latitude and Longitude, or 0 if either of them lacks them. Uses the
+    great-circle distance instead of the ellipsoidal distance of coord-sim, which differs by less than 0.5%.
+    """
+    coordinates = [node.get(name) for node in (node_a, node_b) for name in ('Latitude', 'Longitude')]
+    if None in coordinates:
+        return 0.0
+    lat_a, lon_a, lat_b, lon_b = map(math.radians, coordinates)
+    haversine = math.sin((lat_b - lat_a) / 2) ** 2 \
+        + math.cos(lat_a) * math.cos(lat_b) * math.sin((lon_b - lon_a) / 2) ** 2
+    distance = 2 * EARTH_RADIUS * math.asin(math.sqrt(haversine))
+    return distance / SPEED_OF_LIGHT * 1000 * PROPAGATION_FACTOR
+
+
+class ShortestPaths(Mapping):
+    """
+    Lazy replacement of the shortest_paths dict of coord-sim: [(source, target)] = (path, delay). The paths of a
+    source are computed on its first lookup, so large networks do not pay for all pairs up front.
+    """
+
+    def __init__(self, network):
+        self.network = network
+        self.sources = {}
+
+    def __getitem__(self, key):
+        source, target = key
+        if source not in self.sources:
+            self.sources[source] = nx.single_source_dijkstra(self.network, source, weight='delay')
+        lengths, paths = self.sources[source]
+        if target not in lengths:
+            raise KeyError(key)
+        return paths[target], lengths[target]
+
+    def __iter__(self):
+        return ((source, target) for source in self.network for target in self.network)
+
+    def __len__(self):
+        return len(self.network) ** 2
+
+
+def read_network(path, link_cap=DEFAULT_LINK_CAP):
+    """
+    Reads a GraphML network with the attributes coord-sim uses: nodes 'pop<id>' with cap (NodeCap, default 0), type
+    (NodeType: Ingress, Egress or Normal), remaining_cap and available_sf; links with delay (LinkDelay, else the
+    propagation delay between the nodes, else 0), cap (LinkFwdCap, default link_cap) and remaining_cap.
+    Returns the network, the ingress nodes and the egress nodes.
+    """
+    graphml = nx.read_graphml(path, node_type=int)
+    network = nx.Graph()
+    for node, attrs in graphml.nodes(data=True):
+        cap = attrs.get('NodeCap') or 0
+        network.add_node(f'pop{node}', type=attrs.get('NodeType', 'Normal'), cap=cap, remaining_cap=cap,
+                         available_sf={})
+    missing_cap = 0
+    for a, b, attrs in graphml.edges(data=True):
+        delay = attrs.get('LinkDelay')
+        if delay is None:
+            delay = link_delay(graphml.nodes[a], graphml.nodes[b])
+        cap = attrs.get('LinkFwdCap')
+        if cap is None:
+            cap = link_cap
+            missing_cap += 1
+        network.add_edge(f'pop{a}', f'pop{b}', delay=delay, cap=cap, remaining_cap=cap)
+    if missing_cap:
+        log.warning(f'{missing_cap} links of {path} have no LinkFwdCap, using the default capacity {link_cap}')
+    network.graph['shortest_paths'] = ShortestPaths(network)
+    ingress_nodes = [node for node, node_type in network.nodes(data='type') if node_type == 'Ingress']
+    egress_nodes = [node for node, node_type in network.nodes(data='type') if node_type == 'Egress']
+    return network, ingress_nodes, egress_nodes
+
+
+class Flow:
+    """ The attributes of a coord-sim flow that the SPR algorithms and the wrapper read """
+    __slots__ = ('flow_id', 'sfc', 'dr', 'duration', 'ttl', 'creation_time', 'ingress_node_id', 'egress_node_id',
+                 'current_node_id', 'current_position', 'metadata')
+
+    def __init__(self, flow_id, sfc, dr, duration, ttl, creation_time, ingress_node_id, egress_node_id):
+        self.flow_id = flow_id
+        self.sfc = sfc
+        self.dr = dr
+        self.duration = duration
+        self.ttl = ttl
+        self.creation_time = creation_time
+        self.ingress_node_id = ingress_node_id
+        self.egress_node_id = egress_node_id
+        self.current_node_id = ingress_node_id
+        self.current_position = 0
+
+    def __repr__(self):
+        return f'Flow({self.flow_id}, {self.current_node_id}, position={self.current_position})'
+
+
+class FlowSimState:
+    """ State of the flow that needs a decision, with the same fields as SPRState """
+    __slots__ = ('flow', 'network', 'sfcs', 'network_stats')
+
+    def __init__(self, flow, network, sfcs, network_stats):
+        self.flow = flow
+        self.network = network
+        self.sfcs = sfcs
+        self.network_stats = network_stats
+
+
+class FlowSimulator:
+    """
+    Minimal, deterministic flow-level stand-in for the SPR simulator of coord-sim (siminterface.Simulator) for fast
+    performance tests without the full simulator. It has the same constructor, init(seed) and apply(SPRAction)
+    returning the state of the next flow that needs a decision, plus apply_batch (see SPRSimWrapper.apply_batch).
+
+    The model is deliberately simple:
+    - Flows arrive at each ingress node with exponential (or, with deterministic_arrival, fixed) inter-arrival times
+      of mean inter_arrival_mean. With use_states, each ingress node follows a Markov-modulated Poisson process: every
+      run_duration it leaves its current state with probability switch_p of that state.
+    - Each flow gets a random SFC, a data rate from flow_dr_mean/flow_dr_stdev, a size from flow_size_shape (Pareto
+      unless deterministic_size), a TTL from ttl_choices and a random egress node, if there are egress nodes. As in
+      coord-sim, the TTL of a flow is its remaining TTL, reduced by each processing and link delay.
+    - Processing the next SF at the current node uses dr of the node capacity for the processing delay plus the flow
+      duration, forwarding to a neighbor uses dr of the link capacity for the link delay plus the flow duration.
+      The flow is dropped if the capacity is not available, the destination is no neighbor, the action is None or
+      its TTL expired. Fully processed flows leave the network at their egress node (or any node without egress).
+    All random values of the simulator are drawn from one generator seeded by init(seed). Like coord-sim, init(seed)
+    also seeds the global random and numpy.random generators, which the algorithms use, e.g. GCASP for its random
+    targets, so runs with the same seed are reproducible.
+    """
+
+    def __init__(self, network_file, service_functions_file, config_file, test_mode=False, test_dir=None):
+        self.network, self.ingress_nodes, self.egress_nodes = read_network(network_file)
+        if not self.ingress_nodes:
+            raise ValueError(f'The network {network_file} has no ingress nodes.')
+        with open(service_functions_file) as f:
+            services = yaml.safe_load(f)
+        with open(config_file) as f:
+            self.config = yaml.safe_load(f)
+        self.sfc_list = services['sfc_list']
+        self.sf_list = services['sf_list']
+        # same attribute as coord-sim, used e.g. by GCASP
+        self.params = SimpleNamespace(network=self.network)
+        # plain dicts of the node and link attribute dicts of the network, which are faster to look up than its views
+        self.node_attrs = dict(self.network.nodes(data=True))
+        self.link_attrs = {node: dict(self.network[node]) for node in self.network}
+        self.test_mode = test_mode
+        self.test_dir = test_dir
+        self.rng = None
+        self.events = []
+        self.now = 0.0
+        self.event_count = 0
+        self.flow_count = 0
+        self.ingress_states = {}
+        self.network_stats = {}
+
+    def init(self, seed):
+        self.rng = random.Random(seed)
+        random.seed(seed)
+        np.random.seed(seed)
+        for _, attrs in self.network.nodes(data=True):
+            attrs['remaining_cap'] = attrs['cap']
+        for _, _, attrs in self.network.edges(data=True):
+            attrs['remaining_cap'] = attrs['cap']
+        self.events = []
+        self.now = 0.0
+        self.event_count = 0
+        self.flow_count = 0
+        self.network_stats = dict(total_flows=0, successful_flows=0, dropped_flows=0, in_network_flows=0,
+                                  avg_end2end_delay=0.0)
+        self.ingress_states = {}
+        if self.config.get('use_states'):
+            self.ingress_states = {node: self.config['init_state'] for node in self.ingress_nodes}
+            self.schedule(self.config['run_duration'], STATE_SWITCH, None)
+        for node in self.ingress_nodes:
+            self.schedule(self.inter_arrival_time(node), ARRIVAL, node)
+        return self.next_state()
+
+    def apply(self, action):
+        self.handle(action.flow, action.destination_node_id)
+        return self.next_state()
+
+    def apply_batch(self, actions):
+        """ Applies one action per flow and returns the states of all flows that need a decision at the next time """
+        for action in actions:
+            self.handle(action.flow, action.destination_node_id)
+        states = [self.next_state()]
+        state = self.next_state(until=self.now)
+        while state is not None:
+            states.append(state)
+            state = self.next_state(until=self.now)
+        return states
+
+    def schedule(self, delay, kind, payload):
+        # the event counter keeps the order of events at the same time deterministic
+        self.event_count += 1
+        heapq.heappush(self.events, (self.now + delay, kind, self.event_count, payload))
+
+    def inter_arrival_time(self, node):
+        mean = self.config['inter_arrival_mean']
+        if self.ingress_states:
+            mean = self.config['states'][self.ingress_states[node]]['inter_arr_mean']
+        if self.config.get('deterministic_arrival'):
+            return mean
+        return self.rng.expovariate(1 / mean)
+
+    def new_flow(self, ingress_node):
+        config = self.config
+        self.flow_count += 1
+        sfc = self.rng.choice(list(self.sfc_list))
+        dr = config['flow_dr_mean']
+        if config.get('flow_dr_stdev'):
+            dr = self.rng.gauss(dr, config['flow_dr_stdev'])
+            if dr <= 0:
+                dr = config['flow_dr_mean']
+        size = config['flow_size_shape']
+        if not config.get('deterministic_size'):
+            size = self.rng.paretovariate(config['flow_size_shape'])
+        ttl = self.rng.choice(config.get('ttl_choices') or [math.inf])
+        egress_node = self.rng.choice(self.egress_nodes) if self.egress_nodes else None
+        self.network_stats['total_flows'] += 1
+        self.network_stats['in_network_flows'] += 1
+        return Flow(self.flow_count, sfc, dr, size / dr * 1000, ttl, self.now, ingress_node, egress_node)
+
+    def drop(self, flow):
+        self.network_stats['dropped_flows'] += 1
+        self.network_stats['in_network_flows'] -= 1
+
+    def depart(self, flow):
+        stats = self.network_stats
+        stats['successful_flows'] += 1
+        stats['in_network_flows'] -= 1
+        delay = self.now - flow.creation_time
+        stats['avg_end2end_delay'] += (delay - stats['avg_end2end_delay']) / stats['successful_flows']
+
+    def handle(self, flow, destination):
+        """ Applies the decision for a flow at the current time """
+        node = flow.current_node_id
+        if destination is None:
+            self.drop(flow)
+        elif destination == node:
+            if flow.current_position == len(self.sfc_list[flow.sfc]):
+                # fully processed flows can only leave at their egress
+                if flow.egress_node_id is None or flow.egress_node_id == node:
+                    self.depart(flow)
+                else:
+                    self.drop(flow)
+                return
+            attrs = self.node_attrs[node]
+            if attrs['remaining_cap'] < flow.dr:
+                self.drop(flow)
+                return
+            sf = self.sf_list[self.sfc_list[flow.sfc][flow.current_position]]
+            delay = sf.get('processing_delay_mean', 0.0)
+            if sf.get('processing_delay_stdev'):
+                delay = max(self.rng.gauss(delay, sf['processing_delay_stdev']), 0.0)
+            attrs['remaining_cap'] -= flow.dr
+            self.schedule(delay + flow.duration, RELEASE_NODE, (node, flow.dr))
+            flow.current_position += 1
+            flow.ttl -= delay
+            self.schedule(delay, DECISION, flow)
+        elif destination in self.link_attrs[node]:
+            attrs = self.link_attrs[node][destination]
+            if attrs['remaining_cap'] < flow.dr:
+                self.drop(flow)
+                return
+            attrs['remaining_cap'] -= flow.dr
+            self.schedule(attrs['delay'] + flow.duration, RELEASE_LINK, (node, destination, flow.dr))
+            flow.current_node_id = destination
+            flow.ttl -= attrs['delay']
+            self.schedule(attrs['delay'], DECISION, flow)
+        else:
+            self.drop(flow)
+
+    def next_state(self, until=None):
+        """
+        Handles the events until the next flow needs a decision and returns its state. With until, only events up to
+        that time are handled and None is returned if no flow needs a decision until then.
+        """
+        events = self.events
+        while events:
+            if until is not None and events[0][0] > until:
+                return None
+            self.now, kind, _, payload = heapq.heappop(events)
+            if kind == DECISION:
+                if payload.ttl < 0:
+                    self.drop(payload)
+                    continue
+                return FlowSimState(payload, self.network, self.sfc_list, dict(self.network_stats))
+            elif kind == ARRIVAL:
+                self.schedule(self.inter_arrival_time(payload), ARRIVAL, payload)
+                flow = self.new_flow(payload)
+                return FlowSimState(flow, self.network, self.sfc_list, dict(self.network_stats))
+            elif kind == RELEASE_NODE:
+                node, dr = payload
+                self.node_attrs[node]['remaining_cap'] += dr
+            elif kind == RELEASE_LINK:
+                node_a, node_b, dr = payload
+                self.link_attrs[node_a][node_b]['remaining_cap'] += dr
+            elif kind == STATE_SWITCH:
+                for node, state in self.ingress_states.items():
+                    if self.rng.random() < self.config['states'][state]['switch_p']:
+                        self.ingress_states[node] = next(other for other in self.config['states'] if other != state)
+                self.schedule(self.config['run_duration'], STATE_SWITCH, None)
+        if until is None:
+            raise RuntimeError('No more events, the network has no ingress nodes.')
+        return None
+
+
+class FlowSimParams:
+    """
+    The parts of sprinterface.params.Params that SPRSimWrapper and GCASP use, for runs against the FlowSimulator
+    without coord-sim. Results are written to results/<network>/<services>/<config>/<timestamp>_seed<seed>_flowsim.
+    """
+
+    def __init__(self, seed, sim_config, network, services, duration=10000, test_mode=True, result_dir=None):
+        self.seed = seed
+        self.test_mode = test_mode
+        self.sim_config_path = sim_config
+        self.services_path = services
+        self.network_path = network
+        self.duration = duration
+        self.network, self.ing_nodes, self.eg_nodes = read_network(network)
+        self.net_degree = max((degree for _, degree in self.network.degree), default=0)
+        self.node_resources_size = 1 + self.net_degree
+        self.link_resources_size = self.net_degree
+        self.neighbor_dist_to_eg = self.net_degree
+        if result_dir is None:
+            stems = [os.path.splitext(os.path.basename(path))[0] for path in (network, services, sim_config)]
+            timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+            result_dir = os.path.join(os.getcwd(), 'results', *stems, f'{timestamp}_seed{seed}_flowsim')
+        self.result_dir = result_dir
+        os.makedirs(self.result_dir, exist_ok=True)
@@ -4,6 +4,8 @@ from datetime import datetime
 from coordsim.reader.reader import get_config, read_network, network_diameter
 from networkx import DiGraph
 
+from auxiliary.network_cache import load_network_tables
+
 
 class Params:
     def __init__(
@@ -37,9 +39,12 @@ class Params:
         # Setup items from agent config file: Episode len, reward_metrics_history
         self.episode_length = self.duration  # 1000 arrivals per episode
 
-        # Read the network file, store ingress and egress nodes
-        net, self.ing_nodes, self.eg_nodes = read_network(self.network_path)
-        self.network: DiGraph = net
+        # Load the cached tables of the network, store ingress and egress nodes. The network file itself is only
+        # parsed when the network is accessed
+        self.network_tables = load_network_tables(self.network_path)
+        self.ing_nodes = self.network_tables.ingress_nodes
+        self.eg_nodes = self.network_tables.egress_nodes
+        self._network = None
 
         # Get current timestamps - for storing and identifying results
         datetime_obj = datetime.now()
@@ -96,17 +101,17 @@ class Params:
         # The possible destinations for the flow = This node + max num of neighbor nodes
         self.action_limit = 1 + self.net_degree
 
+    @property
+    def network(self) -> DiGraph:
+        """ The network read from the network file, parsed on first access """
+        if self._network is None:
+            self._network, _, _ = read_network(self.network_path)
+        return self._network
+
     def get_max_degree(self):
         """ Get the max degree of the network """
-        # Init degree to zero
-        max_degree = 0
-        # Iterate over all nodes in the network
-        for node in self.network.nodes:
-            # Get degree of node, compare with current max
-            degree = self.network.degree(node)
-            if degree > max_degree:
-                max_degree = degree
-        return max_degree
+        # Degrees are taken from the cached edge list
+        return int(self.network_tables.degree.max(initial=0))
 
     def create_result_dir(self):
         # Set model path
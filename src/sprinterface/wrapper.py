@@ -1,15 +1,27 @@
-from siminterface import Simulator
-from spspr.params import Params
+from collections import namedtuple
+from typing import TYPE_CHECKING
+
+from auxiliary.instrumentation import NullInstrumentation
 import numpy as np
 from sprinterface.action import SPRAction
-from sprinterface.state import SPRState
+
+if TYPE_CHECKING:
+    # only used for annotations, so that the wrapper can run against the FlowSimulator without coord-sim
+    from sprinterface.params import Params
+    from sprinterface.state import SPRState
+
+# Precomputed per-node data used to encode the state of flows at that node
+NodeLookup = namedtuple('NodeLookup', ['node_and_neighbors', 'node_attrs', 'node_has_cap', 'link_attrs',
+                                       'link_has_cap'])
 
 
 class SPRSimWrapper:
-    def __init__(self, params: Params):
+    def __init__(self, params: 'Params', minimal_state=False, instrumentation=None, simulator_class=None):
         self.params = params
-        # Create the simulator
-        self.simulator = Simulator(
+        if simulator_class is None:
+            from siminterface import Simulator as simulator_class
+        # Create the simulator, by default the SPR simulator of coord-sim (see also sprinterface.flow_simulator)
+        self.simulator = simulator_class(
             params.network_path,
             params.services_path,
             params.sim_config_path,
@@ -19,120 +31,165 @@ class SPRSimWrapper:
 
         # Placeholder for flow that is being passed from Simulator to agent
         self.flow = None
+        # Only encode the fields needed by GCASP
+        self.minimal_state = minimal_state
+        # Optional latency measurements, see auxiliary.instrumentation
+        self.instrumentation = instrumentation or NullInstrumentation()
+
+        # Observation buffers, reused for every state
+        self.rem_node_cap = np.zeros((params.node_resources_size, ), dtype=np.float32)
+        self.rem_link_cap = np.zeros((params.link_resources_size, ), dtype=np.float32)
+        self.dist_to_eg = np.full((params.neighbor_dist_to_eg, ), -1.0, dtype=np.float32)
+        # Per-node lookup tables, built for the network of the first state
+        self.lookup_network = None
+        self.node_lookup = {}
+        self.dist_to_eg_tables = {}
+        # Flows of the current batch and their node and neighbor IDs, see apply_batch
+        self.batch_flows = []
+        self.batch_neighbors = []
 
     def init(self, sim_seed):
         """ Start the simulator and get init state """
         # Generate new seed to seed the simulator
-        sim_state: SPRState = self.simulator.init(sim_seed)
+        sim_state: 'SPRState' = self.simulator.init(sim_seed)
         state = self.process_state(sim_state)
 
         return state, sim_state
 
+    @staticmethod
+    def get_destination(action, node_and_neighbors):
+        """ Node ID for an action; None (drop) for None, negative, or out-of-range actions """
+        if action is None or action < 0 or action >= len(node_and_neighbors):
+            return None
+        return node_and_neighbors[action]
+
     def apply(self, action):
-        if action is None or action >= len(self.node_and_neighbors):
-            destination = None
-        else:
-            destination = self.node_and_neighbors[action]
+        destination = self.get_destination(action, self.node_and_neighbors)
         sim_action = SPRAction(self.flow, destination)
-        sim_state: SPRState = self.simulator.apply(sim_action)
-        state = self.process_state(sim_state)
+        with self.instrumentation.phase('simulator_apply'):
+            sim_state: 'SPRState' = self.simulator.apply(sim_action)
+        with self.instrumentation.phase('process_state'):
+            state = self.process_state(sim_state)
 
         return state, sim_state
 
-    def process_state(self, sim_state: SPRState):
+    def init_batch(self, sim_seed):
+        """ Start the simulator and get the init states as a batch, see apply_batch """
+        sim_state: 'SPRState' = self.simulator.init(sim_seed)
+        return self.process_batch([sim_state])
+
+    def apply_batch(self, actions):
+        """
+        Apply one action per state of the previous batch and return the states of the next batch.
+        Simulators that provide apply_batch() get all actions at once and may return all flows pending at the next
+        timestamp. Other simulators only handle one flow per call, so their batches always contain a single state.
+        """
+        if len(actions) != len(self.batch_flows):
+            raise ValueError(f'Got {len(actions)} actions for a batch of {len(self.batch_flows)} flows.')
+        sim_actions = [SPRAction(flow, self.get_destination(action, node_and_neighbors))
+                       for flow, node_and_neighbors, action in zip(self.batch_flows, self.batch_neighbors, actions)]
+        with self.instrumentation.phase('simulator_apply'):
+            if hasattr(self.simulator, 'apply_batch'):
+                sim_states = self.simulator.apply_batch(sim_actions)
+            elif len(sim_actions) == 1:
+                sim_states = [self.simulator.apply(sim_actions[0])]
+            else:
+                raise ValueError('The simulator does not support batches with more than one flow.')
+        return self.process_batch(sim_states)
+
+    def process_batch(self, sim_states):
+        """ Encode several simulator states. Unlike process_state, the returned arrays are not reused """
+        states = []
+        with self.instrumentation.phase('process_state'):
+            for sim_state in sim_states:
+                state = self.process_state(sim_state)
+                states.append({key: value.copy() if isinstance(value, np.ndarray) else value
+                               for key, value in state.items()})
+        self.batch_flows = [state['flow'] for state in states]
+        self.batch_neighbors = [state['node_and_neighbors'] for state in states]
+        return states, sim_states
+
+    def build_lookup_tables(self, network):
+        """
+        Precompute for each node of the network the IDs of the node and its neighbors together with references to
+        their node and link attribute dicts. The simulator updates the remaining capacities inside these dicts, so
+        process_state only needs to read them.
+        """
+        self.lookup_network = network
+        self.node_lookup = {}
+        self.dist_to_eg_tables = {}
+        for node_id in network.nodes:
+            neighbor_node_ids = list(network[node_id].keys())
+            node_and_neighbors = [node_id] + neighbor_node_ids
+            node_attrs = [network.nodes[n] for n in node_and_neighbors]
+            link_attrs = [network[node_id][n] for n in neighbor_node_ids]
+            self.node_lookup[node_id] = NodeLookup(
+                node_and_neighbors=node_and_neighbors,
+                node_attrs=node_attrs,
+                node_has_cap=np.array([attrs['cap'] != 0 for attrs in node_attrs], dtype=np.float32),
+                link_attrs=link_attrs,
+                link_has_cap=np.array([attrs['cap'] != 0 for attrs in link_attrs], dtype=np.float32),
+            )
+
+    def get_dist_to_eg_table(self, node_id, egress_node_id):
+        """ Distances from node_id via each of its neighbors to the egress node, computed once per pair """
+        key = (node_id, egress_node_id)
+        table = self.dist_to_eg_tables.get(key)
+        if table is None:
+            shortest_paths = self.lookup_network.graph['shortest_paths']
+            table = np.array([shortest_paths[(node_id, neighbor_id)][1] + shortest_paths[(neighbor_id,
+                                                                                          egress_node_id)][1]
+                              for neighbor_id in self.node_lookup[node_id].node_and_neighbors[1:]], dtype=np.float32)
+            self.dist_to_eg_tables[key] = table
+        return table
+
+    def process_state(self, sim_state: 'SPRState'):
+        """
+        Encode the simulator state for the current flow. The returned arrays are reused by the next call.
+        In minimal_state mode only the remaining capacity of the current node (rem_node_cap[0]) is set and the
+        link capacities and distances are omitted.
+        """
         self.flow = sim_state.flow
         self.sfcs = sim_state.sfcs
         self.network = sim_state.network
-
-        flow_proc_percentage = self.flow.current_position / len(self.sfcs[self.flow.sfc])
-
-        # get neighbor nodes
-        neighbor_node_ids = list(sim_state.network[self.flow.current_node_id].keys())
-
-        self.node_and_neighbors = [self.flow.current_node_id]
-
-        self.node_and_neighbors.extend([node_id for node_id in neighbor_node_ids])
-
-        remaining_node_resources = np.full((self.params.node_resources_size, ), 0.0, dtype=np.float32)
-        for i, node_id in enumerate(self.node_and_neighbors):
-            node_cap = sim_state.network.nodes[node_id]['cap']
-            node_remaining_cap = sim_state.network.nodes[node_id]['remaining_cap']
-
-            if node_cap == 0:
-                node_remaining_cap_norm = 0
-            else:
-                node_remaining_cap_norm = node_remaining_cap
-                # if node_remaining_cap / self.flow.dr >= 1:
-                #     node_remaining_cap_norm = 1
-                # else:
-                #     node_remaining_cap_norm = 0
-                # node_remaining_cap_norm = node_remaining_cap
-            remaining_node_resources[i] = node_remaining_cap_norm
-
-        remaining_link_resources = np.full((self.params.link_resources_size, ), 0.0, dtype=np.float32)
-        for i, node_id in enumerate(neighbor_node_ids):
-            link_cap = sim_state.network[self.flow.current_node_id][node_id]['cap']
-            link_remaining_cap = sim_state.network[self.flow.current_node_id][node_id]['remaining_cap']
-
-
-            if link_cap == 0:
-                link_remaining_cap_norm = 0
-            else:
-                link_remaining_cap_norm = link_remaining_cap
-                # if link_remaining_cap / self.flow.dr >= 1:
-                #     link_remaining_cap_norm = 1
-                # else:
-                #     link_remaining_cap_norm = 0
-                # link_remaining_cap_norm = link_remaining_cap
-
-            remaining_link_resources[i] = link_remaining_cap_norm
-
-        # If neighbor does not exist, set distance to -1
-        neighbors_dist_to_eg = np.full((self.params.neighbor_dist_to_eg, ), -1.0, dtype=np.float32)
-        for i, node_id in enumerate(neighbor_node_ids):
-            if self.flow.egress_node_id is not None:
-                # Check whether distance from current node to neighbor node should also be included
-                dist_to_node = self.network.graph['shortest_paths'][(self.flow.current_node_id,
-                                                                     node_id)][1]
-                dist_to_eg = dist_to_node + self.network.graph['shortest_paths'][(
-                    node_id,
-                    self.flow.egress_node_id)][1]
-                neighbors_dist_to_eg[i] = dist_to_eg
-            else:
-                neighbors_dist_to_eg[i] = -1
-
-        # Component availability status
-        vnf_availability = np.full((self.params.vnf_status, ), -1.0, dtype=np.float32)
-        for i, node_id in enumerate(self.node_and_neighbors):
-            flow_sf = self.flow.current_sf
-            if flow_sf in sim_state.network.nodes[node_id]['available_sf']:
-                vnf_availability[i] = 1
-            else:
-                vnf_availability[i] = 0
-
-        # Distance to egress
-        # Check if flow has egress node set
+        if self.network is not self.lookup_network:
+            self.build_lookup_tables(self.network)
+
+        lookup = self.node_lookup[self.flow.current_node_id]
+        self.node_and_neighbors = lookup.node_and_neighbors
+
+        if self.minimal_state:
+            node_attrs = lookup.node_attrs[0]
+            self.rem_node_cap[0] = node_attrs['remaining_cap'] if node_attrs['cap'] != 0 else 0
+            return {"flow": self.flow, "node_and_neighbors": self.node_and_neighbors, "rem_node_cap": self.rem_node_cap}
+
+        # Remaining node resources of this node and its neighbors, 0 for nodes without capacity
+        num_nodes = len(lookup.node_attrs)
+        self.rem_node_cap[:num_nodes] = [attrs['remaining_cap'] for attrs in lookup.node_attrs]
+        self.rem_node_cap[:num_nodes] *= lookup.node_has_cap
+        self.rem_node_cap[num_nodes:] = 0
+
+        # Remaining resources of the links to the neighbors, 0 for links without capacity
+        num_links = len(lookup.link_attrs)
+        self.rem_link_cap[:num_links] = [attrs['remaining_cap'] for attrs in lookup.link_attrs]
+        self.rem_link_cap[:num_links] *= lookup.link_has_cap
+        self.rem_link_cap[num_links:] = 0
+
+        # Distance of each neighbor to the egress. If neighbor does not exist or there is no egress, set it to -1
         if self.flow.egress_node_id is not None:
-            if self.flow.current_node_id == self.flow.egress_node_id:
-                at_egress = 1
-            else:
-                at_egress = 0
-            # dist_to_egress = self.network.graph['shortest_paths'][(self.flow.current_node_id,
-        #                                                           self.flow.egress_node_id)][1]  # 1: delay; 2: hops
-        # else:
-        #     # Any node can be egress
-        #     dist_to_egress = 0
-
-        # Flow TTL
-        ttl = self.flow.ttl
-        # Flow DR
-        dr = self.flow.dr
+            self.dist_to_eg[:num_links] = self.get_dist_to_eg_table(self.flow.current_node_id,
+                                                                    self.flow.egress_node_id)
+            self.dist_to_eg[num_links:] = -1
+        else:
+            self.dist_to_eg[:] = -1
+
         # Create the NN state vector
         state = {
             "flow": self.flow,
-            "rem_node_cap": remaining_node_resources,
-            "rem_link_cap": remaining_link_resources,
-            "dist_to_eg": neighbors_dist_to_eg
+            "node_and_neighbors": self.node_and_neighbors,
+            "rem_node_cap": self.rem_node_cap,
+            "rem_link_cap": self.rem_link_cap,
+            "dist_to_eg": self.dist_to_eg
         }
 
         return state
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the packages of this repo live in src/, see package_dir in setup.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
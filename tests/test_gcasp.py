@@ -0,0 +1,157 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from algorithms import gcasp, gcasp_core, gcasp_replay
+from auxiliary.instrumentation import Instrumentation
+from auxiliary.state_log import read_state_log
+from sprinterface.flow_simulator import FlowSimParams, FlowSimulator, read_network
+from sprinterface.wrapper import SPRSimWrapper
+
+RES = Path(__file__).resolve().parent.parent / 'res'
+NETWORK = RES / 'networks' / 'abilene_1-5in-1eg' / 'abilene-in5-rand-cap0-2.graphml'
+SERVICES = RES / 'services' / 'abc-start_delay0.yaml'
+
+
+def flow_sim_params(tmp_path, sim_config, duration, seed=0, network=NETWORK):
+    return FlowSimParams(seed, str(RES / 'simulator' / sim_config), str(network), str(SERVICES), duration=duration,
+                         result_dir=str(tmp_path))
+
+
+def network_stats(monkeypatch):
+    """ The network stats of the FlowSimulator, updated with every state """
+    stats = {}
+    next_state = FlowSimulator.next_state
+
+    def recording_next_state(self, until=None):
+        state = next_state(self, until)
+        stats.update(self.network_stats)
+        return state
+
+    monkeypatch.setattr(FlowSimulator, 'next_state', recording_next_state)
+    return stats
+
+
+@pytest.fixture
+def decisions(monkeypatch):
+    """ (flow ID, node, action) of every decision GCASP takes """
+    taken = []
+    compute_action = gcasp_core.GCASP.compute_action
+
+    def recording_compute_action(self, state):
+        action = compute_action(self, state)
+        taken.append((state['flow'].flow_id, state['flow'].current_node_id, action))
+        return action
+
+    monkeypatch.setattr(gcasp_core.GCASP, 'compute_action', recording_compute_action)
+    return taken
+
+
+def test_runs_with_the_same_seed_take_the_same_decisions(tmp_path, decisions):
+    params = flow_sim_params(tmp_path, 'mean-10-poisson.yaml', duration=1000)
+    gcasp.run(params, 0, simulator_class=FlowSimulator)
+    first = list(decisions)
+    decisions.clear()
+    # GCASP draws its random targets from the random module, which init(seed) of the simulator seeds
+    random.seed(1)
+    gcasp.run(params, 0, simulator_class=FlowSimulator)
+    assert decisions == first
+
+
+@pytest.mark.parametrize('sim_config', ['mean-5.yaml', 'mean-10-poisson.yaml', 'mmpp-12-8.yaml'])
+def test_batched_run_takes_the_same_decisions(tmp_path, monkeypatch, decisions, sim_config):
+    params = flow_sim_params(tmp_path, sim_config, duration=2000)
+    num_decisions = gcasp.run(params, 0, simulator_class=FlowSimulator)
+    per_flow = list(decisions)
+    assert num_decisions == len(per_flow)
+
+    round_trips = []
+    apply_batch = SPRSimWrapper.apply_batch
+    monkeypatch.setattr(SPRSimWrapper, 'apply_batch',
+                        lambda self, actions: round_trips.append(len(actions)) or apply_batch(self, actions))
+    decisions.clear()
+    num_decisions = gcasp.run(params, 0, simulator_class=FlowSimulator, batched=True)
+    batched = list(decisions)
+    assert num_decisions == len(batched)
+    # the batched run also decides the flows pending together with the last arrival
+    assert batched[:len(per_flow)] == per_flow
+    if sim_config == 'mean-5.yaml':
+        # deterministic arrivals at all ingress nodes at the same times
+        assert max(round_trips) > 1
+
+
+@pytest.mark.parametrize('sim_config', ['mean-10-poisson.yaml', 'mean-10-poisson-2-TTL.yaml'])
+def test_flows_without_egress_leave_once_processed(tmp_path, monkeypatch, sim_config):
+    stats = network_stats(monkeypatch)
+    params = flow_sim_params(tmp_path, sim_config, duration=500, network=RES / 'networks' / 'triangle.graphml')
+    assert not params.eg_nodes
+    gcasp.run(params, 0, simulator_class=FlowSimulator)
+    assert stats['successful_flows'] > stats['dropped_flows']
+
+
+# with mean-10-poisson-2-TTL.yaml, the TTL check drops flows early
+@pytest.mark.parametrize('sim_config', ['mean-5.yaml', 'mean-10-poisson.yaml', 'mean-10-poisson-2-TTL.yaml'])
+def test_replay_takes_the_recorded_decisions(tmp_path, sim_config):
+    params = flow_sim_params(tmp_path, sim_config, duration=1000)
+    path = str(tmp_path / gcasp.STATE_LOG_NAME)
+    instrumentation = Instrumentation()
+    num_decisions = gcasp.run(params, 0, simulator_class=FlowSimulator, record_states=path,
+                              instrumentation=instrumentation)
+    # the network is congested, so that flows are rerouted around links without capacity, checking the capacity of
+    # the links along the cached alternative paths
+    assert instrumentation.counters['reroute'] > 0
+    assert len(read_state_log(path)[2]) > 0
+    assert gcasp_replay.replay(path)[:2] == (num_decisions, 0)
+
+
+def test_replay_uses_the_recorded_options(tmp_path, monkeypatch):
+    params = flow_sim_params(tmp_path, 'mean-10-poisson-2-TTL.yaml', duration=200)
+    path = str(tmp_path / gcasp.STATE_LOG_NAME)
+    gcasp.run(params, 0, simulator_class=FlowSimulator, record_states=path, reroute_paths=2, ttl_check=False)
+    header, _, _ = read_state_log(path)
+    assert header['options'] == {'reroute_paths': 2, 'ttl_check': False}
+    assert header['sf_list']['a']['processing_delay_mean'] > 0
+
+    instances = []
+    init = gcasp_core.GCASP.__init__
+
+    def recording_init(self, *args, **kwargs):
+        instances.append(self)
+        init(self, *args, **kwargs)
+
+    monkeypatch.setattr(gcasp_core.GCASP, '__init__', recording_init)
+    gcasp_replay.replay(path)
+    replayed, = instances
+    assert not replayed.ttl_check
+    assert replayed.path_engine.reroute_paths == 2
+    assert replayed.remaining_processing == {sfc: [15.0, 10.0, 5.0, 0.0] for sfc in header['sfcs']}
+
+
+@pytest.mark.parametrize('network', sorted(RES.glob('networks/**/*.graphml')), ids=lambda path: path.name)
+def test_all_networks_can_be_read(network):
+    graph, ingress_nodes, egress_nodes = read_network(str(network))
+    assert graph.number_of_nodes() > 0
+    for _, _, attrs in graph.edges(data=True):
+        assert attrs['delay'] >= 0
+        assert attrs['cap'] == attrs['remaining_cap']
+
+
+@pytest.mark.parametrize('network', [
+    # no LinkFwdCap
+    RES / 'networks' / 'abilene' / 'abilene-in1-cap10.graphml',
+    # some nodes without coordinates and links without LinkDelay
+    RES / 'networks' / 'bteurope' / 'bteurope-in4-rand-cap0-2.graphml',
+], ids=lambda path: path.name)
+def test_run_on_networks_with_missing_attributes(tmp_path, monkeypatch, network):
+    stats = network_stats(monkeypatch)
+    params = flow_sim_params(tmp_path, 'mean-10-poisson.yaml', duration=200, network=network)
+    gcasp.run(params, 0, simulator_class=FlowSimulator)
+    assert stats['successful_flows'] > 0
+
+
+def test_classes_of_gcasp_core_are_reexported():
+    assert gcasp.GCASP is gcasp_core.GCASP
+    assert gcasp.REROUTE_PATHS == gcasp_core.REROUTE_PATHS
+    with pytest.raises(AttributeError):
+        gcasp.NoSuchClass
@@ -0,0 +1,33 @@
+from auxiliary.schedule import ScheduleTensor, SparseSchedule
+
+NODES = ['pop0', 'pop1', 'pop2']
+
+
+def test_rows_of_a_schedule_tensor_are_memoized_plain_dicts():
+    schedule = ScheduleTensor.uniform(NODES, ['sfc_1'], ['a', 'b'])
+    row = schedule['pop0']['sfc_1']['a']
+    assert type(row) is dict
+    assert row == {node: 1 / 3 for node in NODES}
+    assert schedule['pop0']['sfc_1']['a'] is row
+
+
+def test_changes_of_a_schedule_tensor_are_read_after_memoizing():
+    schedule = ScheduleTensor(NODES, ['sfc_1'], ['a'])
+    assert schedule['pop0']['sfc_1']['a']['pop1'] == 0
+    schedule.add('pop0', 'sfc_1', 'a', 'pop1', 2.0)
+    schedule.add('pop0', 'sfc_1', 'a', 'pop2', 2.0)
+    assert schedule['pop0']['sfc_1']['a'] == {'pop0': 0, 'pop1': 2.0, 'pop2': 2.0}
+    schedule.normalize()
+    assert schedule['pop0']['sfc_1']['a'] == {'pop0': 0, 'pop1': 0.5, 'pop2': 0.5}
+    assert schedule.to_dict()['pop1'] == {'sfc_1': {'a': {node: 1 / 3 for node in NODES}}}
+
+
+def test_rows_of_a_sparse_schedule_only_hold_the_non_zero_destinations():
+    schedule = SparseSchedule(NODES, ['sfc_1'], ['a'])
+    schedule.set_row('pop0', 'sfc_1', 'a', {'pop1': 1.0, 'pop2': 3.0, 'pop0': 0.0})
+    row = schedule['pop0']['sfc_1']['a']
+    assert list(row.items()) == [('pop1', 0.25), ('pop2', 0.75)]
+    assert list(row) == list(row.keys()) == ['pop1', 'pop2']
+    assert list(row.values()) == [0.25, 0.75]
+    assert len(row) == 2 and row['pop0'] == 0
+    assert list(schedule.keys()) == NODES